@@ -0,0 +1,281 @@
+"""
+Diário (journal) de checkpoint da tradução em massa.
+
+Em vez de reescrever um JSON inteiro a cada lote, cada lote concluído vira
+UMA linha JSON acrescentada ao fim do arquivo e gravada em disco com fsync:
+o custo por lote é proporcional ao lote, e um processo morto no meio do
+caminho nunca perde lotes já concluídos. Ao retomar, as linhas são
+reaplicadas em ordem; uma última linha incompleta (queda durante a escrita)
+é descartada e cortada do arquivo. No fim de uma execução, 'compactar'
+reescreve o diário como um único registro.
+
+Cada projeto tem o seu diário, numa pasta de cache própria: a chave é o hash
+do conteúdo do XML mais as tags escolhidas e o idioma de destino. Traduzir
+outro arquivo (ou o mesmo com outras tags) nunca reaproveita o checkpoint
+errado, e reabrir um XML já visto recupera na hora o que já foi traduzido.
+Uso pela linha de comando:
+
+    python -m core.checkpoint listar
+    python -m core.checkpoint podar --dias 30 --simular
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from .configuracao import gravar_json_atomico
+
+ARQUIVO_CHECKPOINT = "textos_traduzidos_checkpoint.jsonl"
+DIRETORIO_CHECKPOINTS = "checkpoints"
+ARQUIVO_PROJETO = "projeto.json"  # Metadados de cada pasta de projeto
+DIAS_PARA_EXPIRAR = 30
+
+
+def _fsync_diretorio(caminho):
+    """Garante que a criação/renomeação do arquivo também chegou ao disco (quando o SO permite)."""
+    try:
+        descritor = os.open(os.path.dirname(os.path.abspath(caminho)), os.O_RDONLY)
+    except OSError:
+        return  # Windows não abre diretórios
+    try:
+        os.fsync(descritor)
+    except OSError:
+        pass
+    finally:
+        os.close(descritor)
+
+
+class DiarioCheckpoint:
+    def __init__(self, caminho=ARQUIVO_CHECKPOINT, metadados=None):
+        self.caminho = caminho
+        # Metadados do projeto ainda não gravados: a pasta só é criada na primeira escrita
+        self.metadados_pendentes = metadados
+        self.linhas_descartadas = 0
+        self._arquivo = None
+
+    def _preparar_pasta(self):
+        if self.metadados_pendentes is None:
+            return
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        _gravar_metadados(pasta, self.metadados_pendentes)
+        self.metadados_pendentes = None
+
+    def carregar(self, truncar=True):
+        """
+        Reaplica o diário e retorna {xpath: tradução}. Com truncar=False o
+        arquivo não é alterado (para só ler o diário de outro processo).
+        """
+        traducoes = {}
+        if not os.path.exists(self.caminho):
+            return traducoes
+
+        posicao = valido_ate = 0
+        with open(self.caminho, "rb") as f:
+            for linha in f:
+                posicao += len(linha)
+                try:
+                    if not linha.endswith(b"\n"):
+                        raise ValueError("registro incompleto")
+                    traducoes.update(json.loads(linha)["traducoes"])
+                except (ValueError, KeyError, TypeError):
+                    # Normalmente só a última linha (queda no meio da escrita)
+                    self.linhas_descartadas += 1
+                    continue
+                valido_ate = posicao
+            tamanho = posicao
+
+        if truncar and valido_ate < tamanho:
+            # Corta o lixo para que os próximos registros não fiquem grudados nele
+            with open(self.caminho, "r+b") as f:
+                f.truncate(valido_ate)
+                f.flush()
+                os.fsync(f.fileno())
+        return traducoes
+
+    def registrar(self, traducoes):
+        """Acrescenta um lote ({xpath: tradução}) como um registro e o grava no disco."""
+        if not traducoes:
+            return
+        if self._arquivo is None:
+            self._preparar_pasta()
+            novo = not os.path.exists(self.caminho)
+            self._arquivo = open(self.caminho, "a", encoding="utf-8", newline="\n")
+            if novo:
+                _fsync_diretorio(self.caminho)
+        self._arquivo.write(json.dumps({"traducoes": traducoes}, ensure_ascii=False) + "\n")
+        self._arquivo.flush()
+        os.fsync(self._arquivo.fileno())
+
+    def compactar(self, traducoes):
+        """Reescreve o diário como um único registro com todas as traduções (troca atômica)."""
+        self.fechar()
+        if not traducoes and not os.path.exists(self.caminho):
+            return  # Nada traduzido: não cria pasta nem diário vazio
+        self._preparar_pasta()
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8", newline="\n") as f:
+            f.write(json.dumps({"traducoes": traducoes}, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, self.caminho)
+        _fsync_diretorio(self.caminho)
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+# --- Checkpoints por projeto ---
+
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    """sha256 do conteúdo do arquivo, lido em blocos."""
+    resumo = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b""):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def chave_projeto(hash_xml, tag_pai, tag_alvo, idioma_destino):
+    """Identifica um projeto: mesmo conteúdo, mesmas tags e mesmo idioma de destino."""
+    bruto = "\x1f".join((hash_xml, tag_pai or "", tag_alvo or "", idioma_destino or ""))
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()[:24]
+
+
+def _gravar_metadados(pasta, atualizacao):
+    """Mescla 'atualizacao' no projeto.json da pasta (que já deve existir)."""
+    caminho_metadados = os.path.join(pasta, ARQUIVO_PROJETO)
+    metadados = {"criado_em": atualizacao["usado_em"]}
+    if os.path.exists(caminho_metadados):
+        try:
+            with open(caminho_metadados, "r", encoding="utf-8") as f:
+                metadados = json.load(f)
+        except (OSError, ValueError):
+            pass
+    metadados.update(atualizacao)
+    gravar_json_atomico(caminho_metadados, metadados)
+
+
+def abrir_checkpoint_projeto(caminho_xml, tag_pai, tag_alvo, idioma_destino, hash_xml=None,
+                             diretorio=DIRETORIO_CHECKPOINTS):
+    """
+    Diário do projeto. Se o projeto já tem pasta, registra o uso nos metadados
+    agora; senão a pasta só é criada quando o diário gravar algo, então abrir
+    um XML para olhar não deixa pastas vazias no cache. 'hash_xml' evita
+    reler o arquivo quando já é conhecido.
+    """
+    hash_xml = hash_xml or hash_arquivo(caminho_xml)
+    chave = chave_projeto(hash_xml, tag_pai, tag_alvo, idioma_destino)
+    pasta = os.path.join(diretorio, chave)
+    metadados = {
+        "arquivo_xml": os.path.abspath(caminho_xml),
+        "hash_xml": hash_xml,
+        "tag_pai": tag_pai,
+        "tag_alvo": tag_alvo,
+        "idioma_destino": idioma_destino,
+        "usado_em": time.time(),
+    }
+    if os.path.isdir(pasta):
+        _gravar_metadados(pasta, metadados)
+        metadados = None
+    return DiarioCheckpoint(os.path.join(pasta, ARQUIVO_CHECKPOINT), metadados=metadados)
+
+
+def listar_checkpoints(diretorio=DIRETORIO_CHECKPOINTS, conferir_origem=True):
+    """
+    Um dicionário por projeto, dos usados há mais tempo aos mais recentes:
+    metadados + 'chave', 'pasta', 'itens', 'bytes' e 'situacao' ('ok',
+    'xml_ausente' ou 'xml_alterado'; só calculada com conferir_origem).
+    """
+    if not os.path.isdir(diretorio):
+        return []
+    hashes_atuais = {}  # Cada XML de origem é lido uma vez só
+    projetos = []
+    for chave in os.listdir(diretorio):
+        pasta = os.path.join(diretorio, chave)
+        caminho_metadados = os.path.join(pasta, ARQUIVO_PROJETO)
+        if not os.path.isfile(caminho_metadados):
+            continue
+        try:
+            with open(caminho_metadados, "r", encoding="utf-8") as f:
+                projeto = json.load(f)
+        except (OSError, ValueError):
+            projeto = {}
+        caminho_diario = os.path.join(pasta, ARQUIVO_CHECKPOINT)
+        existe = os.path.exists(caminho_diario)
+        projeto.update({
+            "chave": chave,
+            "pasta": pasta,
+            "itens": len(DiarioCheckpoint(caminho_diario).carregar(truncar=False)) if existe else 0,
+            "bytes": os.path.getsize(caminho_diario) if existe else 0,
+        })
+        projeto.setdefault("usado_em", os.path.getmtime(caminho_metadados))
+
+        if conferir_origem:
+            origem = projeto.get("arquivo_xml")
+            if not origem or not os.path.exists(origem):
+                projeto["situacao"] = "xml_ausente"
+            else:
+                if origem not in hashes_atuais:
+                    hashes_atuais[origem] = hash_arquivo(origem)
+                projeto["situacao"] = "ok" if hashes_atuais[origem] == projeto.get("hash_xml") else "xml_alterado"
+        projetos.append(projeto)
+    projetos.sort(key=lambda projeto: projeto["usado_em"])
+    return projetos
+
+
+def podar_checkpoints(diretorio=DIRETORIO_CHECKPOINTS, dias=DIAS_PARA_EXPIRAR, simular=False):
+    """
+    Apaga os checkpoints obsoletos: sem uso há mais de 'dias' dias ou cujo XML
+    de origem sumiu ou mudou de conteúdo. Retorna a lista dos projetos podados.
+    """
+    limite = time.time() - dias * 86400 if dias is not None else None
+    podados = []
+    for projeto in listar_checkpoints(diretorio):
+        expirado = limite is not None and projeto["usado_em"] < limite
+        if expirado or projeto["situacao"] != "ok":
+            podados.append(projeto)
+            if not simular:
+                shutil.rmtree(projeto["pasta"], ignore_errors=True)
+    return podados
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Checkpoints da tradução em massa, por projeto.")
+    parser.add_argument("--diretorio", default=DIRETORIO_CHECKPOINTS)
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("listar", help="mostra os checkpoints guardados")
+    p_podar = sub.add_parser("podar", help="apaga checkpoints antigos ou de XMLs que mudaram/sumiram")
+    p_podar.add_argument("--dias", type=int, default=DIAS_PARA_EXPIRAR, help="sem uso há mais de N dias")
+    p_podar.add_argument("--simular", action="store_true", help="só mostra o que seria apagado")
+    args = parser.parse_args(argv)
+
+    def descrever(projeto):
+        usado = time.strftime("%Y-%m-%d %H:%M", time.localtime(projeto["usado_em"]))
+        origem = os.path.basename(projeto.get("arquivo_xml") or "?")
+        return (
+            f"{projeto['chave']}  {origem} <{projeto.get('tag_pai')}>/<{projeto.get('tag_alvo')}> "
+            f"-> {projeto.get('idioma_destino')}  {projeto['itens']} itens, usado em {usado} [{projeto['situacao']}]"
+        )
+
+    if args.comando == "listar":
+        projetos = listar_checkpoints(args.diretorio)
+        for projeto in projetos:
+            print(descrever(projeto))
+        print(f"{len(projetos)} checkpoint(s) em '{args.diretorio}'.")
+    else:
+        podados = podar_checkpoints(args.diretorio, args.dias, args.simular)
+        for projeto in podados:
+            print(("[simulação] " if args.simular else "") + "removido: " + descrever(projeto))
+        print(f"{len(podados)} checkpoint(s) {'seriam removidos' if args.simular else 'removido(s)'}.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
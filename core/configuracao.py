@@ -0,0 +1,63 @@
+"""
+Peças comuns aos módulos que guardam estado em JSON e têm ajustes por
+serviço/modelo (limitador de taxa, orçamentos de lote, checkpoints).
+
+As configurações aceitam a chave "servico" ou "servico|modelo"; o nome do
+modelo é comparado com e sem o prefixo 'models/' do Gemini.
+"""
+import json
+import os
+
+
+def nome_base(modelo):
+    """'models/gemini-1.5-flash' -> 'gemini-1.5-flash'."""
+    return (modelo or "").split("/")[-1]
+
+
+def chave_servico(servico, modelo=None):
+    """Chave de registro/persistência de um serviço, ou de um modelo dele."""
+    return f"{servico}|{nome_base(modelo)}" if modelo else servico
+
+
+def resolver_por_modelo(servico, modelo, fontes, base=None):
+    """
+    Mescla os ajustes das 'fontes' (da menos para a mais prioritária, ex:
+    padrões e config.json): primeiro os do serviço, depois os do modelo.
+    """
+    resolvido = dict(base or {})
+    for fonte in fontes:
+        resolvido.update((fonte or {}).get(servico, {}))
+    if modelo:
+        for fonte in fontes:
+            for chave in (f"{servico}|{nome_base(modelo)}", f"{servico}|{modelo}"):
+                resolvido.update((fonte or {}).get(chave, {}))
+    return resolvido
+
+
+def gravar_json_atomico(caminho, dados):
+    """Grava num .tmp e troca de uma vez: quem lê nunca vê o arquivo pela metade."""
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(dados, f, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def carregar_json(caminho):
+    """Conteúdo de um arquivo de estado; {} se ele não existe ou está ilegível."""
+    if not caminho or not os.path.exists(caminho):
+        return {}
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def salvar_json(caminho, dados):
+    """Como gravar_json_atomico, mas só avisa se falhar: estado de cache não deve derrubar o trabalho."""
+    if not caminho:
+        return
+    try:
+        gravar_json_atomico(caminho, dados)
+    except OSError as exc:
+        print(f"Falha ao salvar {caminho}: {exc}")
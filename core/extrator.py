@@ -1,10 +1,14 @@
 # Em core/extrator.py - SUBSTITUA O CONTEÚDO TODO
 
 import xml.etree.ElementTree as ET
+import hashlib
 import os
 
 def get_xpath(elem, root, parent_map):
-    """Gera um XPath único para um elemento, compatível com a biblioteca padrão."""
+    """
+    Gera um XPath único para um elemento, compatível com a biblioteca padrão.
+    Custa O(irmãos) por nível; para muitos elementos prefira mapear_xpaths.
+    """
     path_parts = []
     while elem in parent_map:
         parent = parent_map[elem]
@@ -23,6 +27,177 @@ def get_xpath(elem, root, parent_map):
     return '/' + '/'.join(path_parts)
 
 
+def mapear_xpaths(root, alvos=None):
+    """
+    Gera os XPaths de todos os elementos (ou só dos 'alvos') em UMA travessia.
+    Cada pai guarda um contador por tag, então o índice posicional sai pronto
+    sem reconstruir a lista de irmãos. Produz as mesmas chaves de get_xpath.
+    Funciona tanto com ElementTree quanto com lxml (comentários são ignorados).
+    """
+    alvos = set(alvos) if alvos is not None else None
+    mapa = {}
+    raiz_xpath = '/' + root.tag
+    if alvos is None or root in alvos:
+        mapa[root] = raiz_xpath
+
+    # Pilha de (elemento, xpath); cada pai é visitado uma única vez
+    pilha = [(root, raiz_xpath)]
+    while pilha:
+        pai, xpath_pai = pilha.pop()
+        contadores = {}
+        for filho in pai:
+            tag = filho.tag
+            if not isinstance(tag, str):
+                continue  # Comentários/PIs do lxml não contam como irmãos
+            indice = contadores.get(tag, 0) + 1
+            contadores[tag] = indice
+            xpath = f"{xpath_pai}/{tag}[{indice}]"
+            if alvos is None or filho in alvos:
+                mapa[filho] = xpath
+            if len(filho):
+                pilha.append((filho, xpath))
+    return mapa
+
+
+def iterar_textos(arquivo_xml, parent_tag, target_tag):
+    """
+    Versão em streaming da extração: gera pares (xpath, texto) sem carregar o
+    XML inteiro. Usa iterparse com eventos start/end, mantém o caminho atual
+    numa pilha de contadores de irmãos e descarta as subárvores já lidas,
+    então a memória fica estável mesmo em arquivos de vários GB.
+    As tags devem ser nomes simples (ex: 'bio', 'baseVillain').
+    """
+    for xpath, texto in _iterar_alvos(arquivo_xml, parent_tag, target_tag):
+        if texto and texto.strip():
+            yield xpath, texto.strip()
+
+
+def _iterar_alvos(arquivo_xml, parent_tag, target_tag, arquivo=None):
+    """
+    Gera (xpath, texto) de TODAS as tags alvo, inclusive as vazias (texto None).
+    'arquivo' é um objeto já aberto com read() para ler no lugar do caminho.
+    """
+    if arquivo is None:
+        with open(arquivo_xml, 'rb') as arquivo:
+            yield from _iterar_alvos(arquivo_xml, parent_tag, target_tag, arquivo)
+        return
+
+    # Cada item da pilha: (elemento, xpath, contador de tags dos filhos)
+    pilha = []
+    for evento, elem in ET.iterparse(arquivo, events=("start", "end")):
+        if evento == "start":
+            if pilha:
+                _pai, xpath_pai, contadores = pilha[-1]
+                indice = contadores.get(elem.tag, 0) + 1
+                contadores[elem.tag] = indice
+                xpath = f"{xpath_pai}/{elem.tag}[{indice}]"
+            else:
+                xpath = '/' + elem.tag
+            pilha.append((elem, xpath, {}))
+            continue
+
+        _elem, xpath, _contadores = pilha.pop()
+        # Mesma semântica de root.findall('.//pai/alvo') e './/alvo':
+        # a raiz nunca é alvo, e a tag pai nunca é a raiz.
+        if elem.tag == target_tag and pilha:
+            if not parent_tag or (len(pilha) > 1 and pilha[-1][0].tag == parent_tag):
+                yield xpath, elem.text
+
+        # O elemento terminou: remove-o (e os irmãos anteriores) do pai
+        if pilha:
+            del pilha[-1][0][:]
+
+
+def _mensagem_sem_alvos(parent_tag, target_tag):
+    msg = f"AVISO: Nenhuma tag <{target_tag}> foi encontrada."
+    if parent_tag:
+        msg += f" dentro de <{parent_tag}>"
+    return msg
+
+
+def _mensagem_xml_invalido(arquivo_xml, erro):
+    return f"ERRO CRÍTICO: O arquivo '{os.path.basename(arquivo_xml)}' não é um XML válido.\n\nDetalhes: {erro}"
+
+
+class _CargaCancelada(Exception):
+    pass
+
+
+class CargaXml:
+    """
+    Extração em partes para a interface, pensada para rodar numa thread
+    operária: partes() gera listas de até 'tamanho_parte' pares (xpath, texto).
+    bytes_lidos / total_bytes / encontrados andam a cada bloco lido e podem
+    ser consultados pela thread da interface a qualquer momento, mesmo num
+    trecho longo sem tags alvo. Se 'cancel_event' for sinalizado a leitura
+    para no próximo bloco e 'cancelado' fica True.
+
+    Ao terminar, 'erro' tem a mesma mensagem que extrair_textos daria (ou
+    None) e 'hash_xml' o SHA-256 do arquivo (igual ao de hash_arquivo),
+    calculado na mesma leitura, sem uma segunda passada pelo disco.
+    """
+
+    def __init__(self, arquivo_xml, parent_tag, target_tag, tamanho_parte=2000, cancel_event=None):
+        self.arquivo_xml = arquivo_xml
+        self.parent_tag = parent_tag
+        self.target_tag = target_tag
+        self.tamanho_parte = tamanho_parte
+        self.cancel_event = cancel_event
+        self.total_bytes = os.path.getsize(arquivo_xml)
+        self.bytes_lidos = 0
+        self.encontrados = 0  # Tags alvo, inclusive as vazias
+        self.textos = 0
+        self.cancelado = False
+        self.erro = None
+        self.hash_xml = None
+        self._arquivo = None
+        self._resumo = hashlib.sha256()
+
+    def read(self, tamanho=-1):
+        """O iterparse lê por aqui: conta os bytes, alimenta o hash e atende o cancelamento."""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise _CargaCancelada()
+        bloco = self._arquivo.read(tamanho)
+        self._resumo.update(bloco)
+        self.bytes_lidos += len(bloco)
+        return bloco
+
+    def partes(self):
+        parte = []
+        try:
+            with open(self.arquivo_xml, 'rb') as self._arquivo:
+                for xpath, texto in _iterar_alvos(self.arquivo_xml, self.parent_tag, self.target_tag, self):
+                    self.encontrados += 1
+                    if texto and texto.strip():
+                        parte.append((xpath, texto.strip()))
+                        if len(parte) >= self.tamanho_parte:
+                            self.textos += len(parte)
+                            yield parte
+                            parte = []
+                while self.read(1 << 20):
+                    pass  # O que vier depois da raiz também entra no hash
+        except _CargaCancelada:
+            self.cancelado = True
+            return
+        except ET.ParseError as e:
+            self.erro = _mensagem_xml_invalido(self.arquivo_xml, e)
+            return
+        except Exception as e:
+            self.erro = f"ERRO INESPERADO durante a extração: {e}"
+            return
+        finally:
+            self._arquivo = None
+
+        self.hash_xml = self._resumo.hexdigest()
+        if parte:
+            self.textos += len(parte)
+            yield parte
+        if not self.encontrados:
+            self.erro = _mensagem_sem_alvos(self.parent_tag, self.target_tag)
+        elif not self.textos:
+            self.erro = f"AVISO: Tags <{self.target_tag}> foram encontradas, mas não continham texto."
+
+
 def extrair_textos(arquivo_xml, parent_tag, target_tag):
     """
     Lê um XML e extrai o XPath/texto das tags alvo.
@@ -30,36 +205,19 @@ def extrair_textos(arquivo_xml, parent_tag, target_tag):
     Retorna uma tupla: (sucesso, dados)
     """
     try:
-        tree = ET.parse(arquivo_xml)
-        root = tree.getroot()
-        
-        # --- LÓGICA DE BUSCA APRIMORADA ---
-        # Se o usuário não digitar uma Tag Pai, procuramos a Tag Alvo em todo o documento.
-        if parent_tag:
-            xpath_query = f'.//{parent_tag}/{target_tag}'
-        else:
-            xpath_query = f'.//{target_tag}' # Busca geral
-
-        elementos_alvo = root.findall(xpath_query)
-
-        if not elementos_alvo:
-            msg = f"AVISO: Nenhuma tag <{target_tag}> foi encontrada."
-            if parent_tag:
-                msg += f" dentro de <{parent_tag}>"
+        # Usa a extração em streaming e apenas monta o dicionário
+        mapa_xpath_texto = {}
+        encontrados = 0
+        for xpath, texto in _iterar_alvos(arquivo_xml, parent_tag, target_tag):
+            encontrados += 1
+            if texto and texto.strip():
+                mapa_xpath_texto[xpath] = texto.strip()
+
+        if not encontrados:
+            msg = _mensagem_sem_alvos(parent_tag, target_tag)
             print(msg)
             return (False, msg)
 
-        # --- CORREÇÃO DO BUG DE XPATH ---
-        # Cria um mapa de pais para que a função get_xpath funcione corretamente
-        parent_map = {c: p for p in root.iter() for c in p}
-        mapa_xpath_texto = {}
-
-        for elem in elementos_alvo:
-            if elem.text and elem.text.strip():
-                # Passa o parent_map para a função corrigida
-                xpath = get_xpath(elem, root, parent_map)
-                mapa_xpath_texto[xpath] = elem.text.strip()
-        
         # Garante que não retornamos um dicionário vazio se nenhum texto for encontrado
         if not mapa_xpath_texto:
             return (False, f"AVISO: Tags <{target_tag}> foram encontradas, mas não continham texto.")
@@ -67,7 +225,7 @@ def extrair_textos(arquivo_xml, parent_tag, target_tag):
         return (True, mapa_xpath_texto)
         
     except ET.ParseError as e:
-        msg = f"ERRO CRÍTICO: O arquivo '{os.path.basename(arquivo_xml)}' não é um XML válido.\n\nDetalhes: {e}"
+        msg = _mensagem_xml_invalido(arquivo_xml, e)
         print(msg)
         return (False, msg)
     except Exception as e:
@@ -0,0 +1,98 @@
+"""
+Glossário compilado, compartilhado pela tradução linha a linha e em lote.
+
+O glossário é lido do disco uma vez e compilado numa única expressão regular
+com o formato de uma trie (um ramo por prefixo comum). O motor de regex do
+Python percorre o texto uma vez só, em C, e em cada posição tenta primeiro
+os termos mais longos: o resultado é a substituição "mais à esquerda, mais
+longa", sem reprocessar o que já foi substituído. O custo por texto é de
+microssegundos mesmo com dezenas de milhares de termos.
+
+A versão compilada fica em cache e é refeita quando o arquivo muda (data de
+modificação ou tamanho).
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+
+_DIRETORIO = os.path.dirname(__file__)
+
+
+def caminho_glossario(idioma=None):
+    """Arquivo de glossário em uso para um idioma; o específico do idioma tem prioridade."""
+    candidatos = []
+    if idioma:
+        candidatos.append(os.path.join(_DIRETORIO, f"glossario_{idioma}.json"))
+    candidatos.append(os.path.join(_DIRETORIO, "glossario.json"))
+    for caminho in candidatos:
+        if os.path.exists(caminho):
+            return caminho
+    return None
+
+
+def _regex_da_trie(termos):
+    """Expressão regular equivalente a uma trie dos termos, preferindo sempre o mais longo."""
+    trie = {}
+    for termo in termos:
+        no = trie
+        for caractere in termo:
+            no = no.setdefault(caractere, {})
+        no[""] = True  # Fim de termo
+
+    def montar(no):
+        ramos = [re.escape(caractere) + montar(filho) for caractere, filho in no.items() if caractere != ""]
+        if not ramos:
+            return ""
+        padrao = ramos[0] if len(ramos) == 1 else "(?:" + "|".join(ramos) + ")"
+        if "" in no:
+            # Um termo termina aqui: os ramos (mais longos) são opcionais e tentados antes
+            padrao = (f"(?:{padrao})" if len(ramos) == 1 else padrao) + "?"
+        return padrao
+
+    return montar(trie)
+
+
+class GlossarioCompilado:
+    def __init__(self, termos, versao=""):
+        self.termos = {original: traducao for original, traducao in termos.items() if original and isinstance(traducao, str)}
+        self.versao = versao
+        self._padrao = re.compile(_regex_da_trie(self.termos)) if self.termos else None
+
+    def __len__(self):
+        return len(self.termos)
+
+    def aplicar(self, texto):
+        """Substitui os termos do glossário; retorna (texto, algum_termo_usado)."""
+        if self._padrao is None:
+            return texto, False
+        usados = []
+
+        def substituir(correspondencia):
+            usados.append(True)
+            return self.termos[correspondencia.group(0)]
+
+        return self._padrao.sub(substituir, texto), bool(usados)
+
+
+_VAZIO = GlossarioCompilado({})
+_CACHE = {}  # caminho -> (mtime_ns, tamanho, GlossarioCompilado)
+_LOCK = threading.Lock()
+
+
+def obter_glossario(idioma=None):
+    """Glossário compilado do idioma; só relê e recompila se o arquivo mudou."""
+    caminho = caminho_glossario(idioma)
+    if not caminho:
+        return _VAZIO
+    estado = os.stat(caminho)
+    with _LOCK:
+        em_cache = _CACHE.get(caminho)
+        if em_cache and em_cache[:2] == (estado.st_mtime_ns, estado.st_size):
+            return em_cache[2]
+        with open(caminho, "rb") as f:
+            conteudo = f.read()
+        glossario = GlossarioCompilado(json.loads(conteudo.decode("utf-8")), hashlib.sha1(conteudo).hexdigest()[:12])
+        _CACHE[caminho] = (estado.st_mtime_ns, estado.st_size, glossario)
+        return glossario
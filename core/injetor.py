@@ -2,36 +2,262 @@
 
 from lxml import etree as ET # 1. MUDANÇA IMPORTANTE: Usando a biblioteca lxml
 import json
+import mmap
+import os
+import re
+from xml.parsers import expat
 
-def injetar_traducoes(arquivo_xml_original: str, mapa_traducoes, arquivo_xml_final: str):
+from .extrator import mapear_xpaths
+
+# Formato das chaves geradas pelo extrator: /root/a[1]/b[3]
+_XPATH_POSICIONAL = re.compile(r'^/[^/\[\]]+(?:/[^/\[\]]+\[\d+\])*$')
+
+# Tag de abertura completa, respeitando '>' dentro de atributos entre aspas
+_TAG_ABERTURA = re.compile(rb'<(?:[^>"\']|"[^"]*"|\'[^\']*\')*>')
+_NOME_TAG = re.compile(rb'<([^\s/>]+)')
+_DECLARACAO_ENCODING = re.compile(rb'^\s*<\?xml[^>]*?encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+_TAMANHO_BLOCO = 8 * 1024 * 1024
+
+
+def indexar_elementos(root, xpaths):
+    """Monta o índice XPath -> elemento (só das chaves pedidas) numa única passada."""
+    return {xpath: elem for elem, xpath in mapear_xpaths(root).items() if xpath in xpaths}
+
+
+def aplicar_traducoes(root, mapa_xpath_traducao, indice=None, anteriores=None):
+    """
+    Aplica as traduções percorrendo a árvore UMA vez (em vez de um root.xpath
+    por chave). Retorna um relatório com as chaves 'aplicadas', 'ausentes'
+    (não existem no documento) e 'nao_utilizadas' (sem tradução, valor None).
+    Chaves que não seguem o formato do extrator caem no root.xpath antigo.
+    'indice' reaproveita um indexar_elementos já feito; se 'anteriores' for um
+    dicionário, recebe elemento -> texto antigo para desfazer a aplicação.
+    """
+    relatorio = {"aplicadas": [], "ausentes": [], "nao_utilizadas": []}
+    pendentes = {}
+    for xpath, traducao in mapa_xpath_traducao.items():
+        if traducao is None:
+            relatorio["nao_utilizadas"].append(xpath)
+        else:
+            pendentes[xpath] = traducao
+
+    if indice is None:
+        indice = indexar_elementos(root, pendentes) if pendentes else {}
+
+    for xpath, traducao in pendentes.items():
+        elem = indice.get(xpath)
+        if elem is None and not _XPATH_POSICIONAL.match(xpath):
+            # Expressão XPath livre: usa a avaliação completa do lxml
+            try:
+                elementos = root.xpath(xpath)
+            except ET.XPathError:
+                elementos = []
+            if elementos and isinstance(elementos[0], ET._Element):
+                elem = elementos[0]
+        if elem is None:
+            relatorio["ausentes"].append(xpath)
+            continue
+        if anteriores is not None and elem not in anteriores:
+            anteriores[elem] = elem.text
+        elem.text = traducao
+        relatorio["aplicadas"].append(xpath)
+
+    return relatorio
+
+
+def _carregar_mapa(mapa_traducoes):
+    """Aceita um dicionário XPath -> Tradução ou o caminho de um JSON com ele."""
+    if isinstance(mapa_traducoes, str):
+        with open(mapa_traducoes, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return mapa_traducoes
+
+
+def _escapar_texto(texto, codificacao):
+    texto = texto.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('\r', '&#13;')
+    return texto.encode(codificacao, 'xmlcharrefreplace')
+
+
+def mapear_trechos(dados, xpaths):
+    """
+    Lê o XML com o expat e devolve {xpath: (inicio, fim, auto_fechada)} com os
+    offsets em BYTES do texto de cada elemento pedido (o mesmo trecho que o
+    lxml chama de elem.text: do fim da tag de abertura até o primeiro nó
+    filho ou a tag de fechamento). Para tags <x/> o trecho é a tag inteira.
+    'dados' pode ser bytes ou um mmap.
+    """
+    trechos = {}
+    # Caminhos que são ancestrais de alguma chave: fora deles não há o que
+    # procurar, então a subárvore é atravessada sem montar XPaths.
+    prefixos = set()
+    for xpath in xpaths:
+        partes = xpath.split('/')
+        for fim in range(2, len(partes)):
+            prefixos.add('/'.join(partes[:fim]))
+    ignorado = [None, None, None]
+    pilha = []  # Cada item: [xpath, contadores dos filhos, trecho aberto ou None]
+    parser = expat.ParserCreate(namespace_separator='}')
+
+    def inicio_elemento(nome, _atributos):
+        if pilha:
+            xpath_pai, contadores, trecho_pai = pilha[-1]
+            if trecho_pai is not None and trecho_pai[1] is None:
+                trecho_pai[1] = parser.CurrentByteIndex
+            if contadores is None:
+                pilha.append(ignorado)
+                return
+            tag = '{' + nome if '}' in nome else nome  # Mesmo formato do ElementTree
+            indice = contadores.get(tag, 0) + 1
+            contadores[tag] = indice
+            xpath = f"{xpath_pai}/{tag}[{indice}]"
+        else:
+            xpath = '/' + ('{' + nome if '}' in nome else nome)
+
+        trecho = None
+        if xpath in xpaths:
+            posicao = parser.CurrentByteIndex
+            abertura = _TAG_ABERTURA.match(dados, posicao)
+            if abertura.group().endswith(b'/>'):
+                trecho = [posicao, abertura.end(), True]
+            else:
+                trecho = [abertura.end(), None, False]
+            trechos[xpath] = trecho
+        pilha.append([xpath, {} if xpath in prefixos else None, trecho])
+
+    def fim_elemento(_nome):
+        trecho = pilha.pop()[2]
+        if trecho is not None and trecho[1] is None:
+            trecho[1] = parser.CurrentByteIndex
+
+    def outro_no(*_args):
+        # Comentários e PIs também encerram o texto do elemento atual
+        trecho = pilha[-1][2] if pilha else None
+        if trecho is not None and trecho[1] is None:
+            trecho[1] = parser.CurrentByteIndex
+
+    parser.StartElementHandler = inicio_elemento
+    parser.EndElementHandler = fim_elemento
+    parser.CommentHandler = outro_no
+    parser.ProcessingInstructionHandler = outro_no
+
+    for posicao in range(0, len(dados), _TAMANHO_BLOCO):
+        parser.Parse(dados[posicao:posicao + _TAMANHO_BLOCO], False)
+    parser.Parse(b'', True)
+
+    return {xpath: tuple(trecho) for xpath, trecho in trechos.items()}
+
+
+def _codificacao_do_documento(dados):
+    declaracao = _DECLARACAO_ENCODING.match(dados[:256])
+    return declaracao.group(1).decode('ascii') if declaracao else 'utf-8'
+
+
+def _escrever_com_trechos(dados, trechos, mapa_xpath_traducao, codificacao, arquivo_saida):
+    """Copia os bytes originais trocando apenas os trechos traduzidos."""
+    substituicoes = sorted(
+        (trechos[xpath], traducao) for xpath, traducao in mapa_xpath_traducao.items()
+        if xpath in trechos and traducao is not None
+    )
+    posicao = 0
+    with memoryview(dados) as visao:
+        for (inicio, fim, auto_fechada), traducao in substituicoes:
+            arquivo_saida.write(visao[posicao:inicio])
+            texto = _escapar_texto(traducao, codificacao)
+            if auto_fechada:
+                # <bio/> vira <bio>texto</bio>
+                tag = bytes(visao[inicio:fim])
+                nome = _NOME_TAG.match(tag).group(1)
+                arquivo_saida.write(tag[:-2].rstrip() + b'>' + texto + b'</' + nome + b'>')
+            else:
+                arquivo_saida.write(texto)
+            posicao = fim
+        for bloco in range(posicao, len(visao), _TAMANHO_BLOCO):
+            arquivo_saida.write(visao[bloco:min(bloco + _TAMANHO_BLOCO, len(visao))])
+
+
+def _gravar_preservando(arquivo_xml_original, trechos, mapa_xpath_traducao, codificacao, arquivo_xml_final):
+    """Grava uma saída a partir dos trechos já mapeados (também roda em processos filhos)."""
+    # Grava num temporário: o destino pode ser o próprio original
+    caminho_temporario = arquivo_xml_final + '.tmp'
+    try:
+        with open(arquivo_xml_original, 'rb') as f_original:
+            with mmap.mmap(f_original.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+                with open(caminho_temporario, 'wb') as f_saida:
+                    _escrever_com_trechos(dados, trechos, mapa_xpath_traducao, codificacao, f_saida)
+        os.replace(caminho_temporario, arquivo_xml_final)
+    finally:
+        if os.path.exists(caminho_temporario):
+            os.remove(caminho_temporario)
+
+    aplicadas = sum(1 for xpath, traducao in mapa_xpath_traducao.items() if xpath in trechos and traducao is not None)
+    ausentes = sum(1 for xpath, traducao in mapa_xpath_traducao.items() if xpath not in trechos and traducao is not None)
+    print(f"Injeção concluída. Itens modificados: {aplicadas}")
+    if ausentes:
+        print(f"AVISO: {ausentes} XPath(s) não foram encontrados no XML.")
+    return True
+
+
+def _mapear_trechos_do_arquivo(arquivo_xml_original, xpaths):
+    """Retorna (codificacao, trechos) ou None se o arquivo não permitir o splice (UTF-16)."""
+    with open(arquivo_xml_original, 'rb') as f_original:
+        with mmap.mmap(f_original.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+            if dados[:2] in (b'\xff\xfe', b'\xfe\xff'):
+                # UTF-16 não é compatível com a busca de tags em bytes
+                return None
+            return _codificacao_do_documento(dados), mapear_trechos(dados, xpaths)
+
+
+def injetar_traducoes_preservando(arquivo_xml_original: str, mapa_traducoes, arquivo_xml_final: str):
+    """
+    Injeta as traduções sem re-serializar o XML: o arquivo original é lido via
+    mmap, os offsets de cada texto alvo são anotados durante o parse e a saída
+    é o original byte a byte, trocando só os trechos traduzidos. Formatação,
+    comentários e encoding ficam intactos e o diff mostra só as linhas mudadas.
+    Retorna True em caso de sucesso, False em caso de falha.
+    """
+    try:
+        mapa_xpath_traducao = _carregar_mapa(mapa_traducoes)
+        mapeamento = _mapear_trechos_do_arquivo(arquivo_xml_original, set(mapa_xpath_traducao))
+        if mapeamento is None:
+            print("AVISO: XML em UTF-16; usando a injeção completa com lxml.")
+            return injetar_traducoes(arquivo_xml_original, mapa_xpath_traducao, arquivo_xml_final)
+
+        codificacao, trechos = mapeamento
+        return _gravar_preservando(arquivo_xml_original, trechos, mapa_xpath_traducao, codificacao, arquivo_xml_final)
+
+    except FileNotFoundError:
+        print(f"ERRO no injetor: Arquivo não encontrado - {arquivo_xml_original} ou {mapa_traducoes}")
+        return False
+    except Exception as e:
+        print(f"ERRO INESPERADO durante a injeção: {e}")
+        return False
+
+
+def injetar_traducoes(arquivo_xml_original: str, mapa_traducoes, arquivo_xml_final: str, preservar_original=False):
     """
     Recebe um mapa (dicionário ou caminho de arquivo JSON) de XPath -> Tradução
     e aplica as mudanças no XML usando o poder do lxml.
+    Com preservar_original=True usa injetar_traducoes_preservando (sem re-serializar).
     Retorna True em caso de sucesso, False em caso de falha.
     """
+    if preservar_original:
+        return injetar_traducoes_preservando(arquivo_xml_original, mapa_traducoes, arquivo_xml_final)
+
     try:
         # 2. LÓGICA MELHORADA: Se recebermos um caminho de arquivo, lemos o JSON.
-        if isinstance(mapa_traducoes, str):
-            with open(mapa_traducoes, 'r', encoding='utf-8') as f:
-                mapa_xpath_traducao = json.load(f)
-        else:
-            mapa_xpath_traducao = mapa_traducoes
+        mapa_xpath_traducao = _carregar_mapa(mapa_traducoes)
 
         # Usamos o parser do lxml, que é mais robusto
         parser = ET.XMLParser(remove_blank_text=True)
         tree = ET.parse(arquivo_xml_original, parser)
         root = tree.getroot()
         
-        itens_modificados = 0
-        
-        for xpath, traducao in mapa_xpath_traducao.items():
-            # 3. MUDANÇA CRÍTICA: root.xpath() do lxml entende os endereços complexos
-            elementos = root.xpath(xpath)
-            if elementos:
-                elementos[0].text = traducao
-                itens_modificados += 1
+        # 3. Uma única passada pela árvore resolve todas as chaves
+        relatorio = aplicar_traducoes(root, mapa_xpath_traducao)
         
-        print(f"Injeção concluída. Itens modificados: {itens_modificados}")
+        print(f"Injeção concluída. Itens modificados: {len(relatorio['aplicadas'])}")
+        if relatorio["ausentes"]:
+            print(f"AVISO: {len(relatorio['ausentes'])} XPath(s) não foram encontrados no XML.")
         tree.write(arquivo_xml_final, encoding='utf-8', xml_declaration=True, pretty_print=True)
         return True
         
@@ -40,4 +266,129 @@ def injetar_traducoes(arquivo_xml_original: str, mapa_traducoes, arquivo_xml_fin
         return False
     except Exception as e:
         print(f"ERRO INESPERADO durante a injeção: {e}")
-        return False
\ No newline at end of file
+        return False
+
+
+def caminho_por_idioma(destino, arquivo_xml_original, idioma):
+    """
+    'destino' pode ser um modelo com {idioma} (ex: 'saida/{idioma}/dialogos.xml')
+    ou uma pasta, onde o arquivo vira <nome>_<idioma>.xml.
+    """
+    if '{idioma}' in destino:
+        return destino.format(idioma=idioma)
+    nome = os.path.splitext(os.path.basename(arquivo_xml_original))[0]
+    return os.path.join(destino, f"{nome}_{idioma}.xml")
+
+
+def injetar_idiomas(arquivo_xml_original: str, mapas_por_idioma, destino: str, processos=1, preservar_original=False):
+    """
+    Gera várias versões traduzidas do mesmo XML com UM único parse.
+    'mapas_por_idioma' é {idioma: mapa (dict ou caminho de JSON)}.
+    O índice de nós é montado uma vez para a união de todas as chaves e cada
+    idioma só grava a sua saída. Com preservar_original=True as saídas podem
+    ser gravadas em paralelo em 'processos' processos.
+    Retorna {idioma: True/False}.
+    """
+    resultados = {}
+    try:
+        mapas = {idioma: _carregar_mapa(mapa) for idioma, mapa in mapas_por_idioma.items()}
+        todas_as_chaves = set()
+        for mapa in mapas.values():
+            todas_as_chaves.update(mapa)
+
+        saidas = {idioma: caminho_por_idioma(destino, arquivo_xml_original, idioma) for idioma in mapas}
+        for caminho in saidas.values():
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+
+        mapeamento = None
+        if preservar_original:
+            mapeamento = _mapear_trechos_do_arquivo(arquivo_xml_original, todas_as_chaves)
+            if mapeamento is None:
+                print("AVISO: XML em UTF-16; usando a injeção completa com lxml.")
+
+        if mapeamento is not None:
+            codificacao, trechos = mapeamento
+            if processos and processos > 1 and len(mapas) > 1:
+                from concurrent.futures import ProcessPoolExecutor
+
+                with ProcessPoolExecutor(max_workers=min(processos, len(mapas))) as executor:
+                    futuros = {
+                        idioma: executor.submit(
+                            _gravar_preservando, arquivo_xml_original,
+                            {xpath: trechos[xpath] for xpath in mapa if xpath in trechos},
+                            mapa, codificacao, saidas[idioma],
+                        )
+                        for idioma, mapa in mapas.items()
+                    }
+                    for idioma, futuro in futuros.items():
+                        try:
+                            resultados[idioma] = futuro.result()
+                        except Exception as e:
+                            print(f"ERRO ao gravar o idioma '{idioma}': {e}")
+                            resultados[idioma] = False
+            else:
+                for idioma, mapa in mapas.items():
+                    resultados[idioma] = _gravar_preservando(arquivo_xml_original, trechos, mapa, codificacao, saidas[idioma])
+            return resultados
+
+        if processos and processos > 1:
+            print("AVISO: a gravação em paralelo exige preservar_original=True; gravando em sequência.")
+
+        parser = ET.XMLParser(remove_blank_text=True)
+        tree = ET.parse(arquivo_xml_original, parser)
+        root = tree.getroot()
+        indice = indexar_elementos(root, todas_as_chaves)
+
+        for idioma, mapa in mapas.items():
+            anteriores = {}
+            try:
+                relatorio = aplicar_traducoes(root, mapa, indice=indice, anteriores=anteriores)
+                print(f"[{idioma}] Injeção concluída. Itens modificados: {len(relatorio['aplicadas'])}")
+                tree.write(saidas[idioma], encoding='utf-8', xml_declaration=True, pretty_print=True)
+                resultados[idioma] = True
+            except Exception as e:
+                print(f"ERRO ao gravar o idioma '{idioma}': {e}")
+                resultados[idioma] = False
+            finally:
+                # Devolve a árvore ao estado original para o próximo idioma
+                for elem, texto in anteriores.items():
+                    elem.text = texto
+        return resultados
+
+    except FileNotFoundError as e:
+        print(f"ERRO no injetor: Arquivo não encontrado - {e.filename}")
+    except Exception as e:
+        print(f"ERRO INESPERADO durante a injeção: {e}")
+    return {idioma: resultados.get(idioma, False) for idioma in mapas_por_idioma}
+
+
+def main(argv=None):
+    """Linha de comando: python -m core.injetor original.xml --idioma pt=pt.json --idioma es=es.json --saida saida/"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Injeta traduções em um XML para um ou mais idiomas com um único parse.")
+    parser.add_argument("original", help="XML original do jogo")
+    parser.add_argument("--idioma", action="append", required=True, metavar="IDIOMA=MAPA.json",
+                        help="idioma e o JSON XPath -> tradução (repita para cada idioma)")
+    parser.add_argument("--saida", required=True,
+                        help="pasta de saída ou modelo com {idioma}, ex: saida/{idioma}/dialogos.xml")
+    parser.add_argument("--processos", type=int, default=1, help="processos para gravar as saídas em paralelo")
+    parser.add_argument("--preservar", action="store_true",
+                        help="mantém os bytes do original e troca só os textos traduzidos")
+    args = parser.parse_args(argv)
+
+    mapas = {}
+    for item in args.idioma:
+        idioma, separador, caminho = item.partition("=")
+        if not separador or not idioma or not caminho:
+            parser.error(f"formato inválido em --idioma '{item}', use IDIOMA=MAPA.json")
+        mapas[idioma] = caminho
+
+    resultados = injetar_idiomas(args.original, mapas, args.saida, processos=args.processos, preservar_original=args.preservar)
+    for idioma, sucesso in resultados.items():
+        print(f"{idioma}: {'OK' if sucesso else 'FALHOU'} -> {caminho_por_idioma(args.saida, args.original, idioma)}")
+    return 0 if all(resultados.values()) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
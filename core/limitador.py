@@ -0,0 +1,177 @@
+"""
+Limitador de taxa por provedor/modelo (substitui as pausas fixas).
+
+Cada limitador combina três baldes: requisições por minuto (rpm), tokens
+por minuto (tpm) e requisições por dia (rpd). Em vez de dormir às cegas,
+quem chama pergunta 'reservar()': se houver vaga ela é consumida e o
+retorno é 0; senão o retorno é quantos segundos faltam para a próxima vaga.
+
+Os limites vêm de LIMITES_PADRAO e podem ser sobrescritos no config.json:
+
+    "limites_taxa": {
+        "Gemini": {"rpm": 15, "tpm": 1000000, "rpd": 1500},
+        "Gemini|models/gemini-2.5-pro": {"rpm": 5, "rpd": 100}
+    }
+
+O contador diário fica em limites_uso.json e sobrevive a reinícios.
+"""
+import datetime
+import threading
+import time
+
+from .configuracao import carregar_json, chave_servico, resolver_por_modelo, salvar_json
+
+ARQUIVO_USO = "limites_uso.json"
+
+# Cotas do plano gratuito; None = sem limite. A chave pode ser "servico"
+# ou "servico|modelo" (o nome do modelo é comparado sem o prefixo 'models/').
+LIMITES_PADRAO = {
+    "Gemini": {"rpm": 10, "tpm": 250000, "rpd": 250},
+    "Gemini|gemini-1.5-flash": {"rpm": 15, "tpm": 1000000, "rpd": 1500},
+    "Gemini|gemini-1.5-flash-latest": {"rpm": 15, "tpm": 1000000, "rpd": 1500},
+    "Gemini|gemini-1.5-pro": {"rpm": 2, "tpm": 32000, "rpd": 50},
+    "Gemini|gemini-2.5-pro": {"rpm": 5, "tpm": 250000, "rpd": 100},
+    "DeepL": {"rpm": None, "tpm": None, "rpd": None},
+    "Microsoft Azure": {"rpm": None, "tpm": None, "rpd": None},
+    "Llama 3 (Local)": {"rpm": None, "tpm": None, "rpd": None},
+}
+
+
+def estimar_tokens(texto):
+    """Estimativa grosseira (~4 caracteres por token), suficiente para o balde de tpm."""
+    return max(1, len(texto) // 4)
+
+
+class BaldeDeTokens:
+    """Balde clássico: enche 'capacidade' unidades por minuto, continuamente."""
+
+    def __init__(self, capacidade_por_minuto):
+        self.capacidade = float(capacidade_por_minuto)
+        self.taxa = self.capacidade / 60.0
+        self.disponivel = self.capacidade
+        self.atualizado_em = time.monotonic()
+
+    def _reabastecer(self, agora):
+        self.disponivel = min(self.capacidade, self.disponivel + (agora - self.atualizado_em) * self.taxa)
+        self.atualizado_em = agora
+
+    def espera(self, custo, agora):
+        """Segundos até 'custo' unidades estarem disponíveis (0 se já estão)."""
+        self._reabastecer(agora)
+        custo = min(custo, self.capacidade)  # Um pedido maior que o balde espera o balde cheio
+        falta = custo - self.disponivel
+        return 0.0 if falta <= 0 else falta / self.taxa
+
+    def consumir(self, custo):
+        self.disponivel -= min(custo, self.capacidade)
+
+
+class UsoDiario:
+    """Contadores de requisições por dia, persistidos em JSON."""
+
+    def __init__(self, caminho=ARQUIVO_USO):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._dados = carregar_json(caminho)
+
+    @staticmethod
+    def _hoje():
+        return datetime.date.today().isoformat()
+
+    def contagem(self, chave):
+        with self._lock:
+            registro = self._dados.get(chave)
+            if not registro or registro.get("dia") != self._hoje():
+                return 0
+            return registro.get("requisicoes", 0)
+
+    def incrementar(self, chave):
+        with self._lock:
+            hoje = self._hoje()
+            registro = self._dados.get(chave)
+            if not registro or registro.get("dia") != hoje:
+                registro = {"dia": hoje, "requisicoes": 0}
+                self._dados[chave] = registro
+            registro["requisicoes"] += 1
+            salvar_json(self.caminho, self._dados)
+
+
+def _segundos_ate_amanha():
+    agora = datetime.datetime.now()
+    amanha = datetime.datetime.combine(agora.date() + datetime.timedelta(days=1), datetime.time())
+    return (amanha - agora).total_seconds()
+
+
+class LimitadorDeTaxa:
+    def __init__(self, chave, rpm=None, tpm=None, rpd=None, uso_diario=None):
+        self.chave = chave
+        self.rpm = BaldeDeTokens(rpm) if rpm else None
+        self.tpm = BaldeDeTokens(tpm) if tpm else None
+        self.rpd = rpd
+        self.uso_diario = uso_diario
+        self._lock = threading.Lock()
+
+    def tempo_ate_liberar(self, tokens=0):
+        """Quantos segundos faltam para uma requisição com 'tokens' poder sair."""
+        with self._lock:
+            return self._espera(tokens, time.monotonic())
+
+    def _espera(self, tokens, agora):
+        espera = 0.0
+        if self.rpm:
+            espera = max(espera, self.rpm.espera(1, agora))
+        if self.tpm and tokens:
+            espera = max(espera, self.tpm.espera(tokens, agora))
+        if self.rpd and self.uso_diario and self.uso_diario.contagem(self.chave) >= self.rpd:
+            espera = max(espera, _segundos_ate_amanha())
+        return espera
+
+    def reservar(self, tokens=0):
+        """
+        Tenta ocupar uma vaga agora. Retorna 0 se conseguiu (a vaga já foi
+        contabilizada) ou os segundos até a próxima vaga, sem consumir nada.
+        """
+        with self._lock:
+            espera = self._espera(tokens, time.monotonic())
+            if espera > 0:
+                return espera
+            if self.rpm:
+                self.rpm.consumir(1)
+            if self.tpm and tokens:
+                self.tpm.consumir(tokens)
+        if self.rpd and self.uso_diario:
+            self.uso_diario.incrementar(self.chave)
+        return 0.0
+
+
+_LIMITADORES = {}
+_USO_DIARIO = None
+_LOCK_REGISTRO = threading.Lock()
+
+
+def resolver_limites(servico, modelo=None, config_limites=None):
+    """Limites efetivos: config.json tem prioridade sobre os padrões; o modelo sobre o serviço."""
+    return resolver_por_modelo(servico, modelo, (LIMITES_PADRAO, config_limites))
+
+
+def obter_limitador(servico, modelo=None, config_limites=None, arquivo_uso=ARQUIVO_USO):
+    """Limitador compartilhado para (serviço, modelo); criado na primeira chamada."""
+    global _USO_DIARIO
+    chave = chave_servico(servico, modelo)
+    with _LOCK_REGISTRO:
+        limitador = _LIMITADORES.get(chave)
+        if limitador is None:
+            if _USO_DIARIO is None or _USO_DIARIO.caminho != arquivo_uso:
+                _USO_DIARIO = UsoDiario(arquivo_uso)
+            limites = resolver_limites(servico, modelo, config_limites)
+            limitador = LimitadorDeTaxa(
+                chave, rpm=limites.get("rpm"), tpm=limites.get("tpm"), rpd=limites.get("rpd"), uso_diario=_USO_DIARIO,
+            )
+            _LIMITADORES[chave] = limitador
+        return limitador
+
+
+def redefinir_limitadores():
+    """Descarta os limitadores em cache (ex: depois de mudar o config.json)."""
+    with _LOCK_REGISTRO:
+        _LIMITADORES.clear()
@@ -0,0 +1,158 @@
+"""
+Empacotamento de lotes por orçamento de tokens (substitui o tamanho fixo).
+
+Um lote com 120 biografias longas estoura o limite de saída do modelo e a
+resposta vem cortada (itens "pulados"); 120 rótulos curtos desperdiçam a cota
+de requisições. Aqui cada texto tem a sua saída estimada (tokens do texto x
+FATOR_SAIDA + o envelope JSON {"id": n, "text": ...} do item) e os itens vão entrando no lote,
+na ordem, até o orçamento do modelo acabar.
+
+O orçamento aprende com o que acontece: se um lote volta com itens faltando
+no fim (resposta truncada), ele encolhe para perto do que coube de fato; uma
+sequência de lotes cheios sem perdas o deixa crescer de novo, devagar, até o
+valor configurado (mas sempre abaixo de onde a última truncagem aconteceu). O valor aprendido fica em orcamentos_lote.json. Os padrões
+podem ser sobrescritos no config.json:
+
+    "orcamentos_lote": {
+        "Gemini": {"saida": 6000, "itens": 200},
+        "Gemini|gemini-2.5-pro": {"saida": 20000}
+    }
+"""
+import json
+import math
+import threading
+
+from .configuracao import carregar_json, chave_servico, resolver_por_modelo, salvar_json
+from .limitador import estimar_tokens
+
+ARQUIVO_ORCAMENTOS = "orcamentos_lote.json"
+
+# "saida": tokens de resposta por lote (com folga sob o limite do modelo);
+# "itens": teto de itens por lote, para o modelo não se perder nos IDs.
+ORCAMENTOS_PADRAO = {
+    "Gemini": {"saida": 6000, "itens": 200},
+    "Gemini|gemini-2.5-pro": {"saida": 24000, "itens": 300},
+    "Gemini|gemini-2.5-flash": {"saida": 24000, "itens": 300},
+    "DeepL": {"saida": 30000, "itens": 50},
+    "Microsoft Azure": {"saida": 15000, "itens": 1000},
+    "Llama 3 (Local)": {"saida": 1500, "itens": 40},
+}
+
+FATOR_SAIDA = 1.3  # A tradução costuma ser mais longa que o inglês
+# Envelope de cada item na resposta: {"id": 17, "text": "..."}, com chaves, aspas,
+# dois-pontos e vírgulas virando tokens separados (~11-12 nos tokenizadores BPE)
+TOKENS_POR_ITEM = 12
+ORCAMENTO_MINIMO = 500
+REDUCAO_MAXIMA = 0.85  # Depois de uma truncagem o orçamento cai para no máximo 85% do atual
+CRESCIMENTO = 1.1
+LOTES_PARA_CRESCER = 5  # Lotes cheios seguidos, sem perdas, antes de crescer
+
+
+def custo_saida(texto):
+    """Tokens que o item deve ocupar na resposta (o texto vai escapado como string JSON)."""
+    escapado = json.dumps(texto, ensure_ascii=False)[1:-1]  # \" e \n contam; as aspas estão no envelope
+    return math.ceil(estimar_tokens(escapado) * FATOR_SAIDA) + TOKENS_POR_ITEM
+
+
+class EmpacotadorDeLotes:
+    """
+    'empacotar' é um gerador: cada lote é montado só quando o motor pede o
+    próximo, então um orçamento reduzido por 'registrar' já vale para os
+    lotes seguintes da mesma execução.
+    """
+
+    def __init__(self, chave, saida, itens=None, aprendido=None, ao_aprender=None):
+        self.chave = chave
+        self.teto = saida
+        self.maximo_itens = itens
+        self.orcamento = max(ORCAMENTO_MINIMO, min(saida, aprendido or saida))
+        self.ao_aprender = ao_aprender  # ao_aprender(chave, orcamento): persiste o valor aprendido
+        self.truncagens = 0
+        self._corte = None  # Orçamento em que a última truncagem aconteceu
+        self._sem_perdas = 0
+        self._lock = threading.Lock()
+
+    def empacotar(self, itens):
+        """Divide [(id, texto), ...] em lotes que cabem no orçamento atual, sem mudar a ordem."""
+        lote, ocupado = [], 0
+        for item in itens:
+            custo = custo_saida(item[1])
+            cheio = self.maximo_itens and len(lote) >= self.maximo_itens
+            if lote and (cheio or ocupado + custo > self.orcamento):
+                yield lote
+                lote, ocupado = [], 0
+            lote.append(item)  # Um item sozinho maior que o orçamento vai num lote só dele
+            ocupado += custo
+        if lote:
+            yield lote
+
+    def registrar(self, lote, traducoes):
+        """
+        Ajusta o orçamento pelo resultado de um lote ({id: tradução}, pode ser
+        parcial). Retorna o novo orçamento se ele mudou, senão None.
+        """
+        recebidos = [item for item in lote if item[0] in traducoes]
+        faltando = len(lote) - len(recebidos)
+        with self._lock:
+            anterior = self.orcamento
+            if faltando and len(lote) > 1:
+                # O que voltou é uma boa medida de quanto coube antes do corte
+                entregue = sum(custo_saida(texto) for _id, texto in recebidos)
+                self.orcamento = max(ORCAMENTO_MINIMO, int(min(anterior * REDUCAO_MAXIMA, entregue * 0.9)))
+                self._corte = anterior if self._corte is None else min(self._corte, anterior)
+                self.truncagens += 1
+                self._sem_perdas = 0
+            elif not faltando and sum(custo_saida(texto) for _id, texto in lote) >= 0.8 * anterior:
+                self._sem_perdas += 1
+                # Nunca volta a passar perto de onde já truncou
+                maximo = self.teto if self._corte is None else min(self.teto, int(self._corte * 0.9))
+                if self._sem_perdas >= LOTES_PARA_CRESCER and anterior < maximo:
+                    self.orcamento = min(maximo, int(anterior * CRESCIMENTO))
+                    self._sem_perdas = 0
+            if self.orcamento == anterior:
+                return None
+            novo = self.orcamento
+        if self.ao_aprender:
+            self.ao_aprender(self.chave, novo)
+        return novo
+
+
+class OrcamentosAprendidos:
+    """Orçamentos aprendidos por serviço/modelo, persistidos em JSON."""
+
+    def __init__(self, caminho=ARQUIVO_ORCAMENTOS):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._dados = carregar_json(caminho)
+
+    def obter(self, chave):
+        with self._lock:
+            return self._dados.get(chave, {}).get("saida")
+
+    def atualizar(self, chave, saida):
+        with self._lock:
+            self._dados[chave] = {"saida": saida}
+            salvar_json(self.caminho, self._dados)
+
+
+_APRENDIDOS = None
+_LOCK_REGISTRO = threading.Lock()
+
+
+def resolver_orcamento(servico, modelo=None, config_orcamentos=None):
+    """Orçamento efetivo: config.json tem prioridade sobre os padrões; o modelo sobre o serviço."""
+    return resolver_por_modelo(servico, modelo, (ORCAMENTOS_PADRAO, config_orcamentos), base={"saida": 4000, "itens": None})
+
+
+def obter_empacotador(servico, modelo=None, config_orcamentos=None, arquivo=ARQUIVO_ORCAMENTOS):
+    """Empacotador novo para (serviço, modelo), partindo do orçamento já aprendido."""
+    global _APRENDIDOS
+    chave = chave_servico(servico, modelo)
+    with _LOCK_REGISTRO:
+        if _APRENDIDOS is None or _APRENDIDOS.caminho != arquivo:
+            _APRENDIDOS = OrcamentosAprendidos(arquivo)
+        aprendidos = _APRENDIDOS
+    orcamento = resolver_orcamento(servico, modelo, config_orcamentos)
+    return EmpacotadorDeLotes(
+        chave, orcamento["saida"], orcamento.get("itens"), aprendido=aprendidos.obter(chave), ao_aprender=aprendidos.atualizar,
+    )
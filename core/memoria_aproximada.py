@@ -0,0 +1,188 @@
+"""
+Busca aproximada na memória de tradução (MinHash + LSH sobre trigramas).
+
+O cache exato não ajuda com quase-duplicatas como "Deal 50 damage to X" e
+"Deal 75 damage to X". Aqui cada texto de origem já traduzido vira um
+conjunto de trigramas de caracteres; a similaridade entre dois textos é o
+Jaccard desses conjuntos.
+
+Para não comparar a consulta com a memória inteira, cada texto ganha uma
+assinatura MinHash (one-permutation hashing: um único hash por trigrama,
+distribuído em _CAIXAS caixas) dividida em _BANDAS faixas de _LINHAS valores.
+Textos com alguma faixa idêntica caem no mesmo balde e viram candidatos; só
+eles têm o Jaccard calculado de verdade. Com 12 faixas de 4, um par com
+Jaccard 0.6 vira candidato em ~81% das vezes; com 0.7, em ~96%.
+Em memórias cheias de variações do mesmo texto, a busca percorre no máximo
+MAXIMO_POR_BALDE entradas por balde e só calcula o Jaccard dos
+MAXIMO_VERIFICACOES candidatos que mais compartilham faixas: o tempo fica
+limitado, ao custo de às vezes devolver o segundo ou terceiro melhor.
+
+Os baldes são tabelas de arrays (cabeça + próximo, como listas encadeadas)
+em vez de dicionários, para caber centenas de milhares de entradas na
+memória. O índice vive só na memória do processo: os hashes de str do Python
+mudam a cada execução, então ele é remontado a partir do SQLite ao abrir.
+"""
+import heapq
+import threading
+from array import array
+
+LIMIAR_PADRAO = 0.6
+MAXIMO_VERIFICACOES = 64  # Candidatos com Jaccard calculado por consulta
+MAXIMO_POR_BALDE = 64  # Passos por lista encadeada (as entradas mais recentes vêm primeiro)
+
+_BANDAS = 12
+_LINHAS = 4
+_CAIXAS = _BANDAS * _LINHAS
+_VAZIO = 1 << 62
+_DESLOCAMENTO = 1 << 56  # Distingue valores emprestados por caixas vizinhas
+_MASCARA_HASH = (1 << 61) - 1
+_BITS_INICIAIS = 12
+
+
+def normalizar(texto):
+    return " ".join(texto.lower().split())
+
+
+def trigramas(texto):
+    """Conjunto de trigramas do texto normalizado (com bordas marcadas por espaços)."""
+    texto = f"  {normalizar(texto)} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def assinatura_minhash(gramas):
+    """Assinatura com _CAIXAS valores; caixas vazias herdam a próxima caixa cheia (densificação)."""
+    caixas = [_VAZIO] * _CAIXAS
+    for grama in gramas:
+        valor = hash(grama) & _MASCARA_HASH
+        caixa = valor % _CAIXAS
+        valor //= _CAIXAS
+        if valor < caixas[caixa]:
+            caixas[caixa] = valor
+    if _VAZIO not in caixas or not gramas:
+        return caixas
+
+    assinatura = list(caixas)
+    for caixa, valor in enumerate(caixas):
+        if valor == _VAZIO:
+            distancia = 1
+            while caixas[(caixa + distancia) % _CAIXAS] == _VAZIO:
+                distancia += 1
+            assinatura[caixa] = caixas[(caixa + distancia) % _CAIXAS] + distancia * _DESLOCAMENTO
+    return assinatura
+
+
+def _chaves_das_faixas(assinatura):
+    return [
+        hash(tuple(assinatura[faixa * _LINHAS:(faixa + 1) * _LINHAS])) & 0xFFFFFFFF
+        for faixa in range(_BANDAS)
+    ]
+
+
+def jaccard(a, b):
+    comuns = len(a & b)
+    return comuns / (len(a) + len(b) - comuns) if comuns else 0.0
+
+
+class IndiceAproximado:
+    """
+    Índice incremental: 'adicionar' pode ser chamado a qualquer momento (por
+    exemplo, a cada tradução aprovada) e de qualquer thread.
+    """
+
+    def __init__(self, limiar=LIMIAR_PADRAO, maximo_verificacoes=MAXIMO_VERIFICACOES):
+        self.limiar = limiar
+        self.maximo_verificacoes = maximo_verificacoes
+        self._textos = []
+        self._traducoes = []
+        self._por_texto = {}  # texto -> id (o mesmo texto não é indexado duas vezes)
+        self._chaves = [array("I") for _ in range(_BANDAS)]  # Chave de cada entrada, por faixa
+        self._proximos = [array("i") for _ in range(_BANDAS)]
+        self._cabecas = []
+        self._mascara = 0
+        self._montar_tabelas(_BITS_INICIAIS)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._textos)
+
+    def _montar_tabelas(self, bits):
+        """(Re)cria as tabelas de baldes com 2**bits posições por faixa."""
+        self._mascara = (1 << bits) - 1
+        self._cabecas = [array("i", [-1]) * (1 << bits) for _ in range(_BANDAS)]
+        for faixa in range(_BANDAS):
+            cabecas, proximos = self._cabecas[faixa], self._proximos[faixa]
+            for entrada, chave in enumerate(self._chaves[faixa]):
+                posicao = chave & self._mascara
+                proximos[entrada] = cabecas[posicao]
+                cabecas[posicao] = entrada
+
+    def adicionar(self, texto, traducao):
+        if not texto or not traducao:
+            return
+        with self._lock:
+            existente = self._por_texto.get(texto)
+            if existente is not None:
+                self._traducoes[existente] = traducao  # Só atualiza a tradução
+                return
+            gramas = trigramas(texto)
+            chaves = _chaves_das_faixas(assinatura_minhash(gramas))
+            novo_id = len(self._textos)
+            self._textos.append(texto)
+            self._traducoes.append(traducao)
+            self._por_texto[texto] = novo_id
+            for faixa, chave in enumerate(chaves):
+                posicao = chave & self._mascara
+                self._chaves[faixa].append(chave)
+                self._proximos[faixa].append(self._cabecas[faixa][posicao])
+                self._cabecas[faixa][posicao] = novo_id
+            if len(self._textos) > self._mascara:
+                # Mantém em média menos de um texto por balde
+                self._montar_tabelas(self._mascara.bit_length() + 1)
+
+    def adicionar_varios(self, pares):
+        for texto, traducao in pares:
+            self.adicionar(texto, traducao)
+
+    def buscar(self, texto, limite=3, limiar=None):
+        """
+        Até 'limite' entradas parecidas com 'texto', da mais para a menos
+        parecida: [(similaridade, texto_original, traducao), ...].
+        """
+        limiar = self.limiar if limiar is None else limiar
+        gramas = trigramas(texto)
+        if not gramas:
+            return []
+        chaves = _chaves_das_faixas(assinatura_minhash(gramas))
+
+        with self._lock:
+            # Quantas faixas cada candidato compartilha com a consulta
+            coincidencias = {}
+            for faixa, chave in enumerate(chaves):
+                entrada = self._cabecas[faixa][chave & self._mascara]
+                chaves_da_faixa, proximos = self._chaves[faixa], self._proximos[faixa]
+                passos = 0
+                while entrada != -1 and passos < MAXIMO_POR_BALDE:
+                    if chaves_da_faixa[entrada] == chave:  # Ignora colisões da máscara
+                        coincidencias[entrada] = coincidencias.get(entrada, 0) + 1
+                    entrada = proximos[entrada]
+                    passos += 1
+
+            candidatos = coincidencias
+            if len(coincidencias) > self.maximo_verificacoes:
+                candidatos = heapq.nlargest(self.maximo_verificacoes, coincidencias, key=coincidencias.get)
+
+            encontrados = []
+            for candidato in candidatos:
+                similaridade = jaccard(gramas, trigramas(self._textos[candidato]))
+                if similaridade >= limiar:
+                    encontrados.append((similaridade, candidato))
+
+            melhores = heapq.nlargest(limite, encontrados)
+            return [(similaridade, self._textos[i], self._traducoes[i]) for similaridade, i in melhores]
+
+
+def carregar_indice(memoria, idioma_destino, limiar=LIMIAR_PADRAO):
+    """Monta o índice com todas as traduções da memória para um idioma de destino."""
+    indice = IndiceAproximado(limiar)
+    indice.adicionar_varios(memoria.listar_pares(idioma_destino))
+    return indice
@@ -0,0 +1,303 @@
+"""
+Memória de tradução persistente (SQLite) na frente de todos os provedores.
+
+Cada tradução é guardada sob o hash de (texto original, idioma de origem,
+idioma de destino, serviço, modelo, versão do glossário). Antes de chamar a
+API, quem traduz consulta a memória; só o que faltar vai para a rede. Linhas
+repetidas como "Attack!" são traduzidas uma única vez. Traduções aprovadas
+pelo usuário ficam num contexto sem serviço nem modelo (contexto_aprovado) e
+valem para qualquer provedor, com prioridade sobre as da máquina.
+
+O arquivo tem um tamanho máximo (em entradas); ao passar dele, as entradas
+usadas há mais tempo são descartadas (LRU). Uso pela linha de comando:
+
+    python -m core.memoria_traducao estatisticas
+    python -m core.memoria_traducao importar traducoes.csv --destino pt --modelo gemini-1.5-flash
+    python -m core.memoria_traducao importar textos_traduzidos_checkpoint.jsonl \
+        --xml dialogos.xml --alvo bio --pai baseVillain --destino pt
+"""
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+ARQUIVO_MEMORIA = "memoria_traducao.sqlite3"
+TAMANHO_MAXIMO_PADRAO = 200000  # Entradas
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS traducoes (
+    chave TEXT PRIMARY KEY,
+    texto TEXT NOT NULL,
+    traducao TEXT NOT NULL,
+    idioma_origem TEXT NOT NULL,
+    idioma_destino TEXT NOT NULL,
+    servico TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    versao_glossario TEXT NOT NULL,
+    criado_em REAL NOT NULL,
+    usado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_traducoes_usado_em ON traducoes (usado_em);
+"""
+
+# Limite de parâmetros por consulta do SQLite (SQLITE_MAX_VARIABLE_NUMBER antigo)
+_PARAMETROS_POR_CONSULTA = 900
+
+
+def contexto_memoria(idioma_origem, idioma_destino, servico, modelo="", versao_glossario=""):
+    """Tudo o que, além do texto, distingue uma tradução da outra na memória."""
+    return (idioma_origem or "", idioma_destino or "", servico or "", modelo or "", versao_glossario or "")
+
+
+# Serviço das traduções revisadas pelo usuário (contexto_aprovado)
+SERVICO_MANUAL = "Manual"
+
+
+def contexto_aprovado(contexto):
+    """O mesmo contexto sem serviço nem modelo: onde ficam as traduções aprovadas pelo usuário."""
+    idioma_origem, idioma_destino, _servico, _modelo, versao_glossario = contexto
+    return (idioma_origem, idioma_destino, SERVICO_MANUAL, "", versao_glossario)
+
+
+def chave_memoria(texto, contexto):
+    bruto = "\x1f".join((texto,) + tuple(contexto))
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+def _pedacos(lista, tamanho=_PARAMETROS_POR_CONSULTA):
+    for i in range(0, len(lista), tamanho):
+        yield lista[i:i + tamanho]
+
+
+class MemoriaTraducao:
+    """
+    Acesso thread-safe ao banco: a mesma instância pode ser usada pela
+    interface e pelas threads do motor de tradução ao mesmo tempo.
+    """
+
+    def __init__(self, caminho=ARQUIVO_MEMORIA, tamanho_maximo=TAMANHO_MAXIMO_PADRAO):
+        self.caminho = caminho
+        self.tamanho_maximo = tamanho_maximo
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        if caminho != ":memory:":
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.executescript(_ESQUEMA)
+        # Contado uma vez aqui e ajustado a cada gravação/descarte, sem COUNT(*) por escrita
+        self._entradas = self._conexao.execute("SELECT COUNT(*) FROM traducoes").fetchone()[0]
+
+    def buscar(self, texto, contexto):
+        """Tradução guardada para 'texto' ou None."""
+        return self.buscar_varios([texto], contexto).get(texto)
+
+    def buscar_varios(self, textos, contexto):
+        """
+        Retorna {texto: tradução} só para os textos que estão na memória. Uma
+        tradução aprovada pelo usuário tem prioridade sobre a do provedor.
+        """
+        aprovado = contexto_aprovado(contexto) if contexto[2] != SERVICO_MANUAL else None
+        chaves = {}  # chave -> (texto, é aprovada)
+        for texto in textos:
+            chaves.setdefault(chave_memoria(texto, contexto), (texto, aprovado is None))
+            if aprovado is not None:
+                chaves.setdefault(chave_memoria(texto, aprovado), (texto, True))
+        encontrados = {}
+        with self._lock:
+            aprovados = set()
+            for pedaco in _pedacos(list(chaves)):
+                marcadores = ",".join("?" * len(pedaco))
+                cursor = self._conexao.execute(
+                    f"SELECT chave, traducao FROM traducoes WHERE chave IN ({marcadores})", pedaco
+                )
+                for chave, traducao in cursor:
+                    texto, e_aprovada = chaves[chave]
+                    if e_aprovada:
+                        aprovados.add(texto)
+                    elif texto in aprovados:
+                        continue
+                    encontrados[texto] = traducao
+                if encontrados:
+                    # Marca como usadas agora (ordem da LRU)
+                    self._conexao.execute(
+                        f"UPDATE traducoes SET usado_em = ? WHERE chave IN ({marcadores})", [time.time()] + pedaco
+                    )
+            self._conexao.commit()
+            self.acertos += len(encontrados)
+            self.falhas += len(set(textos)) - len(encontrados)
+        return encontrados
+
+    def gravar(self, texto, traducao, contexto):
+        self.gravar_varios([(texto, traducao)], contexto)
+
+    def gravar_varios(self, pares, contexto):
+        """Guarda [(texto, tradução), ...]; retorna quantos pares foram gravados."""
+        agora = time.time()
+        linhas = [
+            (chave_memoria(texto, contexto), texto, traducao) + tuple(contexto) + (agora, agora)
+            for texto, traducao in pares
+            if texto and traducao
+        ]
+        if not linhas:
+            return 0
+        with self._lock:
+            novas = set(linha[0] for linha in linhas) - self._chaves_existentes([linha[0] for linha in linhas])
+            self._conexao.executemany(
+                "INSERT INTO traducoes (chave, texto, traducao, idioma_origem, idioma_destino, servico, modelo,"
+                " versao_glossario, criado_em, usado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(chave) DO UPDATE SET traducao = excluded.traducao, usado_em = excluded.usado_em",
+                linhas,
+            )
+            self._entradas += len(novas)
+            self._descartar_excesso()
+            self._conexao.commit()
+        return len(linhas)
+
+    def _chaves_existentes(self, chaves):
+        """Quais destas chaves já estão no banco (busca pela chave primária)."""
+        existentes = set()
+        for pedaco in _pedacos(chaves):
+            marcadores = ",".join("?" * len(pedaco))
+            cursor = self._conexao.execute(f"SELECT chave FROM traducoes WHERE chave IN ({marcadores})", pedaco)
+            existentes.update(chave for (chave,) in cursor)
+        return existentes
+
+    def _descartar_excesso(self):
+        if not self.tamanho_maximo:
+            return
+        excesso = self._entradas - self.tamanho_maximo
+        if excesso > 0:
+            cursor = self._conexao.execute(
+                "DELETE FROM traducoes WHERE chave IN (SELECT chave FROM traducoes ORDER BY usado_em LIMIT ?)",
+                (excesso,),
+            )
+            self._entradas -= cursor.rowcount
+
+    def listar_pares(self, idioma_destino):
+        """(texto, tradução) de um idioma de destino, dos menos aos mais usados recentemente."""
+        with self._lock:
+            return self._conexao.execute(
+                "SELECT texto, traducao FROM traducoes WHERE idioma_destino = ? ORDER BY usado_em",
+                (idioma_destino,),
+            ).fetchall()
+
+    def estatisticas(self):
+        with self._lock:
+            entradas = self._entradas
+        consultas = self.acertos + self.falhas
+        return {
+            "entradas": entradas,
+            "acertos": self.acertos,
+            "falhas": self.falhas,
+            "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+        }
+
+    def limpar(self):
+        with self._lock:
+            self._conexao.execute("DELETE FROM traducoes")
+            self._conexao.commit()
+            self._entradas = 0
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+    # --- Importação de trabalhos anteriores ---
+
+    def importar_arquivo(self, caminho, contexto, originais=None):
+        """
+        Importa traduções de um CSV exportado (colunas 'original_text' e
+        'translated_text') ou de um JSON {xpath: tradução} (JSON traduzido ou
+        checkpoint, inclusive o diário .jsonl). O JSON não traz o texto original, então 'originais'
+        ({xpath: texto original}, do XML carregado) é obrigatório nesse caso.
+        Retorna quantas traduções foram gravadas.
+        """
+        if caminho.lower().endswith(".csv"):
+            with open(caminho, "r", newline="", encoding="utf-8") as f:
+                pares = [(linha.get("original_text"), linha.get("translated_text")) for linha in csv.DictReader(f)]
+        else:
+            if originais is None:
+                raise ValueError("Importar um JSON de traduções exige os textos originais do XML.")
+            if caminho.lower().endswith(".jsonl"):
+                from .checkpoint import DiarioCheckpoint
+
+                mapa = DiarioCheckpoint(caminho).carregar()
+            else:
+                with open(caminho, "r", encoding="utf-8") as f:
+                    mapa = json.load(f)
+            pares = [(originais.get(xpath), traducao) for xpath, traducao in mapa.items()]
+
+        pares = [
+            (original, traducao.strip())
+            for original, traducao in pares
+            if original and isinstance(traducao, str) and traducao.strip() and not traducao.startswith("ERRO")
+        ]
+        return self.gravar_varios(pares, contexto)
+
+
+_MEMORIA_PADRAO = None
+_LOCK_MEMORIA = threading.Lock()
+
+
+def obter_memoria(caminho=ARQUIVO_MEMORIA):
+    """Memória compartilhada do processo, aberta na primeira chamada."""
+    global _MEMORIA_PADRAO
+    with _LOCK_MEMORIA:
+        if _MEMORIA_PADRAO is None or _MEMORIA_PADRAO.caminho != caminho:
+            _MEMORIA_PADRAO = MemoriaTraducao(caminho)
+        return _MEMORIA_PADRAO
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Memória de tradução (SQLite).")
+    parser.add_argument("--banco", default=ARQUIVO_MEMORIA)
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    sub.add_parser("estatisticas", help="número de entradas no banco")
+
+    p_imp = sub.add_parser("importar", help="importa um CSV exportado ou um JSON {xpath: tradução}")
+    p_imp.add_argument("arquivo")
+    p_imp.add_argument("--xml", help="XML original (obrigatório para JSON)")
+    p_imp.add_argument("--alvo", default="bio")
+    p_imp.add_argument("--pai", default="baseVillain")
+    p_imp.add_argument("--origem", default="English")
+    p_imp.add_argument("--destino", default="pt")
+    p_imp.add_argument("--servico", default="Gemini")
+    p_imp.add_argument("--modelo", default="gemini-1.5-flash")
+    args = parser.parse_args(argv)
+
+    memoria = MemoriaTraducao(args.banco)
+    if args.comando == "importar":
+        from .tradutor_api import glossary_version
+
+        originais = None
+        if args.xml:
+            from .extrator import extrair_textos
+
+            sucesso, originais = extrair_textos(args.xml, args.pai, args.alvo)
+            if not sucesso:
+                print(originais)
+                return 1
+        contexto = contexto_memoria(args.origem, args.destino, args.servico, args.modelo, glossary_version(args.destino))
+        try:
+            gravadas = memoria.importar_arquivo(args.arquivo, contexto, originais)
+        except (OSError, ValueError, json.JSONDecodeError) as exc:
+            print(f"Falha ao importar '{args.arquivo}': {exc}")
+            return 1
+        print(f"{gravadas} traduções importadas de {os.path.basename(args.arquivo)}.")
+
+    estatisticas = memoria.estatisticas()
+    print(f"{args.banco}: {estatisticas['entradas']} entradas.")
+    memoria.fechar()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
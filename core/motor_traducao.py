@@ -0,0 +1,373 @@
+"""
+Motor assíncrono de tradução em massa.
+
+Mantém até 'concorrencia' lotes em andamento por provedor (o próximo lote só
+é pedido quando abre uma vaga, então os lotes podem vir de um gerador),
+entrega os resultados NA ORDEM dos lotes para quem grava o checkpoint e
+respeita o cancel_event da interface. Pode ser usado pela GUI (a partir da
+thread operária) ou pela linha de comando:
+
+    python -m core.motor_traducao dialogos.xml --alvo bio --pai baseVillain \
+        --servico "Llama 3 (Local)" --concorrencia 4 --saida traducoes.json
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .limitador import estimar_tokens, obter_limitador
+from .lotes import obter_empacotador
+from .resiliencia import PAUSA_MAXIMA, Cancelado, FalhaDoProvedor, PoliticaDeRetentativa, classificar_erro, obter_disjuntor
+from .tradutor_api import AVAILABLE_SERVICES, OLLAMA_KEEP_ALIVE_BULK, translate_packed_batch
+
+# Requisições simultâneas por provedor quando nada for configurado
+CONCORRENCIA_PADRAO = {
+    "Gemini": 2,
+    "DeepL": 4,
+    "Microsoft Azure": 4,
+    "Llama 3 (Local)": 2,
+}
+
+
+def dividir_em_lotes(itens, tamanho_lote):
+    """Divide uma lista de (xpath, texto) em lotes de até 'tamanho_lote' itens."""
+    return [itens[i:i + tamanho_lote] for i in range(0, len(itens), tamanho_lote)]
+
+
+class MotorTraducao:
+    """
+    'traduzir_lote' recebe um lote [(xpath, texto), ...] e devolve
+    {xpath: tradução} (pode ser parcial) ou None em caso de falha. Ele roda em
+    threads, então pode ser qualquer função bloqueante. Sem ele, o motor usa
+    translate_packed_batch do serviço escolhido.
+    Antes de cada envio o motor pede uma vaga ao 'limitador' (por padrão o do
+    serviço/modelo) e espera o disjuntor do provedor fechar; enquanto espera,
+    avisa 'ao_aguardar(segundos)'. Essa vaga cobre a primeira requisição do
+    lote; as seguintes (reenvio dos IDs que faltaram, itens traduzidos
+    avulsos, divisões do lote) passam por reservar_envio, que os provedores
+    chamam como config["before_request"]. Um 'traduzir_lote' próprio deve
+    repassar reservar_envio da mesma forma.
+    Com 'empacotador' (core/lotes.py) cada lote vai inteiro numa requisição
+    numerada e os itens que faltarem na primeira resposta ajustam o
+    orçamento (avisado em 'ao_ajustar_orcamento(tokens)').
+    Se 'traduzir_lote' levantar um erro transitório (cota, 5xx, rede), o lote
+    é reenviado depois de uma espera exponencial, sem limite de tentativas:
+    uma execução longa sobrevive a uma cota esgotada por horas. Cada espera
+    é avisada em 'ao_erro_transitorio(erro, segundos)'. Um erro permanente
+    encerra a execução com 'falha' e fica em 'ultimo_erro'.
+    Sem "keep_alive" no config, um modelo local fica fixo na memória durante
+    a execução (nenhuma pausa por cota o descarrega) e é liberado quando ela
+    termina, seja qual for o estado; um "keep_alive" explícito é respeitado
+    e nada é descarregado.
+    """
+
+    def __init__(self, servico, config=None, concorrencia=None, cancel_event=None, traduzir_lote=None,
+                 limitador=None, ao_aguardar=None, politica=None, ao_erro_transitorio=None,
+                 empacotador=None, ao_ajustar_orcamento=None):
+        self.servico = servico
+        self._config = config or {}
+        self._descarregar_ao_fim = "keep_alive" not in self._config
+        if self._descarregar_ao_fim:
+            self._config = dict(self._config, keep_alive=OLLAMA_KEEP_ALIVE_BULK)
+        # Sem valor explícito, tantas requisições quantas o servidor atende ao mesmo tempo (Ollama), se souber
+        provedor = AVAILABLE_SERVICES.get(servico)
+        slots = provedor.parallel_slots(self._config) if provedor else None
+        self.concorrencia = max(1, concorrencia or slots or CONCORRENCIA_PADRAO.get(servico, 2))
+        self.cancel_event = cancel_event or threading.Event()
+        self._traduzir_lote = traduzir_lote or self._traduzir_com_servico
+        self.limitador = limitador or obter_limitador(servico, self._config.get("model"), self._config.get("limites_taxa"))
+        self.ao_aguardar = ao_aguardar
+        self.disjuntor = obter_disjuntor(servico)
+        self.politica = politica or PoliticaDeRetentativa(tentativas=None, base=2.0, maximo=PAUSA_MAXIMA)
+        self.ao_erro_transitorio = ao_erro_transitorio
+        self.empacotador = empacotador
+        self.ao_ajustar_orcamento = ao_ajustar_orcamento
+        self.ultimo_erro = None
+        self._local = threading.local()
+
+    def _traduzir_com_servico(self, lote):
+        config = dict(self._config, cancel_event=self.cancel_event, before_request=self.reservar_envio)
+        traducoes, faltando_na_primeira = translate_packed_batch(self.servico, [texto for _xpath, texto in lote], config)
+        if self.empacotador:
+            # O orçamento aprende com a primeira resposta (antes dos reenvios)
+            faltando = {lote[posicao][0] for posicao in faltando_na_primeira}
+            novo_orcamento = self.empacotador.registrar(lote, {xpath: True for xpath, _texto in lote if xpath not in faltando})
+            if novo_orcamento and self.ao_ajustar_orcamento:
+                self.ao_ajustar_orcamento(novo_orcamento)
+        return {xpath: traducao for (xpath, _texto), traducao in zip(lote, traducoes)}
+
+    async def _dormir(self, segundos):
+        """Dorme em passos de até 1s para notar um cancelamento."""
+        fim = time.monotonic() + segundos
+        while True:
+            if self.cancel_event.is_set():
+                raise asyncio.CancelledError
+            restante = fim - time.monotonic()
+            if restante <= 0:
+                return
+            await asyncio.sleep(min(restante, 1.0))
+
+    async def _aguardar_vaga(self, lote):
+        """Espera o limitador liberar o envio do lote (entrada + saída estimadas)."""
+        tokens = 2 * sum(estimar_tokens(texto) for _xpath, texto in lote)
+        avisado = False
+        while True:
+            if self.cancel_event.is_set():
+                raise asyncio.CancelledError
+            espera = self.disjuntor.tempo_ate_liberar()
+            if espera <= 0:
+                espera = self.limitador.reservar(tokens)
+            if espera <= 0:
+                return
+            if not avisado and self.ao_aguardar:
+                self.ao_aguardar(espera)
+                avisado = True
+            # Acorda pelo menos a cada segundo para notar um cancelamento
+            await asyncio.sleep(min(espera, 1.0))
+
+    def _traduzir_com_vaga(self, lote):
+        """Roda na thread do executor; a primeira requisição do lote usa a vaga reservada por _aguardar_vaga."""
+        self._local.vaga_reservada = True
+        try:
+            return self._traduzir_lote(lote)
+        finally:
+            self._local.vaga_reservada = False
+
+    def reservar_envio(self, tokens=0):
+        """
+        Chamado (na thread do lote) antes de cada requisição ao provedor.
+        Bloqueia até o limitador liberar uma vaga; com o cancelamento pedido,
+        levanta FalhaDoProvedor em vez de enviar.
+        """
+        if getattr(self._local, "vaga_reservada", False):
+            self._local.vaga_reservada = False
+            return
+        avisado = False
+        while True:
+            espera = self.limitador.reservar(tokens)
+            if espera <= 0:
+                return
+            if not avisado and self.ao_aguardar:
+                self.ao_aguardar(espera)
+                avisado = True
+            if self.cancel_event.wait(espera):
+                raise Cancelado(self.servico)
+
+    async def traduzir(self, lotes, ao_concluir_lote):
+        """
+        Traduz todos os lotes e chama ao_concluir_lote(indice, lote, traducoes)
+        em ordem crescente de índice. 'lotes' pode ser um gerador: o próximo
+        lote só é montado quando há vaga para enviá-lo. Retorna 'concluido',
+        'cancelado' ou 'falha'.
+        """
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=self.concorrencia, thread_name_prefix=f"motor-{self.servico}")
+        pendentes = iter(lotes)
+        enviados = []  # Lote de cada índice, até ser entregue
+        em_andamento = {}  # tarefa -> índice
+        prontos = {}
+        proximo = 0
+        estado = "concluido"
+        limite = None  # Primeiro lote que falhou: nada dele em diante é entregue
+
+        async def executar_lote(lote):
+            tentativa = 0
+            while True:
+                await self._aguardar_vaga(lote)
+                try:
+                    return await loop.run_in_executor(executor, self._traduzir_com_vaga, lote)
+                except Exception as erro:
+                    transitorio, pedido = classificar_erro(erro)
+                    tentativa += 1
+                    if self.cancel_event.is_set():
+                        raise asyncio.CancelledError
+                    if not transitorio or not self.politica.pode_tentar_de_novo(tentativa):
+                        self.ultimo_erro = erro
+                        return None
+                    if not isinstance(erro, FalhaDoProvedor):
+                        self.disjuntor.registrar_falha(pedido)  # FalhaDoProvedor já passou pelo disjuntor
+                    espera = self.politica.espera(tentativa, pedido)
+                    if self.ao_erro_transitorio:
+                        self.ao_erro_transitorio(erro, espera)
+                    await self._dormir(espera)
+
+        async def vigiar_cancelamento():
+            while not self.cancel_event.is_set():
+                await asyncio.sleep(0.1)
+            for tarefa in em_andamento:
+                tarefa.cancel()
+
+        vigia = asyncio.ensure_future(vigiar_cancelamento())
+        try:
+            while True:
+                # Mantém 'concorrencia' lotes no ar; novos só saem se nada falhou
+                while estado == "concluido" and len(em_andamento) < self.concorrencia and not self.cancel_event.is_set():
+                    lote = next(pendentes, None)
+                    if lote is None:
+                        break
+                    em_andamento[asyncio.ensure_future(executar_lote(lote))] = len(enviados)
+                    enviados.append(lote)
+                if not em_andamento:
+                    break
+
+                terminadas, _ = await asyncio.wait(list(em_andamento), return_when=asyncio.FIRST_COMPLETED)
+                for tarefa in terminadas:
+                    indice = em_andamento.pop(tarefa)
+                    if tarefa.cancelled():
+                        if estado != "falha":  # Após uma falha, os lotes posteriores são cancelados de propósito
+                            estado = "cancelado"
+                        continue
+                    resultado = tarefa.result()
+                    if resultado is None:
+                        # Mantém o comportamento antigo: uma falha de API encerra o processo,
+                        # mas os lotes anteriores que ainda estão em andamento terminam.
+                        estado = "falha"
+                        limite = indice if limite is None else min(limite, indice)
+                        for outra, outro_indice in em_andamento.items():
+                            if outro_indice > limite:
+                                outra.cancel()
+                    else:
+                        prontos[indice] = resultado
+                if estado == "cancelado":
+                    break
+
+                # Entrega em ordem tudo o que já está pronto a partir de 'proximo'
+                while (limite is None or proximo < limite) and proximo in prontos:
+                    ao_concluir_lote(proximo, enviados[proximo], prontos.pop(proximo))
+                    enviados[proximo] = None
+                    proximo += 1
+        finally:
+            vigia.cancel()
+            for tarefa in em_andamento:
+                tarefa.cancel()
+            await asyncio.gather(*em_andamento, vigia, return_exceptions=True)
+            executor.shutdown(wait=False, cancel_futures=True)
+            if self._descarregar_ao_fim:
+                self._descarregar_modelo()
+
+        if estado == "concluido" and self.cancel_event.is_set():
+            estado = "cancelado"
+        return estado
+
+    def _descarregar_modelo(self):
+        provedor = AVAILABLE_SERVICES.get(self.servico)
+        if provedor is None:
+            return
+        try:
+            provedor.unload(self._config)
+        except Exception:
+            pass  # Servidor fora do ar: não há o que liberar
+
+    def executar(self, lotes, ao_concluir_lote):
+        """Versão bloqueante de traduzir(); roda um event loop próprio na thread atual."""
+        return asyncio.run(self.traduzir(lotes, ao_concluir_lote))
+
+
+def main(argv=None):
+    import argparse
+
+    from .extrator import extrair_textos
+
+    parser = argparse.ArgumentParser(description="Tradução em massa de um XML sem interface gráfica.")
+    parser.add_argument("xml", help="XML original do jogo")
+    parser.add_argument("--alvo", required=True, help="tag alvo, ex: bio")
+    parser.add_argument("--pai", default="", help="tag pai, ex: baseVillain")
+    parser.add_argument("--servico", default="Gemini", choices=list(AVAILABLE_SERVICES))
+    parser.add_argument("--modelo", default=None)
+    parser.add_argument("--api-key", default=None, help="padrão: api_key do config.json")
+    parser.add_argument("--idioma", default="pt", help="código do idioma de destino")
+    parser.add_argument("--idioma-nome", default="Portuguese (Brazil)")
+    parser.add_argument("--deepl-idioma", default="PT-BR")
+    parser.add_argument("--ollama-url", default=None)
+    parser.add_argument(
+        "--keep-alive", default=None,
+        help="quanto o Ollama mantém o modelo carregado (-1 = sempre; padrão: fixo até o fim da execução)",
+    )
+    parser.add_argument("--lote", type=int, default=None, help="máximo de itens por lote (padrão: o do orçamento)")
+    parser.add_argument("--orcamento", type=int, default=None, help="tokens de saída por lote (padrão: o do modelo)")
+    parser.add_argument("--concorrencia", type=int, default=None)
+    parser.add_argument("--saida", required=True, help="JSON XPath -> tradução")
+    args = parser.parse_args(argv)
+
+    config_arquivo = {}
+    if os.path.exists("config.json"):
+        with open("config.json", "r", encoding="utf-8") as f:
+            config_arquivo = json.load(f)
+
+    config = {
+        "api_key": args.api_key or config_arquivo.get("api_key"),
+        "limites_taxa": config_arquivo.get("limites_taxa"),
+        "orcamentos_lote": config_arquivo.get("orcamentos_lote"),
+        "target_lang": args.idioma,
+        "target_label": args.idioma_nome,
+        "deepl_lang": args.deepl_idioma,
+    }
+    if args.modelo:
+        config["model"] = args.modelo
+    if args.ollama_url:
+        config["ollama_url"] = args.ollama_url
+    if args.keep_alive:
+        config["keep_alive"] = int(args.keep_alive) if args.keep_alive.lstrip("-").isdigit() else args.keep_alive
+
+    # Modelos locais começam a carregar enquanto o XML é lido
+    def pre_carregar():
+        try:
+            AVAILABLE_SERVICES[args.servico].preload(dict(config, keep_alive=config.get("keep_alive", OLLAMA_KEEP_ALIVE_BULK)))
+        except Exception as erro:
+            print(f"Pré-carregamento do modelo falhou ({erro}); ele será carregado no primeiro lote.")
+
+    threading.Thread(target=pre_carregar, daemon=True).start()
+
+    sucesso, dados = extrair_textos(args.xml, args.pai, args.alvo)
+    if not sucesso:
+        print(dados)
+        return 1
+
+    # Textos repetidos vão para a API uma vez só; a tradução vale para todos os XPaths
+    xpaths_por_texto = {}
+    for xpath, texto in dados.items():
+        xpaths_por_texto.setdefault(texto, []).append(xpath)
+    empacotador = obter_empacotador(args.servico, config.get("model"), config["orcamentos_lote"])
+    if args.orcamento:
+        empacotador.teto = empacotador.orcamento = args.orcamento
+    if args.lote:
+        empacotador.maximo_itens = args.lote
+    lotes = empacotador.empacotar([(xpaths[0], texto) for texto, xpaths in xpaths_por_texto.items()])
+    traducoes = {}
+    cancelar = threading.Event()
+    inicio = time.perf_counter()
+
+    def concluir(indice, lote, resultado):
+        for xpath, traducao in resultado.items():
+            for mesmo_texto in xpaths_por_texto[dados[xpath]]:
+                traducoes[mesmo_texto] = traducao
+        print(f"Lote {indice + 1} concluído: {len(lote)} textos ({len(traducoes)}/{len(dados)} itens).")
+
+    def aguardando(segundos):
+        print(f"Limite de taxa atingido: próximo envio em {segundos:.0f}s.")
+
+    def erro_transitorio(erro, segundos):
+        print(f"{erro} Nova tentativa do lote em {segundos:.0f}s.")
+
+    motor = MotorTraducao(args.servico, config, concorrencia=args.concorrencia, cancel_event=cancelar, ao_aguardar=aguardando,
+                          ao_erro_transitorio=erro_transitorio, empacotador=empacotador,
+                          ao_ajustar_orcamento=lambda tokens: print(f"Orçamento por lote ajustado para {tokens} tokens de saída."))
+    try:
+        estado = motor.executar(lotes, concluir)
+    except KeyboardInterrupt:
+        cancelar.set()
+        estado = "cancelado"
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(traducoes, f, indent=4, ensure_ascii=False)
+    duracao = time.perf_counter() - inicio
+    if motor.ultimo_erro:
+        print(f"Erro: {motor.ultimo_erro}")
+    print(f"{estado}: {len(traducoes)} itens em {duracao:.1f}s -> {args.saida}")
+    return 0 if estado == "concluido" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
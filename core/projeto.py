@@ -0,0 +1,156 @@
+"""
+Modelo em memória do projeto carregado: uma linha por texto extraído do XML.
+
+Os dados ficam em colunas paralelas (xpaths, originais, traduções e o
+estado de cada linha num array de bytes), com um índice xpath -> linha.
+A tabela da interface é só uma visão: assina o modelo e redesenha as linhas
+visíveis que mudaram. Exportar, importar e montar a lista de pendentes
+percorrem listas Python, sem chamadas ao Tcl por linha.
+
+As contagens por estado são ajustadas a cada mudança (O(1)), então o
+progresso é só uma leitura.
+"""
+import sys
+from array import array
+
+NAO_TRADUZIDO = "nao_traduzido"
+TRADUZINDO = "traduzindo"
+TRADUZIDO = "traduzido"
+APROVADO = "aprovado"  # Revisado e aprovado pelo usuário
+ERRO = "erro"
+
+ESTADOS = (NAO_TRADUZIDO, TRADUZINDO, TRADUZIDO, APROVADO, ERRO)
+CONCLUIDOS = (TRADUZIDO, APROVADO)  # O que conta como feito na barra de progresso
+_CODIGO = {estado: codigo for codigo, estado in enumerate(ESTADOS)}
+
+
+class ModeloProjeto:
+    """
+    Deve ser alterado só pela thread da interface; as threads operárias
+    podem ler. Quem assina recebe a lista das linhas alteradas, ou None
+    quando o conjunto de linhas mudou (carga, acréscimo, limpeza).
+    """
+
+    def __init__(self):
+        self._assinantes = []
+        self.limpar(avisar=False)
+
+    # --- Carga ---
+    def limpar(self, avisar=True):
+        self.xpaths = []
+        self.originais = []
+        self.traducoes = []
+        self.estados = array("B")
+        self._indice = {}
+        self._contagem = [0] * len(ESTADOS)
+        if avisar:
+            self._avisar(None)
+
+    def carregar(self, mapa):
+        """Troca o conteúdo por {xpath: texto original}, tudo sem tradução."""
+        self.limpar(avisar=False)
+        self.acrescentar(mapa.items())
+
+    def acrescentar(self, pares):
+        """Acrescenta linhas (xpath, original) no fim, sem tradução; xpaths repetidos são ignorados."""
+        inicio = len(self.xpaths)
+        for xpath, original in pares:
+            xpath = sys.intern(xpath)  # Os mesmos trechos de caminho se repetem em milhares de linhas
+            if xpath in self._indice:
+                continue
+            self._indice[xpath] = len(self.xpaths)
+            self.xpaths.append(xpath)
+            self.originais.append(original)
+        novas = len(self.xpaths) - inicio
+        self.traducoes.extend([""] * novas)
+        self.estados.extend(bytes(novas))  # Código 0 = NAO_TRADUZIDO
+        self._contagem[_CODIGO[NAO_TRADUZIDO]] += novas
+        self._avisar(None)
+        return novas
+
+    # --- Leitura ---
+    def __len__(self):
+        return len(self.xpaths)
+
+    def __contains__(self, xpath):
+        return xpath in self._indice
+
+    def linha(self, xpath):
+        return self._indice.get(xpath)
+
+    def original(self, xpath):
+        return self.originais[self._indice[xpath]]
+
+    def traducao(self, xpath):
+        return self.traducoes[self._indice[xpath]]
+
+    def estado(self, xpath):
+        linha = self._indice.get(xpath)
+        return ESTADOS[self.estados[linha]] if linha is not None else None
+
+    def estado_da_linha(self, linha):
+        return ESTADOS[self.estados[linha]]
+
+    def linhas(self):
+        """(xpath, original, tradução) de todas as linhas, na ordem do XML."""
+        return zip(self.xpaths, self.originais, self.traducoes)
+
+    def traduzidas(self):
+        """{xpath: tradução} das linhas com tradução preenchida."""
+        return {xpath: traducao for xpath, traducao in zip(self.xpaths, self.traducoes) if traducao.strip()}
+
+    def pendentes(self, excluir=()):
+        """(xpath, original) das linhas cujo xpath não está em 'excluir' (ex: o checkpoint)."""
+        return [(xpath, original) for xpath, original in zip(self.xpaths, self.originais) if xpath not in excluir]
+
+    @property
+    def contagem(self):
+        return dict(zip(ESTADOS, self._contagem))
+
+    @property
+    def concluidos(self):
+        return sum(self._contagem[_CODIGO[estado]] for estado in CONCLUIDOS)
+
+    def progresso(self):
+        """Fração das linhas concluídas (0 sem linhas)."""
+        return self.concluidos / len(self.xpaths) if self.xpaths else 0
+
+    # --- Alteração ---
+    def _mudar(self, linha, estado, traducao):
+        if traducao is not None:
+            self.traducoes[linha] = traducao
+        if estado is not None:
+            codigo = _CODIGO[estado]
+            anterior = self.estados[linha]
+            if anterior != codigo:
+                self._contagem[anterior] -= 1
+                self._contagem[codigo] += 1
+                self.estados[linha] = codigo
+
+    def definir(self, xpath, estado=None, traducao=None):
+        """Muda o estado e/ou a tradução de uma linha (None = mantém)."""
+        if estado is not None and estado not in _CODIGO:
+            raise ValueError(f"Estado desconhecido: {estado}")
+        linha = self._indice[xpath]
+        self._mudar(linha, estado, traducao)
+        self._avisar([linha])
+
+    def definir_varios(self, traducoes, estado=TRADUZIDO):
+        """Aplica {xpath: tradução} de uma vez, ignorando xpaths fora do projeto; retorna quantas linhas mudaram."""
+        alteradas = []
+        for xpath, traducao in traducoes.items():
+            linha = self._indice.get(xpath)
+            if linha is not None:
+                self._mudar(linha, estado, traducao)
+                alteradas.append(linha)
+        if alteradas:
+            self._avisar(alteradas)
+        return len(alteradas)
+
+    # --- Assinantes (a tabela da interface) ---
+    def assinar(self, funcao):
+        self._assinantes.append(funcao)
+
+    def _avisar(self, linhas):
+        for funcao in self._assinantes:
+            funcao(linhas)
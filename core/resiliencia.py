@@ -0,0 +1,226 @@
+"""
+Retentativas, espera exponencial e disjuntor (circuit breaker) por provedor.
+
+Todo erro de um provedor é classificado como:
+
+  * transitório: 429, 5xx, 408, timeouts e quedas de conexão. Vale tentar de
+    novo depois de uma espera exponencial com jitter, ou do tempo pedido pelo
+    servidor (Retry-After / retry_delay do Gemini), o que for maior;
+  * permanente: o resto (chave inválida, pedido rejeitado...). Repetir não
+    adianta.
+
+Cada provedor tem um disjuntor: depois de FALHAS_PARA_ABRIR falhas
+transitórias seguidas ele abre e ninguém mais chama o provedor até o tempo de
+pausa passar (o tempo dobra a cada reabertura, até PAUSA_MAXIMA). Passada a
+pausa, a próxima chamada serve de teste: sucesso fecha o disjuntor, falha o
+reabre.
+
+Os erros viram FalhaDoProvedor, com a mensagem para o usuário: quem chama
+nunca recebe uma mensagem de erro no lugar de uma tradução. Um cancelamento
+pedido pelo usuário sai como Cancelado e não conta como falha do provedor.
+"""
+import email.utils
+import random
+import re
+import threading
+import time
+
+FALHAS_PARA_ABRIR = 5
+PAUSA_INICIAL = 30.0  # Segundos com o disjuntor aberto na primeira vez
+PAUSA_MAXIMA = 900.0
+
+_STATUS_TRANSITORIOS = {408, 425, 429, 500, 502, 503, 504}
+# Nomes de classe (de requests, google-api-core, deepl e azure-core) de erros de rede/cota
+_CLASSES_TRANSITORIAS = {
+    "ConnectionError", "Timeout", "ConnectTimeout", "ReadTimeout", "ChunkedEncodingError", "TimeoutError",
+    "ConnectionException", "TooManyRequestsException",
+    "ServiceRequestError", "ServiceResponseError",
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+}
+_RETRY_DELAY_GEMINI = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)|retry in ([\d.]+)\s*s", re.IGNORECASE)
+
+
+class FalhaDoProvedor(Exception):
+    """Erro de um provedor já classificado; str(erro) é a mensagem para o usuário."""
+
+    def __init__(self, mensagem, servico=None, transitoria=False, esperar=None, causa=None):
+        super().__init__(mensagem)
+        self.servico = servico
+        self.transitoria = transitoria
+        self.esperar = esperar  # Segundos pedidos pelo servidor (ou até o disjuntor fechar), se souber
+        self.causa = causa
+
+
+class Cancelado(FalhaDoProvedor):
+    """O usuário cancelou: não é falha do provedor e nunca conta no disjuntor."""
+
+    def __init__(self, servico=None, causa=None):
+        super().__init__("Cancelado.", servico, causa=causa)
+
+
+def _status_http(erro):
+    for candidato in (erro, getattr(erro, "response", None)):
+        for atributo in ("status_code", "http_status_code", "code", "status"):
+            valor = getattr(candidato, atributo, None)
+            if isinstance(valor, int) and 100 <= valor < 600:
+                return valor
+    return None
+
+
+def _retry_after(erro):
+    """Segundos pedidos pelo servidor, pelo cabeçalho Retry-After ou pela mensagem do Gemini."""
+    cabecalhos = getattr(getattr(erro, "response", None), "headers", None) or {}
+    try:
+        valor = cabecalhos.get("Retry-After")
+    except AttributeError:
+        valor = None
+    if valor:
+        try:
+            return max(0.0, float(valor))
+        except ValueError:
+            try:
+                data = email.utils.parsedate_to_datetime(valor)
+                return max(0.0, data.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    encontrado = _RETRY_DELAY_GEMINI.search(str(erro))
+    if encontrado:
+        return float(encontrado.group(1) or encontrado.group(2))
+    return None
+
+
+def classificar_erro(erro):
+    """(transitório?, segundos pedidos pelo servidor ou None)."""
+    if isinstance(erro, FalhaDoProvedor):
+        return erro.transitoria, erro.esperar
+    status = _status_http(erro)
+    if status is not None:
+        transitorio = status in _STATUS_TRANSITORIOS
+    else:
+        nomes = {classe.__name__ for classe in type(erro).__mro__}
+        transitorio = bool(nomes & _CLASSES_TRANSITORIAS) or isinstance(erro, (ConnectionError, TimeoutError))
+    return transitorio, (_retry_after(erro) if transitorio else None)
+
+
+class PoliticaDeRetentativa:
+    """Espera exponencial com jitter total ("full jitter"), respeitando o que o servidor pedir."""
+
+    def __init__(self, tentativas=4, base=1.0, maximo=60.0, aleatorio=None):
+        self.tentativas = tentativas  # Tentativas no total (a primeira incluída); None = sem limite
+        self.base = base
+        self.maximo = maximo
+        self._aleatorio = aleatorio or random.Random()
+
+    def espera(self, tentativa, pedido_pelo_servidor=None):
+        """Segundos antes da tentativa seguinte à de número 'tentativa' (a partir de 1)."""
+        teto = min(self.maximo, self.base * (2 ** (tentativa - 1)))
+        espera = self._aleatorio.uniform(0, teto)
+        if pedido_pelo_servidor is not None:
+            # Nunca antes do que o servidor pediu; um pouco de jitter para não chegarem todos juntos
+            espera = max(espera, pedido_pelo_servidor + self._aleatorio.uniform(0, 1))
+        return espera
+
+    def pode_tentar_de_novo(self, tentativa):
+        return self.tentativas is None or tentativa < self.tentativas
+
+
+class Disjuntor:
+    def __init__(self, servico, falhas_para_abrir=FALHAS_PARA_ABRIR, pausa_inicial=PAUSA_INICIAL, pausa_maxima=PAUSA_MAXIMA):
+        self.servico = servico
+        self.falhas_para_abrir = falhas_para_abrir
+        self.pausa_inicial = pausa_inicial
+        self.pausa_maxima = pausa_maxima
+        self.falhas_seguidas = 0
+        self._pausa = pausa_inicial
+        self._aberto_ate = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def aberto(self):
+        return self.tempo_ate_liberar() > 0
+
+    def tempo_ate_liberar(self):
+        """0 se o provedor pode ser chamado agora, senão os segundos até a próxima tentativa."""
+        with self._lock:
+            return max(0.0, self._aberto_ate - time.monotonic())
+
+    def registrar_sucesso(self):
+        with self._lock:
+            self.falhas_seguidas = 0
+            self._pausa = self.pausa_inicial
+            self._aberto_ate = 0.0
+
+    def registrar_falha(self, pedido_pelo_servidor=None):
+        """Conta uma falha transitória; retorna a pausa em segundos se o disjuntor abriu."""
+        with self._lock:
+            self.falhas_seguidas += 1
+            if self.falhas_seguidas < self.falhas_para_abrir:
+                return None
+            pausa = max(self._pausa, pedido_pelo_servidor or 0.0)
+            self._aberto_ate = time.monotonic() + pausa
+            self._pausa = min(self.pausa_maxima, self._pausa * 2)  # Se o teste falhar, a próxima pausa é maior
+            self.falhas_seguidas = self.falhas_para_abrir - 1  # Uma falha no teste reabre na hora
+            return pausa
+
+
+_DISJUNTORES = {}
+_LOCK_REGISTRO = threading.Lock()
+
+
+def obter_disjuntor(servico):
+    """Disjuntor compartilhado do provedor."""
+    with _LOCK_REGISTRO:
+        disjuntor = _DISJUNTORES.get(servico)
+        if disjuntor is None:
+            disjuntor = Disjuntor(servico)
+            _DISJUNTORES[servico] = disjuntor
+        return disjuntor
+
+
+def redefinir_disjuntores():
+    with _LOCK_REGISTRO:
+        _DISJUNTORES.clear()
+
+
+def executar_com_resiliencia(funcao, servico, politica=None, mensagem_de_erro=str, cancel_event=None, dormir=time.sleep):
+    """
+    Chama funcao() com retentativas para erros transitórios. Com o disjuntor
+    aberto não chama nada e falha na hora (transitória, com 'esperar'), para
+    quem chama decidir se aguarda. Qualquer falha sai como FalhaDoProvedor,
+    com mensagem_de_erro(erro) como texto.
+    """
+    politica = politica or PoliticaDeRetentativa()
+    disjuntor = obter_disjuntor(servico)
+    tentativa = 0
+    while True:
+        bloqueio = disjuntor.tempo_ate_liberar()
+        if bloqueio > 0:
+            raise FalhaDoProvedor(
+                f"{servico} pausado após falhas seguidas; nova tentativa em {bloqueio:.0f}s.",
+                servico, transitoria=True, esperar=bloqueio,
+            )
+        tentativa += 1
+        try:
+            resultado = funcao()
+        except Cancelado:
+            raise
+        except Exception as erro:
+            if cancel_event is not None and cancel_event.is_set():
+                raise Cancelado(servico, causa=erro) from erro  # Sem registrar_falha nem nova tentativa
+            transitorio, pedido = classificar_erro(erro)
+            if not transitorio:
+                raise FalhaDoProvedor(mensagem_de_erro(erro), servico, causa=erro) from erro
+            pausa = disjuntor.registrar_falha(pedido)
+            if pausa is not None or not politica.pode_tentar_de_novo(tentativa):
+                raise FalhaDoProvedor(
+                    mensagem_de_erro(erro), servico, transitoria=True, esperar=pausa or pedido, causa=erro,
+                ) from erro
+            espera = politica.espera(tentativa, pedido)
+            if cancel_event is not None:
+                if cancel_event.wait(espera):
+                    raise Cancelado(servico, causa=erro) from erro
+            else:
+                dormir(espera)
+            continue
+        disjuntor.registrar_sucesso()
+        return resultado
@@ -0,0 +1,197 @@
+"""
+Roteamento entre provedores: ordem de prioridade, failover e pedido "hedged".
+
+A política lista os provedores em ordem de preferência. Para cada texto o
+roteador tenta o primeiro disponível; um provedor com o disjuntor aberto ou
+sem vaga no limitador de taxa é pulado na hora (failover), e um que demore
+mais que 'tempo_limite' é abandonado em favor do próximo. Com 'hedge_apos',
+se o primeiro não responder nesse tempo o mesmo texto vai também para o
+próximo da lista e vale a primeira resposta que chegar.
+
+A política vem do config.json, com exceções por projeto (nome do XML):
+
+    "roteamento": {
+        "provedores": ["Gemini", "DeepL", "Llama 3 (Local)"],
+        "hedge_apos": 1.5,
+        "tempo_limite": 20,
+        "chaves": {"DeepL": "...", "Microsoft Azure": "..."},
+        "ollama_url": "http://localhost:11434",
+        "ollama_modelo": "llama3",
+        "projetos": {"dialogos.xml": {"provedores": ["DeepL", "Gemini"]}}
+    }
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .limitador import estimar_tokens, obter_limitador
+from .resiliencia import Cancelado, FalhaDoProvedor, PoliticaDeRetentativa, obter_disjuntor
+from .tradutor_api import AVAILABLE_SERVICES, translate_text
+
+POLITICA_PADRAO = {
+    "provedores": ["Gemini"],
+    "hedge_apos": None,  # Segundos; None = sem pedido duplicado
+    "tempo_limite": 30.0,  # Segundos até desistir de um provedor lento e passar ao próximo
+}
+
+# Com outro provedor na fila, um erro transitório passa adiante em vez de esperar o backoff
+_SEM_RETENTATIVAS = PoliticaDeRetentativa(tentativas=1)
+
+
+def resolver_politica(config_roteamento=None, projeto=None):
+    """Política efetiva: padrões < config.json < exceção do projeto (nome do arquivo XML)."""
+    config_roteamento = config_roteamento or {}
+    politica = dict(POLITICA_PADRAO)
+    politica.update({chave: valor for chave, valor in config_roteamento.items() if chave in POLITICA_PADRAO})
+    if projeto:
+        politica.update((config_roteamento.get("projetos") or {}).get(projeto, {}))
+    politica["provedores"] = [servico for servico in politica["provedores"] if servico in AVAILABLE_SERVICES]
+    return politica
+
+
+def montar_configs(provedores, base, config_roteamento=None, chaves=None, modelos=None):
+    """
+    Configuração de cada provedor a partir da comum ('base': idiomas,
+    exemplos...). Chaves vêm de config_roteamento["chaves"] e de 'chaves'
+    (ex: a do Gemini, guardada à parte). Provedores sem chave ficam de fora.
+    """
+    config_roteamento = config_roteamento or {}
+    chaves = dict(config_roteamento.get("chaves") or {}, **(chaves or {}))
+    modelos = modelos or {}
+    configs = {}
+    for servico in provedores:
+        config = dict(base)
+        if servico == "Llama 3 (Local)":
+            config["ollama_url"] = config_roteamento.get("ollama_url", "http://localhost:11434")
+            config["model"] = config_roteamento.get("ollama_modelo", "llama3")
+        elif chaves.get(servico):
+            config["api_key"] = chaves[servico]
+        else:
+            continue
+        if modelos.get(servico):
+            config["model"] = modelos[servico]
+        configs[servico] = config
+    return configs
+
+
+class Roteador:
+    """
+    'configs' tem a configuração de cada provedor ({servico: config}, já com
+    chave, modelo e idioma). Thread-safe: a interface pode pedir várias
+    sugestões ao mesmo tempo.
+    """
+
+    def __init__(self, politica, configs, config_limites=None, traduzir=translate_text, maximo_threads=4):
+        self.provedores = [servico for servico in politica.get("provedores") or [] if servico in configs]
+        self.hedge_apos = politica.get("hedge_apos")
+        self.tempo_limite = politica.get("tempo_limite")
+        self.configs = configs
+        self.config_limites = config_limites
+        self._traduzir = traduzir
+        self._executor = ThreadPoolExecutor(max_workers=maximo_threads, thread_name_prefix="roteador")
+
+    def _disponivel(self, servico, tokens):
+        """0 se o provedor pode ser chamado agora (e reserva a vaga), senão os segundos de espera."""
+        espera = obter_disjuntor(servico).tempo_ate_liberar()
+        if espera > 0:
+            return espera
+        modelo = self.configs.get(servico, {}).get("model")
+        return obter_limitador(servico, modelo, self.config_limites).reservar(tokens)
+
+    def traduzir(self, texto, ao_trocar=None, cancel_event=None):
+        """
+        Retorna (tradução, serviço que respondeu). Levanta FalhaDoProvedor se
+        nenhum provedor conseguir. 'ao_trocar(servico, motivo)' é avisado
+        quando o roteador deixa um provedor para trás (falha, lentidão, hedge).
+        Com 'cancel_event' sinalizado nenhum pedido novo sai (nem o hedge nem
+        um adiado que estava esperando vaga).
+        """
+        tokens = 2 * estimar_tokens(texto)
+        fila = list(self.provedores)
+        adiados = []  # (espera, servico): pulados por falta de vaga, últimos recursos
+        em_andamento = {}  # futuro -> (servico, início)
+        erros = []
+
+        def iniciar(servico):
+            config = self.configs.get(servico, {})
+            if fila or adiados:
+                config = dict(config, retry_policy=_SEM_RETENTATIVAS)
+            futuro = self._executor.submit(self._traduzir, servico, texto, config)
+            em_andamento[futuro] = (servico, time.monotonic())
+
+        def cancelado():
+            return cancel_event is not None and cancel_event.is_set()
+
+        def lancar():
+            """Próximo da fila que tenha vaga agora."""
+            while fila and not cancelado():
+                servico = fila.pop(0)
+                espera = self._disponivel(servico, tokens)
+                if espera <= 0:
+                    iniciar(servico)
+                    return True
+                adiados.append((espera, servico))
+            return False
+
+        def lancar_adiado():
+            """Sem ninguém livre: espera pelo provedor que libera antes, se não demorar demais."""
+            while adiados and not cancelado():
+                adiados.sort()
+                espera, servico = adiados.pop(0)
+                if self.tempo_limite and espera > self.tempo_limite:
+                    erros.append(f"{servico}: sem vaga nos próximos {espera:.0f}s")
+                    continue
+                if cancel_event is None:
+                    time.sleep(espera)
+                elif cancel_event.wait(espera):
+                    return False
+                espera = self._disponivel(servico, tokens)
+                if espera <= 0:
+                    iniciar(servico)
+                    return True
+                adiados.append((espera, servico))
+            return False
+
+        if not (lancar() or lancar_adiado()):
+            if cancelado():
+                raise Cancelado()
+            raise FalhaDoProvedor("Nenhum provedor disponível para a tradução. " + "; ".join(erros))
+        while em_andamento:
+            mais_antigo = min(inicio for _servico, inicio in em_andamento.values())
+            prazos = []
+            if self.tempo_limite:
+                prazos.append(mais_antigo + self.tempo_limite)
+            if self.hedge_apos and fila and len(em_andamento) == 1:
+                prazos.append(mais_antigo + self.hedge_apos)
+            espera = max(0.0, min(prazos) - time.monotonic()) if prazos else None
+
+            prontos, _ = wait(list(em_andamento), timeout=espera, return_when=FIRST_COMPLETED)
+            for futuro in prontos:
+                servico, _inicio = em_andamento.pop(futuro)
+                try:
+                    return futuro.result(), servico
+                except Exception as erro:
+                    erros.append(f"{servico}: {erro}")
+                    if ao_trocar:
+                        ao_trocar(servico, str(erro))
+
+            if not prontos:
+                # Prazo vencido: abandona quem passou do tempo limite e chama o próximo
+                agora = time.monotonic()
+                for futuro, (servico, inicio) in list(em_andamento.items()):
+                    if self.tempo_limite and agora - inicio >= self.tempo_limite:
+                        del em_andamento[futuro]  # Continua rodando, mas a resposta é ignorada
+                        erros.append(f"{servico}: sem resposta em {self.tempo_limite:.0f}s")
+                        if ao_trocar:
+                            ao_trocar(servico, "lento")
+                hedge = bool(em_andamento)
+                if lancar() and hedge and ao_trocar:
+                    servico = next(iter(em_andamento.values()))[0]
+                    ao_trocar(servico, f"sem resposta em {self.hedge_apos}s; pedido duplicado no próximo")
+            if not em_andamento and not (lancar() or lancar_adiado()):
+                break
+        if cancelado():
+            raise Cancelado()
+        raise FalhaDoProvedor("Nenhum provedor conseguiu traduzir. " + "; ".join(erros))
+
+    def fechar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
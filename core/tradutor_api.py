@@ -1,31 +1,103 @@
 import json
 import os
+import re
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 import deepl
 from azure.ai.translation.text import TextTranslationClient
 from azure.core.credentials import AzureKeyCredential
 import google.generativeai as genai
 from google.api_core.exceptions import NotFound as GoogleNotFound
 
+from .glossario import obter_glossario
+from .limitador import estimar_tokens
+from .memoria_traducao import contexto_memoria, obter_memoria
+from .resiliencia import FalhaDoProvedor, PoliticaDeRetentativa, executar_com_resiliencia
+
 
 class TranslationService:
+    # Per-request limits used by translate_texts to split large jobs.
+    max_batch_items = 1
+    max_batch_chars = None
+    max_batch_bytes = None  # For APIs whose limit is on the encoded request body
+
     def translate(self, text, config):
         raise NotImplementedError
 
+    def translate_batch(self, texts, config):
+        """Translate a list of strings; returns a list in the same order."""
+        return [self.translate(text, config) for text in texts]
+
+    def translate_stream(self, text, config):
+        """Yield the translation in pieces as they arrive; providers without streaming yield it whole."""
+        yield self.translate(text, config)
+
+    def preload(self, config):
+        """Get the provider ready before the first request; only local models need it."""
+
+    def unload(self, config):
+        """Free what preload (or the requests) kept loaded; only local models hold anything."""
+
+    def parallel_slots(self, config):
+        """Requests the provider serves at once, when it can be known; None otherwise."""
+        return None
+
+
+class ClientPool:
+    """
+    Thread-safe cache of provider clients keyed by (service, api_key, model).
+    Building a client (and resolving a Gemini model name) happens once; every
+    later call reuses it, together with its keep-alive HTTP connections.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def get(self, service, api_key, model, factory):
+        key = (service, api_key, model)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = factory()
+                    self._clients[key] = client
+        return client
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+
+CLIENT_POOL = ClientPool()
+_GEMINI_CONFIG_LOCK = threading.Lock()
+_gemini_configured_key = None
+
+
+def _new_http_session(pool_size=16):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_http_session(base_url):
+    """Shared keep-alive session for plain HTTP providers such as Ollama."""
+    return CLIENT_POOL.get("http", None, base_url, _new_http_session)
+
 
 def carregar_glossario(target_lang=None):
     """Load glossary entries; tries language specific file first."""
-    base_dir = os.path.dirname(__file__)
-    candidate_files = []
-    if target_lang:
-        candidate_files.append(os.path.join(base_dir, f"glossario_{target_lang}.json"))
-    candidate_files.append(os.path.join(base_dir, "glossario.json"))
+    return dict(obter_glossario(target_lang).termos)
+
 
-    for path in candidate_files:
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as stream:
-                return json.load(stream)
-    return {}
+def glossary_version(target_lang=None):
+    """Short content hash of the glossary, so edited glossaries don't reuse cached translations."""
+    # _apply_glossary only reads the language specific file for Portuguese
+    return obter_glossario(target_lang if target_lang == "pt" else None).versao
 
 
 
@@ -63,27 +135,159 @@ def get_gemini_model(model_name: str):
         raise last_error
     raise RuntimeError("Nao foi possivel instanciar o modelo Gemini.")
 
+
+def configure_gemini(api_key):
+    """genai.configure is global state: only call it when the key changes."""
+    global _gemini_configured_key
+    with _GEMINI_CONFIG_LOCK:
+        if api_key != _gemini_configured_key:
+            genai.configure(api_key=api_key)
+            _gemini_configured_key = api_key
+
+
+def get_gemini_client(api_key, model_name):
+    """Cached Gemini model for (api_key, model); the name is resolved only once."""
+    configure_gemini(api_key)
+    return CLIENT_POOL.get("Gemini", api_key, model_name, lambda: get_gemini_model(model_name))
+
+
+def _before_request(config, *texts):
+    """
+    Call config["before_request"](estimated_tokens) right before a provider
+    request goes out. One batch can mean several requests (follow-ups for
+    missing ids, single-text fallbacks, resilience retries); the hook lets
+    the caller's rate limiter count every one of them.
+    """
+    hook = config.get("before_request")
+    if hook:
+        hook(2 * sum(estimar_tokens(text) for text in texts))
+
+
+def _apply_glossary(text, target_lang):
+    """Pre-translate glossary terms; returns (text, glossary_used)."""
+    # Only reuse glossary when translating to Brazilian Portuguese.
+    glossary = obter_glossario(target_lang if target_lang == "pt" else None)
+    pretranslated_text, glossary_used = glossary.aplicar(text)
+    return pretranslated_text, glossary_used and target_lang == "pt"
+
+
+def examples_prompt(examples):
+    """Prompt section with (source, translation) pairs from the translation memory."""
+    if not examples:
+        return ""
+    lines = "\n".join(f"{json.dumps(source, ensure_ascii=False)} -> {json.dumps(target, ensure_ascii=False)}"
+                      for source, target in examples)
+    return f"Reference translations of similar texts from this project; keep terminology consistent:\n{lines}\n\n"
+
+
+# Structured output requested from providers that support it (Gemini
+# response_schema, Ollama format) for the numbered batch protocol.
+BATCH_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"id": {"type": "integer"}, "text": {"type": "string"}},
+                "required": ["id", "text"],
+            },
+        },
+    },
+    "required": ["items"],
+}
+# Follow-up requests for ids that came back missing or malformed
+BATCH_RETRIES = 2
+
+_ITEM_START = re.compile(r'\{\s*"id"')
+
+
+def _parse_json_reply(raw_text):
+    """Load a JSON reply, tolerating ```json fences around it."""
+    raw_text = raw_text.strip()
+    if raw_text.startswith("```"):
+        raw_text = raw_text.strip("`")
+        if raw_text.startswith("json"):
+            raw_text = raw_text[len("json"):]
+    return json.loads(raw_text)
+
+
+def _salvage_items(raw_text):
+    """Complete {"id": ..., "text": ...} objects from a reply that is not valid JSON (e.g. cut off)."""
+    decoder = json.JSONDecoder()
+    items = []
+    for match in _ITEM_START.finditer(raw_text):
+        try:
+            item, _end = decoder.raw_decode(raw_text, match.start())
+        except ValueError:
+            continue
+        items.append(item)
+    return items
+
+
+def _numbered_payload(texts):
+    return json.dumps([{"id": i, "text": text} for i, text in enumerate(texts)], ensure_ascii=False)
+
+
+def _collect_numbered_reply(items, count):
+    """Map a [{"id": n, "text": ...}] reply back to positions; missing or empty ones stay None."""
+    results = [None] * count
+    if isinstance(items, dict):
+        items = items.get("items", items.get("translations", []))
+    for item in items if isinstance(items, list) else []:
+        try:
+            index = int(item["id"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        text = item.get("text")
+        if 0 <= index < count and results[index] is None and isinstance(text, str) and text.strip():
+            results[index] = text.strip()
+    return results
+
+
+def translate_numbered(texts, send, retries=BATCH_RETRIES):
+    """
+    Numbered JSON batch protocol. Each request carries the texts as
+    [{"id": n, "text": ...}] with short positional ids (mapped back locally),
+    and send(payload) must return the raw reply text. Ids that come back
+    missing, empty or malformed are re-sent, renumbered, in up to 'retries'
+    follow-up requests; a cut-off reply keeps every item that arrived whole.
+
+    Returns (results, missing_first): results[i] is None for texts still
+    missing after the retries, and missing_first lists the positions missing
+    from the first reply (a truncation signal for the batch packer).
+    """
+    results = [None] * len(texts)
+    pending = list(range(len(texts)))
+    missing_first = None
+    for _attempt in range(retries + 1):
+        if not pending:
+            break
+        raw_text = send(_numbered_payload([texts[i] for i in pending]))
+        try:
+            reply = _parse_json_reply(raw_text)
+        except ValueError:
+            reply = _salvage_items(raw_text)
+        for position, text in zip(pending, _collect_numbered_reply(reply, len(pending))):
+            results[position] = text
+        pending = [position for position in pending if results[position] is None]
+        if missing_first is None:
+            missing_first = list(pending)
+    return results, missing_first or []
+
+
 class GeminiService(TranslationService):
-    def translate(self, text, config):
+    max_batch_items = 50
+    max_batch_chars = 12000
+
+    def _prompt(self, text, config):
         target_lang = (config.get("target_lang") or "pt").lower()
         target_label = config.get("target_label", "Portuguese (Brazil)")
         source_label = config.get("source_label", "English")
 
-        genai.configure(api_key=config.get("api_key"))
-        model = get_gemini_model(config.get("model", "gemini-1.5-flash"))
+        pretranslated_text, glossary_used = _apply_glossary(text, target_lang)
 
-        # Only reuse glossary when translating to Brazilian Portuguese.
-        glossary = carregar_glossario(target_lang if target_lang == "pt" else None)
-        glossary_pairs = sorted(glossary.items(), key=lambda item: len(item[0]), reverse=True)
-        pretranslated_text = text
-        glossary_used = False
-
-        for original_term, target_term in glossary_pairs:
-            if original_term in pretranslated_text:
-                pretranslated_text = pretranslated_text.replace(original_term, target_term)
-                glossary_used = True
-
-        if glossary_used and target_lang == "pt":
+        if glossary_used:
             prompt = (
                 "Refine the following pre-translated sentence so it sounds natural in "
                 f"{target_label}, keeping the words that are already in Portuguese untouched. "
@@ -95,58 +299,218 @@ class GeminiService(TranslationService):
                 f"Translate the following text from {source_label} to {target_label}: "
                 f'"{text}". Reply with the final text only.'
             )
+        return examples_prompt(config.get("examples")) + prompt
 
-        response = model.generate_content(prompt)
+    def translate(self, text, config):
+        model = get_gemini_client(config.get("api_key"), config.get("model", "gemini-1.5-flash"))
+        _before_request(config, text)
+        response = model.generate_content(self._prompt(text, config))
         return response.text.strip()
 
+    def translate_stream(self, text, config):
+        model = get_gemini_client(config.get("api_key"), config.get("model", "gemini-1.5-flash"))
+        _before_request(config, text)
+        for chunk in model.generate_content(self._prompt(text, config), stream=True):
+            yield chunk.text
+
+    def translate_numbered(self, texts, config):
+        """Numbered JSON batch with schema-constrained output; see translate_numbered()."""
+        target_lang = (config.get("target_lang") or "pt").lower()
+        target_label = config.get("target_label", "Portuguese (Brazil)")
+        source_label = config.get("source_label", "English")
+
+        model = get_gemini_client(config.get("api_key"), config.get("model", "gemini-1.5-flash"))
+        prepared = []
+        any_glossary = False
+        for text in texts:
+            # Outside pt the glossary only reports "unused"; its (Portuguese) substitutions must not be sent
+            pretranslated_text, glossary_used = _apply_glossary(text, target_lang)
+            prepared.append(pretranslated_text if glossary_used else text)
+            any_glossary = any_glossary or glossary_used
+        glossary_note = (
+            "Words that are already in Portuguese come from the project glossary: keep them untouched. "
+            if any_glossary else ""
+        )
+        instructions = (
+            "Act as a game localization specialist. "
+            f"Translate the \"text\" of every item below from {source_label} to {target_label}. "
+            f"{glossary_note}"
+            'Reply with {"items": [{"id": <same id>, "text": <translation>}, ...]}, one entry per item.\n\n'
+            f"{examples_prompt(config.get('examples'))}"
+        )
+        generation_config = {"response_mime_type": "application/json", "response_schema": BATCH_RESPONSE_SCHEMA}
+
+        def send(payload):
+            _before_request(config, payload)
+            return model.generate_content(instructions + payload, generation_config=generation_config).text
+
+        return translate_numbered(prepared, send)
+
+    def translate_batch(self, texts, config):
+        results, _missing_first = self.translate_numbered(texts, config)
+        # Anything still missing after the follow-up requests is translated on its own.
+        return [result if result is not None else self.translate(text, config) for text, result in zip(texts, results)]
+
 
 class DeepLService(TranslationService):
+    # DeepL accepts up to 50 texts and 128 KiB per request; the rest of the
+    # body (target_lang and the JSON around each text) fits in the headroom.
+    max_batch_items = 50
+    max_batch_bytes = 120 * 1024
+
+    def _translator(self, config):
+        api_key = config.get("api_key")
+        return CLIENT_POOL.get("DeepL", api_key, None, lambda: deepl.Translator(api_key))
+
     def translate(self, text, config):
-        translator = deepl.Translator(config.get("api_key"))
+        translator = self._translator(config)
         target_code = config.get("deepl_lang", "PT-BR")
+        _before_request(config, text)
         result = translator.translate_text(text, target_lang=target_code)
         return result.text
 
+    def translate_batch(self, texts, config):
+        translator = self._translator(config)
+        target_code = config.get("deepl_lang", "PT-BR")
+        _before_request(config, *texts)
+        results = translator.translate_text(list(texts), target_lang=target_code)
+        return [result.text for result in results]
+
 
 class AzureService(TranslationService):
-    def translate(self, text, config):
-        credential = AzureKeyCredential(config.get("api_key"))
+    # Azure Translator accepts up to 1000 elements and 50000 characters per request.
+    max_batch_items = 1000
+    max_batch_chars = 50000
+
+    def _client(self, config):
+        api_key = config.get("api_key")
         endpoint = "https://api.cognitive.microsofttranslator.com"
-        text_translator = TextTranslationClient(endpoint=endpoint, credential=credential)
+        return CLIENT_POOL.get(
+            "Microsoft Azure", api_key, endpoint,
+            lambda: TextTranslationClient(endpoint=endpoint, credential=AzureKeyCredential(api_key)),
+        )
+
+    def translate(self, text, config):
+        return self.translate_batch([text], config)[0]
+
+    def translate_batch(self, texts, config):
         target_code = config.get("target_lang", "pt")
-        response = text_translator.translate(content=[text], to_language=[target_code])
-        return response[0].translations[0].text
+        _before_request(config, *texts)
+        response = self._client(config).translate(content=list(texts), to_language=[target_code])
+        return [item.translations[0].text for item in response]
+
+
+# How long Ollama keeps the model in memory after each request; -1 pins it until the server restarts.
+OLLAMA_KEEP_ALIVE = "30m"
+# Bulk runs pin the model, so a long quota or breaker pause never forces a reload,
+# and unload it when they end (see MotorTraducao).
+OLLAMA_KEEP_ALIVE_BULK = -1
+OLLAMA_CONNECT_TIMEOUT = 5
+# Seconds without a byte from the server; a CPU-only box can take minutes on a big batch
+OLLAMA_READ_TIMEOUT = 600
+_OLLAMA_TEXT_SCHEMA = {"type": "object", "properties": {"text": {"type": "string"}}, "required": ["text"]}
 
 
 class OllamaService(TranslationService):
+    """
+    Local models through /api/chat. The system message depends only on the
+    target language, so it stays the same across requests and Ollama can
+    reuse its cached prompt; the strings travel as JSON in the user message.
+    Every request carries keep_alive, so the model is not unloaded between
+    calls; preload() loads it before the first batch.
+    """
+
+    # One bulk batch (see ORCAMENTOS_PADRAO in core/lotes.py) fits in one request
+    max_batch_items = 40
+    max_batch_chars = 8000
+
+    def _post(self, config, messages, stream=False, **fields):
+        base_url = config.get("ollama_url", "http://localhost:11434")
+        data = {
+            "model": config.get("model", "llama3"),
+            "messages": messages,
+            "stream": stream,
+            "keep_alive": config.get("keep_alive", OLLAMA_KEEP_ALIVE),
+            **fields,
+        }
+        response = get_http_session(base_url).post(
+            f"{base_url}/api/chat", json=data, stream=stream,
+            timeout=(OLLAMA_CONNECT_TIMEOUT, config.get("timeout", OLLAMA_READ_TIMEOUT)),
+        )
+        response.raise_for_status()
+        return response
+
+    def _chat(self, system, user, config, response_format):
+        """Raw reply text; 'response_format' is "json" or a JSON schema."""
+        messages = [{"role": "system", "content": system}, {"role": "user", "content": user}]
+        _before_request(config, user)
+        return self._post(config, messages, format=response_format).json()["message"]["content"]
+
+    def preload(self, config):
+        """Load the model now (an empty chat only loads it) and keep it for config["keep_alive"]."""
+        self._post(config, [])
+
+    def unload(self, config):
+        """Drop the model from the server's memory right away (an empty chat with keep_alive 0)."""
+        self._post(config, [], keep_alive=0)
+
+    def parallel_slots(self, config):
+        """Requests the server handles at once: config["ollama_parallel"] or OLLAMA_NUM_PARALLEL, if known."""
+        slots = config.get("ollama_parallel") or os.environ.get("OLLAMA_NUM_PARALLEL")
+        return int(slots) if slots else None
+
     def translate(self, text, config):
-        url = "http://localhost:11434/api/generate"
         target_label = config.get("target_label", "Portuguese (Brazil)")
+        system = (
+            "Act as a translation service that converts JSON values only. "
+            f"Translate the \"text\" value to {target_label}. Keep the key exactly the same. "
+            "Respond with JSON only."
+        )
+        reply = self._chat(system, json.dumps({"text": text}, ensure_ascii=False), config, _OLLAMA_TEXT_SCHEMA)
+        return json.loads(reply)["text"]
 
-        prompt = (
-            "[INST]Act as a translation service that converts JSON values only. "
-            f"Translate the value below to {target_label}. Keep the key exactly the same. "
-            "Respond with JSON only.\n\n"
-            "Input:\n"
-            "{\n"
-            f'    "text": "{text}"\n'
-            "}\n\n"
-            "Output:[/INST]"
+    def translate_stream(self, text, config):
+        """Plain-text reply streamed as NDJSON; JSON mode would only show the text once it is complete."""
+        target_label = config.get("target_label", "Portuguese (Brazil)")
+        messages = [
+            {"role": "system", "content": (
+                "Act as a game localization specialist. "
+                f"Translate the user's text to {target_label}. "
+                "Reply with the translation only, without quotes or notes."
+            )},
+            {"role": "user", "content": text},
+        ]
+        _before_request(config, text)
+        # Leaving the block (also when the consumer stops early) closes the connection
+        with self._post(config, messages, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                part = json.loads(line)
+                if part.get("error"):
+                    raise RuntimeError(part["error"])
+                yield part.get("message", {}).get("content", "")
+                if part.get("done"):
+                    break
+
+    def translate_numbered(self, texts, config):
+        """Numbered JSON batch constrained by BATCH_RESPONSE_SCHEMA; see translate_numbered()."""
+        target_label = config.get("target_label", "Portuguese (Brazil)")
+        system = (
+            "Act as a translation service for game text. "
+            f"Translate the \"text\" of every item the user sends to {target_label}. Keep every \"id\" exactly the same. "
+            'Respond with JSON only: {"items": [{"id": <id>, "text": <translation>}, ...]}.'
         )
+        examples = examples_prompt(config.get("examples"))
 
-        data = {
-            "model": config.get("model", "llama3"),
-            "prompt": prompt,
-            "stream": False,
-            "format": "json",
-        }
+        def send(payload):
+            return self._chat(system, examples + payload, config, BATCH_RESPONSE_SCHEMA)
 
-        response = requests.post(url, json=data, timeout=config.get("timeout", 120))
-        response.raise_for_status()
+        return translate_numbered(texts, send)
 
-        response_json_text = response.json()["response"]
-        translated_dict = json.loads(response_json_text)
-        return next(iter(translated_dict.values()))
+    def translate_batch(self, texts, config):
+        results, _missing_first = self.translate_numbered(texts, config)
+        return [result if result is not None else self.translate(text, config) for text, result in zip(texts, results)]
 
 
 AVAILABLE_SERVICES = {
@@ -157,17 +521,217 @@ AVAILABLE_SERVICES = {
 }
 
 
-def translate_text(servico_escolhido, texto, config):
-    if servico_escolhido in AVAILABLE_SERVICES:
-        try:
-            service = AVAILABLE_SERVICES[servico_escolhido]
-            return service.translate(texto, config)
-        except Exception as exc:
-            error_message = str(exc)
-            if "Connection refused" in error_message:
-                return "ERRO: Nao foi possivel conectar ao servidor local do Ollama. Verifique se ele esta rodando."
-            return f"ERRO na API ({servico_escolhido}): {exc}"
-    return f"Servico '{servico_escolhido}' nao reconhecido."
+def _error_message(servico_escolhido, exc):
+    error_message = str(exc)
+    if "Connection refused" in error_message:
+        return "ERRO: Nao foi possivel conectar ao servidor local do Ollama. Verifique se ele esta rodando."
+    return f"ERRO na API ({servico_escolhido}): {exc}"
+
+
+def memory_context(servico_escolhido, config):
+    """Translation memory context (languages, provider, model, glossary) for a config."""
+    target_lang = (config.get("target_lang") or "pt").lower()
+    return contexto_memoria(
+        config.get("source_label", "English"), target_lang, servico_escolhido,
+        config.get("model", ""), glossary_version(target_lang),
+    )
 
 
-__all__ = ["AVAILABLE_SERVICES", "translate_text", "get_gemini_model"]
+def _translation_memory(config):
+    """The memory in front of the providers; config["memoria"] = None turns it off."""
+    if "memoria" in config:
+        return config["memoria"]
+    return obter_memoria()
+
+
+# A single row is interactive: give up sooner than a batch job would
+SINGLE_TEXT_RETRIES = PoliticaDeRetentativa(tentativas=3, maximo=20.0)
+BATCH_RETRIES_POLICY = PoliticaDeRetentativa(tentativas=4, maximo=60.0)
+
+
+def _call_service(servico_escolhido, call, config, policy):
+    """Run a provider call through the retry/backoff/circuit-breaker layer (config["retry_policy"] overrides)."""
+    return executar_com_resiliencia(
+        call, servico_escolhido, politica=config.get("retry_policy") or policy,
+        mensagem_de_erro=lambda exc: _error_message(servico_escolhido, exc),
+        cancel_event=config.get("cancel_event"),
+    )
+
+
+def _unknown_service(servico_escolhido):
+    return FalhaDoProvedor(f"Servico '{servico_escolhido}' nao reconhecido.", servico_escolhido)
+
+
+def translate_text(servico_escolhido, texto, config):
+    """
+    Translate one text. Transient errors are retried with backoff; anything
+    that still fails raises FalhaDoProvedor (str() is the message to show),
+    so an error can never be mistaken for a translation.
+    """
+    if servico_escolhido not in AVAILABLE_SERVICES:
+        raise _unknown_service(servico_escolhido)
+    memoria = _translation_memory(config)
+    contexto = memory_context(servico_escolhido, config) if memoria else None
+    if memoria:
+        cached = memoria.buscar(texto, contexto)
+        if cached is not None:
+            return cached
+    service = AVAILABLE_SERVICES[servico_escolhido]
+    translated = _call_service(servico_escolhido, lambda: service.translate(texto, config), config, SINGLE_TEXT_RETRIES)
+    if memoria:
+        memoria.gravar(texto, translated, contexto)
+    return translated
+
+
+def _stream_service(service, texto, config, on_partial, cancel_event):
+    """Accumulate the streamed pieces; None if cancel_event was set midway."""
+    pieces = []
+    stream = service.translate_stream(texto, config)
+    try:
+        for piece in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            pieces.append(piece)
+            if on_partial and piece:
+                on_partial("".join(pieces))
+    finally:
+        stream.close()
+    return "".join(pieces).strip()
+
+
+def stream_text(servico_escolhido, texto, config):
+    """
+    Like translate_text, but config["on_partial"](text_so_far) is called as
+    the reply streams in (Gemini stream=True, Ollama NDJSON). Setting
+    config["cancel_event"] stops the stream and returns None; a cancelled or
+    failed reply is not stored in the translation memory.
+    """
+    if servico_escolhido not in AVAILABLE_SERVICES:
+        raise _unknown_service(servico_escolhido)
+    on_partial = config.get("on_partial")
+    cancel_event = config.get("cancel_event")
+    memoria = _translation_memory(config)
+    contexto = memory_context(servico_escolhido, config) if memoria else None
+    if memoria:
+        cached = memoria.buscar(texto, contexto)
+        if cached is not None:
+            if on_partial:
+                on_partial(cached)
+            return cached
+    service = AVAILABLE_SERVICES[servico_escolhido]
+    translated = _call_service(
+        servico_escolhido, lambda: _stream_service(service, texto, config, on_partial, cancel_event),
+        config, SINGLE_TEXT_RETRIES,
+    )
+    if memoria and translated is not None:
+        memoria.gravar(texto, translated, contexto)
+    return translated
+
+
+def _request_bytes(text):
+    """
+    Bytes a text takes in a JSON request body. Clients send ASCII-escaped JSON,
+    so an accented letter costs 6 bytes and an emoji 12; never less than UTF-8.
+    """
+    return len(json.dumps(text))
+
+
+def split_batches(texts, max_items, max_chars=None, max_bytes=None):
+    """Yield (start, chunk) pairs that respect an item count and a character and/or byte budget."""
+    start = 0
+    chunk = []
+    chars = size_bytes = 0
+    for index, text in enumerate(texts):
+        size = len(text)
+        encoded = _request_bytes(text) if max_bytes else 0
+        if chunk and (
+            len(chunk) >= max_items
+            or (max_chars and chars + size > max_chars)
+            or (max_bytes and size_bytes + encoded > max_bytes)
+        ):
+            yield start, chunk
+            start, chunk, chars, size_bytes = index, [], 0, 0
+        chunk.append(text)
+        chars += size
+        size_bytes += encoded
+    if chunk:
+        yield start, chunk
+
+
+def translate_texts(servico_escolhido, textos, config):
+    """
+    Batch counterpart of translate_text: returns one result per input text,
+    splitting the job according to the provider's request limits. Texts found
+    in the translation memory, and repeats of the same text, are not sent.
+    A chunk that still fails after the retries raises FalhaDoProvedor; the
+    chunks translated before it are already in the memory.
+    """
+    textos = list(textos)
+    if servico_escolhido not in AVAILABLE_SERVICES:
+        raise _unknown_service(servico_escolhido)
+
+    service = AVAILABLE_SERVICES[servico_escolhido]
+    memoria = _translation_memory(config)
+    contexto = memory_context(servico_escolhido, config) if memoria else None
+    known = memoria.buscar_varios(textos, contexto) if memoria else {}
+    pending = [texto for texto in dict.fromkeys(textos) if texto not in known]
+
+    for _start, chunk in split_batches(
+        pending, service.max_batch_items, service.max_batch_chars, service.max_batch_bytes,
+    ):
+        translated = _call_service(
+            servico_escolhido, lambda chunk=chunk: service.translate_batch(chunk, config), config, BATCH_RETRIES_POLICY,
+        )
+        known.update(zip(chunk, translated))
+        if memoria:
+            memoria.gravar_varios(zip(chunk, translated), contexto)
+    return [known[texto] for texto in textos]
+
+
+def translate_packed_batch(servico_escolhido, textos, config):
+    """
+    Translate one batch sized by the caller's packer (core/lotes.py). For
+    providers with the numbered protocol the pending texts go out as ONE
+    request (plus follow-ups for missing ids), not re-split by
+    max_batch_items, so a truncated reply reaches the packer. Texts still
+    missing after the follow-ups are translated on their own, as
+    translate_batch does. Returns (results, missing_first): missing_first
+    lists the positions missing from the first reply (memory hits never
+    count). Other providers go through translate_texts and report nothing.
+    """
+    textos = list(textos)
+    if servico_escolhido not in AVAILABLE_SERVICES:
+        raise _unknown_service(servico_escolhido)
+    service = AVAILABLE_SERVICES[servico_escolhido]
+    if not hasattr(service, "translate_numbered"):
+        return translate_texts(servico_escolhido, textos, config), []
+
+    memoria = _translation_memory(config)
+    contexto = memory_context(servico_escolhido, config) if memoria else None
+    known = memoria.buscar_varios(textos, contexto) if memoria else {}
+    pending = [texto for texto in dict.fromkeys(textos) if texto not in known]
+    missing_texts = set()
+    if pending:
+        translated, missing_first = _call_service(
+            servico_escolhido, lambda: service.translate_numbered(pending, config), config, BATCH_RETRIES_POLICY,
+        )
+        translated = [
+            result if result is not None else _call_service(
+                servico_escolhido, lambda texto=texto: service.translate(texto, config), config, SINGLE_TEXT_RETRIES,
+            )
+            for texto, result in zip(pending, translated)
+        ]
+        pairs = list(zip(pending, translated))
+        known.update(pairs)
+        if memoria:
+            memoria.gravar_varios(pairs, contexto)
+        missing_texts = {pending[position] for position in missing_first}
+    return [known[texto] for texto in textos], [i for i, texto in enumerate(textos) if texto in missing_texts]
+
+
+__all__ = [
+    "AVAILABLE_SERVICES", "CLIENT_POOL", "OLLAMA_KEEP_ALIVE_BULK", "translate_text", "stream_text", "translate_texts", "split_batches",
+    "translate_packed_batch",
+    "get_gemini_model", "get_gemini_client", "configure_gemini", "glossary_version", "memory_context",
+    "examples_prompt", "translate_numbered", "BATCH_RESPONSE_SCHEMA", "FalhaDoProvedor",
+]
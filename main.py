@@ -1,15 +1,25 @@
 import customtkinter as ctk
 from tkinter import filedialog, ttk, messagebox
-import os, json, threading, time, sys, csv, re, queue
-from core.tradutor_api import translate_text, AVAILABLE_SERVICES, get_gemini_model
+import os, json, threading, time, sys, csv, queue
+from collections import OrderedDict
+from core.tradutor_api import AVAILABLE_SERVICES, stream_text, configure_gemini, memory_context, BATCH_RETRIES_POLICY
 from dotenv import load_dotenv
 import google.generativeai as genai
 
 # Importa as funções dos nossos outros scripts
-from core.extrator import extrair_textos
+from core.extrator import CargaXml, extrair_textos
 #from core.tradutor_api import traduzir_texto_unico
 from core.injetor import injetar_traducoes
 from core.i18n import I18nManager
+from core.motor_traducao import MotorTraducao
+from core.limitador import obter_limitador
+from core.lotes import obter_empacotador
+from core.memoria_traducao import contexto_aprovado, obter_memoria
+from core.memoria_aproximada import IndiceAproximado, carregar_indice
+from core.checkpoint import abrir_checkpoint_projeto
+from core.resiliencia import FalhaDoProvedor, executar_com_resiliencia
+from core.roteamento import Roteador, montar_configs, resolver_politica
+from core.projeto import APROVADO, ERRO, NAO_TRADUZIDO, TRADUZIDO, TRADUZINDO, ModeloProjeto
 
 TRANSLATION_TARGETS = {
     "pt": {"code": "pt", "deepl": "PT-BR", "label": "Portuguese (Brazil)"},
@@ -19,6 +29,10 @@ TRANSLATION_TARGETS = {
     "ja": {"code": "ja", "deepl": "JA", "label": "Japanese"},
 }
 
+# Fila de traduções -> tabela: tempo máximo por rodada (para o Tk continuar respondendo) e intervalo com a fila vazia
+ORCAMENTO_POR_QUADRO = 0.012
+INTERVALO_FILA_MS = 50
+
 def resource_path(relative_path):
     """Resolve paths for bundled data in script and frozen modes."""
     base_path = getattr(sys, "_MEIPASS", None)  # PyInstaller
@@ -118,6 +132,174 @@ class GlossaryWindow(ctk.CTkToplevel):
         # Poderia adicionar um aviso de "Salvar antes de fechar?" aqui
         self.destroy()
 
+class TabelaVirtual(ctk.CTkFrame):
+    """
+    Visão virtualizada de um ModeloProjeto: o Treeview só tem as poucas
+    linhas visíveis, reaproveitadas a cada rolagem, e os dados vêm do modelo.
+    Carregar 500 mil textos não cria 500 mil itens no Tk. A tabela assina o
+    modelo e só redesenha as linhas visíveis que mudaram. selection()
+    devolve o xpath da linha selecionada.
+    """
+
+    def __init__(self, master, modelo, colunas, altura_linha=25, **kwargs):
+        super().__init__(master, fg_color="transparent", **kwargs)
+        self.grid_rowconfigure(0, weight=1); self.grid_columnconfigure(0, weight=1)
+        self.modelo = modelo
+        self.altura_linha = altura_linha
+        self._inicio = 0  # Linha do modelo que aparece no topo
+        self._slots = []  # iids das linhas do Treeview ("0", "1", ...), reaproveitadas
+        self._slots_visiveis = 0
+        self._selecionado = None
+        self._ao_selecionar = None
+        self._render_agendado = False
+
+        self.tree = ttk.Treeview(self, columns=colunas, show="headings", selectmode="browse")
+        self.tree.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._ao_rolar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.tree.bind("<<TreeviewSelect>>", self._ao_clicar)
+        self.tree.bind("<Configure>", lambda _e: self._ajustar_slots())
+        self.tree.bind("<MouseWheel>", lambda e: self._rolar_linhas(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda _e: self._rolar_linhas(-3))
+        self.tree.bind("<Button-5>", lambda _e: self._rolar_linhas(3))
+        for tecla, passo in (("<Up>", -1), ("<Down>", 1), ("<Prior>", "-pagina"), ("<Next>", "pagina"), ("<Home>", "inicio"), ("<End>", "fim")):
+            self.tree.bind(tecla, lambda _e, passo=passo: self._mover_selecao(passo))
+        modelo.assinar(self._ao_mudar_modelo)
+
+    # --- API no estilo do Treeview ---
+    def heading(self, coluna, **kwargs):
+        return self.tree.heading(coluna, **kwargs)
+
+    def tag_configure(self, tag, **kwargs):
+        return self.tree.tag_configure(tag, **kwargs)
+
+    def bind(self, sequencia, funcao=None, add=None):
+        if sequencia == "<<TreeviewSelect>>":
+            self._ao_selecionar = funcao  # Só dispara quando a linha selecionada muda de verdade
+            return None
+        return self.tree.bind(sequencia, funcao, add)
+
+    def selection(self):
+        return (self._selecionado,) if self._selecionado is not None else ()
+
+    def see(self, xpath):
+        linha = self.modelo.linha(xpath)
+        if linha < self._inicio:
+            self._inicio = linha
+        elif linha >= self._inicio + self._linhas_inteiras():
+            self._inicio = linha - self._linhas_inteiras() + 1
+        self._agendar_render()
+
+    # --- Modelo -> tela ---
+    def _ao_mudar_modelo(self, linhas):
+        if linhas is None:  # Linhas novas ou removidas: a janela e a barra de rolagem mudam
+            if self._selecionado is not None and self._selecionado not in self.modelo:
+                self._selecionado = None
+            self._agendar_render()
+            return
+        for linha in linhas:
+            posicao = linha - self._inicio
+            if 0 <= posicao < self._slots_visiveis:
+                self._desenhar(self._slots[posicao], linha)
+
+    def _desenhar(self, slot, linha):
+        modelo = self.modelo
+        self.tree.item(slot, values=(modelo.originais[linha], modelo.traducoes[linha]), tags=(modelo.estado_da_linha(linha),))
+
+    def _linhas_inteiras(self):
+        return max(1, len(self._slots) - 1)  # A última pode estar cortada pela borda
+
+    def _ajustar_slots(self):
+        """Cria ou remove linhas do Treeview para cobrir a altura atual do widget."""
+        cabecalho = 25
+        necessarias = max(1, (self.tree.winfo_height() - cabecalho) // self.altura_linha + 1)
+        while len(self._slots) < necessarias:
+            slot = str(len(self._slots))
+            self.tree.insert("", "end", iid=slot, values=("", ""))
+            self.tree.detach(slot)  # _renderizar devolve as que tiverem dado
+            self._slots.append(slot)
+        while len(self._slots) > necessarias:
+            self.tree.delete(self._slots.pop())
+            self._slots_visiveis = min(self._slots_visiveis, len(self._slots))
+        self._renderizar()
+
+    def _agendar_render(self):
+        if not self._render_agendado:
+            self._render_agendado = True
+            self.after_idle(self._renderizar)
+
+    def _renderizar(self):
+        self._render_agendado = False
+        total = len(self.modelo)
+        self._inicio = max(0, min(self._inicio, total - self._linhas_inteiras()))
+        na_janela = max(0, min(len(self._slots), total - self._inicio))
+        for posicao, slot in enumerate(self._slots):
+            if posicao < na_janela:
+                if posicao >= self._slots_visiveis:
+                    self.tree.move(slot, "", posicao)  # Devolve uma linha escondida
+                self._desenhar(slot, self._inicio + posicao)
+            elif posicao < self._slots_visiveis:
+                self.tree.detach(slot)  # Linha sem dado: some, em vez de ficar vazia e clicável
+        self._slots_visiveis = na_janela
+
+        linha = self.modelo.linha(self._selecionado) if self._selecionado is not None else None
+        posicao = linha - self._inicio if linha is not None else -1
+        self.tree.selection_set((self._slots[posicao],) if 0 <= posicao < self._slots_visiveis else ())
+        if total:
+            self.scrollbar.set(self._inicio / total, min(1.0, (self._inicio + self._linhas_inteiras()) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _rolar_linhas(self, quantidade):
+        self._inicio += quantidade
+        self._renderizar()
+        return "break"  # O Treeview não rola sozinho: a janela é nossa
+
+    def _ao_rolar(self, acao, quantidade, unidade=None):
+        if acao == "moveto":
+            self._inicio = int(float(quantidade) * len(self.modelo))
+            self._renderizar()
+        else:
+            passo = self._linhas_inteiras() if unidade == "pages" else 1
+            self._rolar_linhas(int(float(quantidade)) * passo)
+
+    # --- Seleção ---
+    def _ao_clicar(self, _event):
+        selecionados = self.tree.selection()
+        if not selecionados:
+            return  # A linha selecionada saiu da janela visível: continua selecionada
+        linha = self._inicio + self._slots.index(selecionados[0])
+        if linha < len(self.modelo) and self.modelo.xpaths[linha] != self._selecionado:
+            self._selecionar(self.modelo.xpaths[linha])
+
+    def _selecionar(self, xpath):
+        self._selecionado = xpath
+        if self._ao_selecionar:
+            self._ao_selecionar(None)
+
+    def _mover_selecao(self, passo):
+        total = len(self.modelo)
+        if not total:
+            return "break"
+        atual = self.modelo.linha(self._selecionado) if self._selecionado is not None else -1
+        if passo == "inicio":
+            destino = 0
+        elif passo == "fim":
+            destino = total - 1
+        elif passo in ("pagina", "-pagina"):
+            destino = atual + (self._linhas_inteiras() if passo == "pagina" else -self._linhas_inteiras())
+        else:
+            destino = atual + passo
+        destino = max(0, min(total - 1, destino))
+        if destino != atual:
+            xpath = self.modelo.xpaths[destino]
+            self.see(xpath)
+            self._selecionar(xpath)
+            self._renderizar()
+        return "break"
+
+
 class TranslatorApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -139,16 +321,34 @@ class TranslatorApp(ctk.CTk):
         self.grid_columnconfigure(2, weight=0)  # Coluna direita FIXA (sem minsize)
         self.grid_rowconfigure(0, weight=1)
 
-        self.arquivo_xml_path = ""; self.dados_traducao = {}
+        self.arquivo_xml_path = ""
+        self.projeto_carregado = None  # (hash do XML, tag pai, tag alvo) do que está na tabela
+        self.projeto = ModeloProjeto()  # Textos, traduções e estados; a tabela é só uma visão dele
+        self.carga_em_andamento = None  # (CargaXml, evento de cancelamento, cores do botão) da leitura do XML
+        self.fila_carga = queue.Queue()  # Partes de linhas lidas do XML; None marca o fim da leitura
         self.cancel_event = threading.Event()
         self.translation_queue = queue.Queue()
+        self.atualizacoes_pendentes = OrderedDict()  # xpath -> tradução já tirada da fila, à espera de ir para a tabela
+        self.fila_terminou = False
+        self.sugestao_em_andamento = None  # (item, evento de cancelamento) da sugestão linha a linha
+        self.fila_sugestao = queue.Queue()  # Texto parcial da sugestão, conforme chega (streaming)
+        self.concorrencia_traducao = 2  # Lotes em andamento ao mesmo tempo (config.json)
+
+        self.config_limites = {}  # "limites_taxa" do config.json (ver core/limitador.py)
+        self.config_orcamentos = {}  # "orcamentos_lote" do config.json (ver core/lotes.py)
+        self.config_roteamento = {}  # "roteamento" do config.json (ver core/roteamento.py)
+        self.indice_aproximado = IndiceAproximado()  # Preenchido em segundo plano a partir da memória
+        self.geracao_indice = 0  # Só a recarga mais recente do índice aproximado é aproveitada
+        self.adicoes_durante_recarga = None  # Pares indexados enquanto o índice novo é montado
+        self._lock_indice = threading.Lock()
+        self.exemplos_da_memoria = ctk.BooleanVar(value=False)
 
         self.modelos_disponiveis = {
-            "Gemini 1.5 Flash (Rapido)": ("gemini-1.5-flash", 5),
-            "Gemini 1.5 Pro (Qualidade)": ("gemini-1.5-pro", 31)
+            "Gemini 1.5 Flash (Rapido)": "gemini-1.5-flash",
+            "Gemini 1.5 Pro (Qualidade)": "gemini-1.5-pro"
         }
         self.modelo_selecionado = ctk.StringVar(value=list(self.modelos_disponiveis.keys())[0])
-        self.preferred_model_id = self.modelos_disponiveis[self.modelo_selecionado.get()][0]
+        self.preferred_model_id = self.modelos_disponiveis[self.modelo_selecionado.get()]
         self.api_key = self._carregar_api_key_existente()
 
         # Cria os três painéis principais
@@ -164,7 +364,7 @@ class TranslatorApp(ctk.CTk):
 
         self.right_sidebar_frame = ctk.CTkFrame(self, corner_radius=0, width=330)
         self.right_sidebar_frame.grid(row=0, column=2, sticky="nsew", padx=(2, 5), pady=5)
-        self.right_sidebar_frame.grid_rowconfigure(8, weight=1)
+        self.right_sidebar_frame.grid_rowconfigure(10, weight=1)
         self.right_sidebar_frame.grid_columnconfigure(0, weight=1)  # Coluna única com peso
         self.right_sidebar_frame.grid_propagate(False)  # Mantém largura fixa
         
@@ -198,6 +398,9 @@ class TranslatorApp(ctk.CTk):
         self.import_csv_button = ctk.CTkButton(self.io_frame, text="Importar CSV", command=self.importar_de_csv)
         self.import_csv_button.grid(row=1, column=1, padx=(2, 5), pady=(2, 5), sticky="ew")
 
+        self.import_memory_button = ctk.CTkButton(self.io_frame, text="Importar p/ Memória", command=self.importar_para_memoria)
+        self.import_memory_button.grid(row=2, column=0, columnspan=2, padx=5, pady=(2, 5), sticky="ew")
+
         # IMPORTANTE: Ajuste o número da linha (row) dos widgets que vêm depois!
         # Por exemplo, o lang_optionmenu agora deve estar na row=4, o caminho_arquivo_entry na row=5, etc.
 
@@ -242,9 +445,9 @@ class TranslatorApp(ctk.CTk):
 
         # PAINEL CENTRAL
         style = ttk.Style(); style.theme_use("default"); style.configure("Treeview", background="#2a2d2e", foreground="white", fieldbackground="#2a2d2e", borderwidth=0, rowheight=25); style.configure("Treeview.Heading", background="#565b5e", foreground="white", font=("Arial", 10, "bold")); style.map('Treeview.Heading', background=[('active', '#3484F0')])
-        self.tree = ttk.Treeview(self.center_frame, columns=("Original", "Traducao"), show="headings"); self.tree.heading("Original", text=self.i18n.get("original_text_label")); self.tree.heading("Traducao", text=self.i18n.get("translation_label")); self.tree.grid(row=0, column=0, sticky="nsew"); self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+        self.tree = TabelaVirtual(self.center_frame, self.projeto, colunas=("Original", "Traducao")); self.tree.heading("Original", text=self.i18n.get("original_text_label")); self.tree.heading("Traducao", text=self.i18n.get("translation_label")); self.tree.grid(row=0, column=0, columnspan=2, sticky="nsew"); self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
         self.tree.tag_configure('traduzido', background='#1E4436'); self.tree.tag_configure('traduzindo', background='#565b5e')
-        scrollbar = ctk.CTkScrollbar(self.center_frame, command=self.tree.yview); scrollbar.grid(row=0, column=1, sticky='ns'); self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.tag_configure('aprovado', background='#1F5C3A'); self.tree.tag_configure('erro', background='#5C2B2B')
         
         # Mini-Terminal de Log
         self.log_textbox = ctk.CTkTextbox(self.center_frame, height=100); self.log_textbox.grid(row=1, column=0, columnspan=2, padx=0, pady=(5,0), sticky="ew"); self.log_textbox.configure(state="disabled", font=("Inter", 15))
@@ -270,19 +473,30 @@ class TranslatorApp(ctk.CTk):
         self.original_textbox.grid(row=5, column=0, padx=20, pady=(0, 10), sticky="ew")
         self.original_textbox.configure(state="disabled")
 
+        # Traduções parecidas já existentes na memória (duplo clique usa a linha)
+        self.fuzzy_textbox = ctk.CTkTextbox(self.right_sidebar_frame, height=70, wrap="none")
+        self.fuzzy_textbox.grid(row=6, column=0, padx=20, pady=(0, 10), sticky="ew")
+        self.fuzzy_textbox.configure(state="disabled")
+        self.fuzzy_textbox.bind("<Double-Button-1>", self._usar_correspondencia)
+        self.correspondencias = []
+
         self.traducao_textbox = ctk.CTkTextbox(self.right_sidebar_frame, height=100)
-        self.traducao_textbox.grid(row=6, column=0, padx=20, pady=(0, 20), sticky="ew")
+        self.traducao_textbox.grid(row=7, column=0, padx=20, pady=(0, 20), sticky="ew")
 
         self.sugestao_button = ctk.CTkButton(self.right_sidebar_frame, text=self.i18n.get("generate_suggestion_button"), command=self.iniciar_traducao_linha_selecionada)
-        self.sugestao_button.grid(row=7, column=0, padx=20, pady=10, sticky="ew")
+        self.sugestao_button.grid(row=8, column=0, padx=20, pady=10, sticky="ew")
+
+        self.exemplos_checkbox = ctk.CTkCheckBox(self.right_sidebar_frame, text="Enviar traduções parecidas como exemplo", variable=self.exemplos_da_memoria, command=self._salvar_config)
+        self.exemplos_checkbox.grid(row=9, column=0, padx=20, pady=(0, 10), sticky="w")
 
         self.aprovar_button = ctk.CTkButton(self.right_sidebar_frame, text=self.i18n.get("approve_button"), fg_color="green", hover_color="darkgreen", command=self.aprovar_traducao)
-        self.aprovar_button.grid(row=9, column=0, padx=20, pady=10, sticky="s")
+        self.aprovar_button.grid(row=11, column=0, padx=20, pady=10, sticky="s")
         
         self.update_ui_texts()
         self.log(self.i18n.get("log_welcome"))
         if self.api_key:
             self.after(200, self._sincronizar_modelos_disponiveis)
+        self._carregar_indice_aproximado()
 
     def log(self, message):
         self.log_textbox.configure(state="normal")
@@ -297,13 +511,18 @@ class TranslatorApp(ctk.CTk):
             try:
                 with open(config_path, 'r', encoding='utf-8') as f:
                     config = json.load(f)
+                    self.concorrencia_traducao = config.get("concorrencia_traducao", self.concorrencia_traducao)
+                    self.config_limites = config.get("limites_taxa", {})
+                    self.config_orcamentos = config.get("orcamentos_lote", {})
+                    self.config_roteamento = config.get("roteamento", {})
+                    self.exemplos_da_memoria.set(config.get("exemplos_memoria", False))
                     preferred_model = config.get("preferred_model")
                     self.preferred_model_id = config.get("preferred_model_id", self.preferred_model_id)
                     if preferred_model and preferred_model in self.modelos_disponiveis:
                         self.modelo_selecionado.set(preferred_model)
-                        self.preferred_model_id = self.modelos_disponiveis[preferred_model][0]
+                        self.preferred_model_id = self.modelos_disponiveis[preferred_model]
                     elif self.preferred_model_id:
-                        for label, (model_id, _) in self.modelos_disponiveis.items():
+                        for label, model_id in self.modelos_disponiveis.items():
                             if model_id == self.preferred_model_id:
                                 self.modelo_selecionado.set(label)
                                 break
@@ -314,19 +533,30 @@ class TranslatorApp(ctk.CTk):
 
     def _salvar_config(self):
         """Persiste configurações como chave da API e modelo preferido."""
+        config_path = "config.json"
         data = {}
+        # Preserva as outras opções que o usuário colocou no config.json
+        if os.path.exists(config_path):
+            try:
+                with open(config_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                data = {}
+        for chave in ("api_key", "preferred_model", "preferred_model_id", "exemplos_memoria"):
+            data.pop(chave, None)
+        if self.exemplos_da_memoria.get():
+            data["exemplos_memoria"] = True
         if self.api_key:
             data["api_key"] = self.api_key
         selected_model = self.modelo_selecionado.get() if hasattr(self, "modelo_selecionado") else None
         if selected_model:
             data["preferred_model"] = selected_model
-            info = self.modelos_disponiveis.get(selected_model)
-            if info:
-                self.preferred_model_id = info[0]
+            model_id = self.modelos_disponiveis.get(selected_model)
+            if model_id:
+                self.preferred_model_id = model_id
                 data["preferred_model_id"] = self.preferred_model_id
         elif self.preferred_model_id:
             data["preferred_model_id"] = self.preferred_model_id
-        config_path = "config.json"
         if data:
             try:
                 with open(config_path, 'w', encoding='utf-8') as f:
@@ -342,14 +572,14 @@ class TranslatorApp(ctk.CTk):
     def _on_model_change(self, selection):
         if selection in self.modelos_disponiveis:
             self.modelo_selecionado.set(selection)
-            info = self.modelos_disponiveis.get(selection)
-            if info:
-                self.preferred_model_id = info[0]
+            model_id = self.modelos_disponiveis.get(selection)
+            if model_id:
+                self.preferred_model_id = model_id
             self._salvar_config()
 
     def importar_de_csv(self):
         """Lê um arquivo CSV e atualiza as traduções na tabela."""
-        if not self.tree.get_children():
+        if not len(self.projeto):
             messagebox.showwarning("Atenção", "Carregue um arquivo XML primeiro para popular a tabela.")
             return
             
@@ -362,7 +592,7 @@ class TranslatorApp(ctk.CTk):
             return
 
         try:
-            itens_atualizados = 0
+            novas_traducoes = {}
             with open(filepath, 'r', newline='', encoding='utf-8') as f:
                 # Usamos DictReader para ler o CSV como um dicionário, usando o cabeçalho
                 reader = csv.DictReader(f)
@@ -373,12 +603,10 @@ class TranslatorApp(ctk.CTk):
                     nova_traducao = row.get('translated_text')
 
                     if xpath and nova_traducao is not None:
-                        # Verifica se uma linha com aquele ID (xpath) existe na tabela
-                        if self.tree.exists(xpath):
-                            original_text, _ = self.tree.item(xpath, 'values')
-                            # Atualiza a linha com a nova tradução
-                            self.tree.item(xpath, values=(original_text, nova_traducao), tags=('traduzido',))
-                            itens_atualizados += 1
+                        novas_traducoes[xpath] = nova_traducao
+
+            # Atualiza de uma vez as linhas que existem no projeto (as outras são ignoradas)
+            itens_atualizados = self.projeto.definir_varios(novas_traducoes)
             
             self.log(f"{itens_atualizados} itens foram atualizados a partir do arquivo CSV.")
             self.atualizar_estatisticas()
@@ -393,7 +621,16 @@ class TranslatorApp(ctk.CTk):
             self.log(f"Falha ao importar de CSV: {e}")
 
     def _processar_e_carregar_xml(self):
-        """Função central que lê as tags, extrai os textos e atualiza a interface."""
+        """
+        Função central: lê as tags e começa a leitura do XML numa thread
+        operária. As linhas chegam em partes e vão para a tabela aos poucos
+        (_drenar_fila_carga), então a janela continua respondendo mesmo com
+        arquivos de centenas de MB, e o botão de carregar vira "Cancelar".
+        """
+        if self.carga_em_andamento:
+            self.log("Aguarde o fim da leitura do XML atual (ou cancele-a).")
+            return
+
         tag_alvo = self.tag_alvo_entry.get().strip()
         tag_pai = self.parent_tag_entry.get().strip()
 
@@ -401,39 +638,96 @@ class TranslatorApp(ctk.CTk):
             messagebox.showwarning("Atenção", "Por favor, especifique uma Tag Alvo e uma Tag Pai.")
             return
 
-        sucesso, mapa_de_dados = extrair_textos(
-            arquivo_xml=self.arquivo_xml_path,
-            parent_tag=tag_pai,
-            target_tag=tag_alvo
+        try:
+            carga = CargaXml(self.arquivo_xml_path, tag_pai, tag_alvo, cancel_event=threading.Event())
+        except OSError as e:
+            self.log(f"Não foi possível abrir o arquivo XML: {e}")
+            return
+
+        self.projeto.limpar()
+        self.projeto_carregado = None
+        cores = (self.load_xml_button.cget("fg_color"), self.load_xml_button.cget("hover_color"))
+        self.carga_em_andamento = (carga, carga.cancel_event, cores)
+        self.load_xml_button.configure(text="Cancelar", fg_color="red", hover_color="darkred")
+        self.log(f"Lendo '{os.path.basename(self.arquivo_xml_path)}' ({carga.total_bytes / 2**20:.1f} MB)...")
+
+        threading.Thread(target=self._worker_carregar_xml, args=(carga,), daemon=True).start()
+        self._drenar_fila_carga()
+
+    def _worker_carregar_xml(self, carga):
+        """Roda em segundo plano: passa as partes lidas para a interface pela fila."""
+        for parte in carga.partes():
+            self.fila_carga.put(parte)
+        self.fila_carga.put(None)  # Sucesso, erro ou cancelamento: o resultado fica na própria carga
+
+    def _cancelar_carga_xml(self):
+        _carga, cancelar, _cores = self.carga_em_andamento
+        self.log("Cancelando a leitura do XML...")
+        cancelar.set()
+        self.load_xml_button.configure(state="disabled", text="Cancelando...")
+
+    def _drenar_fila_carga(self):
+        """Acrescenta à tabela as partes que couberem em ORCAMENTO_POR_QUADRO e mostra o progresso."""
+        carga, cancelar, _cores = self.carga_em_andamento
+        limite = time.perf_counter() + ORCAMENTO_POR_QUADRO
+        terminou = False
+        while time.perf_counter() < limite:
+            try:
+                parte = self.fila_carga.get_nowait()
+            except queue.Empty:
+                break
+            if parte is None:
+                terminou = True
+                break
+            if not cancelar.is_set():
+                self.projeto.acrescentar(parte)
+
+        if terminou:
+            self._concluir_carga_xml(carga)
+            return
+
+        # Lidos direto da carga: andam a cada bloco, mesmo em trechos sem tags alvo
+        if carga.total_bytes:
+            self.progressbar.set(carga.bytes_lidos / carga.total_bytes)
+        self.stats_label.configure(
+            text=f"Lendo: {carga.bytes_lidos / 2**20:.0f} de {carga.total_bytes / 2**20:.0f} MB, {carga.encontrados} tags"
         )
+        self.after(1 if not self.fila_carga.empty() else INTERVALO_FILA_MS, self._drenar_fila_carga)
 
-        for i in self.tree.get_children():
-            self.tree.delete(i)
+    def _concluir_carga_xml(self, carga):
+        _carga, _cancelar, (cor, cor_hover) = self.carga_em_andamento
+        self.carga_em_andamento = None
+        self.load_xml_button.configure(state="normal", text=self.i18n.get("load_xml_button"), fg_color=cor, hover_color=cor_hover)
 
-        if sucesso:
-            self.dados_traducao = mapa_de_dados
-            
-            # --- LÓGICA CORRIGIDA AQUI ---
-            # 1. Renomeamos as variáveis do loop para clareza: xpath e texto_original.
-            #    O método .items() retorna (chave, valor).
-            for xpath, texto_original in self.dados_traducao.items():
-                # 2. Usamos 'texto_original' para a primeira coluna (Texto Original).
-                # 3. Deixamos a segunda coluna (Tradução) vazia inicialmente.
-                # 4. Usamos o 'xpath' como ID da linha (iid), que é um identificador único perfeito.
-                self.tree.insert("", "end", iid=xpath, values=(texto_original, ""), tags=('nao_traduzido',))
-            
-            self.log(f"Arquivo '{os.path.basename(self.arquivo_xml_path)}' carregado com {len(self.dados_traducao)} itens.")
-            self.reload_button.configure(state="normal")
+        if carga.cancelado or carga.erro:
+            self.projeto.limpar()
+            self.projeto_carregado = None
+            self.log("Leitura do XML cancelada." if carga.cancelado else carga.erro)
         else:
-            self.dados_traducao = {}
-            if mapa_de_dados: # Verifica se há uma mensagem de erro para exibir
-                self.log(mapa_de_dados)
+            self.projeto_carregado = (carga.hash_xml, carga.parent_tag, carga.target_tag)
+            self.log(f"Arquivo '{os.path.basename(self.arquivo_xml_path)}' carregado com {len(self.projeto)} itens.")
+            self.reload_button.configure(state="normal")
+            self._restaurar_checkpoint()
 
         self.atualizar_estatisticas()
 
+    def _diario_do_projeto(self):
+        """Diário de checkpoint deste XML (conteúdo), destas tags e do idioma de destino atual."""
+        hash_xml, tag_pai, tag_alvo = self.projeto_carregado
+        idioma = (self.translation_target or {"code": "pt"}).get("code", "pt")
+        return abrir_checkpoint_projeto(self.arquivo_xml_path, tag_pai, tag_alvo, idioma, hash_xml=hash_xml)
+
+    def _restaurar_checkpoint(self):
+        """Preenche a tabela com o que já foi traduzido deste mesmo projeto, sem chamar a API."""
+        diario = self._diario_do_projeto()
+        dados_traduzidos = diario.carregar()
+        restaurados = self.projeto.definir_varios(dados_traduzidos)
+        if restaurados:
+            self.log(f"Checkpoint deste arquivo encontrado: {restaurados} tradução(ões) restaurada(s).")
+
     def exportar_para_csv(self):
         """Exporta os dados da tabela (XPath, Original, Tradução) para um arquivo CSV."""
-        if not self.tree.get_children():
+        if not len(self.projeto):
             messagebox.showwarning("Atenção", "Não há dados na tabela para exportar.")
             return
 
@@ -449,20 +743,11 @@ class TranslatorApp(ctk.CTk):
             return
 
         try:
-            # Prepara os dados para salvar
-            dados_para_salvar = []
-            # Adiciona o cabeçalho das colunas
-            dados_para_salvar.append(['xpath', 'original_text', 'translated_text'])
-
-            # Itera sobre cada linha da tabela
-            for xpath_id in self.tree.get_children():
-                original, traducao = self.tree.item(xpath_id, 'values')
-                dados_para_salvar.append([xpath_id, original, traducao])
-            
-            # Escreve os dados no arquivo CSV
+            # Escreve o cabeçalho e as linhas do projeto direto no arquivo CSV
             with open(caminho_saida, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
-                writer.writerows(dados_para_salvar)
+                writer.writerow(['xpath', 'original_text', 'translated_text'])
+                writer.writerows(self.projeto.linhas())
             
             messagebox.showinfo("Sucesso", f"Arquivo CSV salvo com sucesso em:\n{caminho_saida}")
             self.log(f"Dados exportados para o arquivo CSV: {os.path.basename(caminho_saida)}")
@@ -472,7 +757,11 @@ class TranslatorApp(ctk.CTk):
             self.log(f"Falha ao exportar para CSV: {e}")
 
     def selecionar_arquivo_xml(self):
-        """Abre o seletor de arquivos e dispara o processamento."""
+        """Abre o seletor de arquivos e dispara o processamento (ou cancela a leitura em andamento)."""
+        if self.carga_em_andamento:
+            self._cancelar_carga_xml()
+            return
+
         filepath = filedialog.askopenfilename(title=self.i18n.get("select_xml_file"), filetypes=(("Arquivos XML", "*.xml"), ("Todos os arquivos", "*.*")))
         if not filepath:
             return
@@ -502,6 +791,7 @@ class TranslatorApp(ctk.CTk):
         if lang_code:
             self.i18n.load_language(lang_code)
             self.translation_target = self._resolve_translation_target(lang_code)
+            self._carregar_indice_aproximado()
             self.update_ui_texts()
             self.log(self.i18n.get("changed_language", lang_name=language_choice))
 
@@ -552,7 +842,7 @@ class TranslatorApp(ctk.CTk):
 
 
     def importar_json_traduzido(self):
-        if not self.tree.get_children():
+        if not len(self.projeto):
             messagebox.showwarning("Atenção", "Carregue um arquivo XML primeiro para popular a tabela.")
             return
             
@@ -573,21 +863,8 @@ class TranslatorApp(ctk.CTk):
 
         self.log(self.i18n.get("log_json_importing", count=len(mapa_traducoes), filename=os.path.basename(filepath)))
         
-        itens_atualizados = 0
-        
-        # --- LÓGICA TOTALMENTE NOVA E CORRIGIDA ---
-        # 1. Iteramos sobre o dicionário importado, pegando o xpath e a nova tradução.
-        for xpath, nova_traducao in mapa_traducoes.items():
-            
-            # 2. Verificamos se uma linha com aquele ID (xpath) existe na nossa tabela.
-            if self.tree.exists(xpath):
-                # 3. Se existe, pegamos o texto original que já está lá.
-                original_text, _ = self.tree.item(xpath, 'values')
-                
-                # 4. Atualizamos a linha usando seu ID (xpath) com a nova tradução.
-                self.tree.item(xpath, values=(original_text, nova_traducao), tags=('traduzido',))
-                
-                itens_atualizados += 1
+        # Aplica de uma vez as traduções cujos xpaths existem no projeto
+        itens_atualizados = self.projeto.definir_varios(mapa_traducoes)
         
         self.log(self.i18n.get("log_items_updated", count=itens_atualizados))
         self.atualizar_estatisticas() # Atualiza a barra de progresso
@@ -597,6 +874,36 @@ class TranslatorApp(ctk.CTk):
         else:
             messagebox.showwarning(self.i18n.get("warn_no_xml_title"), self.i18n.get("warn_no_matches_found"))
 
+    def _contexto_memoria(self, modelo_nome, servico="Gemini"):
+        """Contexto da memória de tradução para o idioma e o modelo atuais."""
+        meta = self.translation_target or {"code": "pt"}
+        config = {"source_label": self.source_language_label, "target_lang": meta.get("code", "pt"), "model": modelo_nome}
+        return memory_context(servico, config)
+
+    def importar_para_memoria(self):
+        """Alimenta a memória de tradução com um checkpoint, JSON traduzido ou CSV exportado."""
+        filepath = filedialog.askopenfilename(
+            title="Selecione traduções anteriores (checkpoint, JSON ou CSV)",
+            filetypes=(("JSON ou CSV", "*.json *.jsonl *.csv"), ("Todos os arquivos", "*.*"))
+        )
+        if not filepath:
+            return
+
+        # O JSON só tem XPath -> tradução; os originais vêm do XML carregado
+        originais = dict(zip(self.projeto.xpaths, self.projeto.originais))
+        if not filepath.lower().endswith(".csv") and not originais:
+            messagebox.showwarning("Atenção", "Carregue o XML original antes de importar um JSON para a memória.")
+            return
+
+        modelo_nome = self.modelos_disponiveis.get(self.modelo_selecionado.get(), "gemini-1.5-flash")
+        try:
+            gravadas = obter_memoria().importar_arquivo(filepath, self._contexto_memoria(modelo_nome), originais)
+        except Exception as e:
+            messagebox.showerror("Erro de Leitura", f"Não foi possível importar o arquivo para a memória.\n\nDetalhes: {e}")
+            self.log(f"Falha ao importar para a memória de tradução: {e}")
+            return
+        self.log(f"{gravadas} traduções de '{os.path.basename(filepath)}' adicionadas à memória de tradução.")
+
     def _carregar_idiomas_disponiveis(self):
         self.idiomas_disponiveis = {}
         locales_path = resource_path("locales")
@@ -639,13 +946,13 @@ class TranslatorApp(ctk.CTk):
 
         def worker():
             try:
-                genai.configure(api_key=self.api_key)
+                configure_gemini(self.api_key)
                 modelos_map = {}
                 for model in genai.list_models():
                     supported = getattr(model, "supported_generation_methods", [])
                     if "generateContent" in supported:
                         label = self._format_model_label(model.name)
-                        modelos_map[label] = (model.name, 32)
+                        modelos_map[label] = model.name
                 if not modelos_map:
                     raise RuntimeError("Nenhum modelo Gemini com suporte a generateContent foi encontrado.")
             except Exception as exc:
@@ -658,14 +965,14 @@ class TranslatorApp(ctk.CTk):
                 self.model_optionmenu.configure(values=valores)
                 selecionado = None
                 if self.preferred_model_id:
-                    for label, (model_id, _) in modelos_map.items():
+                    for label, model_id in modelos_map.items():
                         if model_id == self.preferred_model_id:
                             selecionado = label
                             break
                 if not selecionado or selecionado not in modelos_map:
                     selecionado = valores[0]
                 self.modelo_selecionado.set(selecionado)
-                self.preferred_model_id = modelos_map[selecionado][0]
+                self.preferred_model_id = modelos_map[selecionado]
                 self._salvar_config()
                 self.log(f"Modelos Gemini carregados ({len(valores)})")
 
@@ -723,37 +1030,185 @@ class TranslatorApp(ctk.CTk):
     def on_tree_select(self, event):
         if not self.tree.selection(): return
         selected_item_id = self.tree.selection()[0]
-        values = self.tree.item(selected_item_id, 'values'); original_text = values[0]; translation_text = values[1]
+        self._cancelar_sugestao(exceto=selected_item_id)
+        original_text = self.projeto.original(selected_item_id); translation_text = self.projeto.traducao(selected_item_id)
         self.original_textbox.configure(state="normal"); self.original_textbox.delete("1.0", "end"); self.original_textbox.insert("1.0", original_text); self.original_textbox.configure(state="disabled")
         self.traducao_textbox.delete("1.0", "end"); self.traducao_textbox.insert("1.0", translation_text)
+        self._mostrar_correspondencias(original_text)
+
+    def _carregar_indice_aproximado(self):
+        """
+        Monta o índice de busca aproximada do idioma de destino atual numa
+        thread. O que for indexado enquanto isso (lotes concluídos,
+        aprovações) é guardado e reaplicado no índice novo antes da troca.
+        """
+        idioma = (self.translation_target or {}).get("code", "pt")
+        with self._lock_indice:
+            self.geracao_indice += 1
+            geracao = self.geracao_indice
+            self.adicoes_durante_recarga = []
+
+        def worker():
+            indice = carregar_indice(obter_memoria(), idioma)
+            self.after(0, lambda: self._trocar_indice_aproximado(geracao, indice))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _trocar_indice_aproximado(self, geracao, indice):
+        with self._lock_indice:
+            if geracao != self.geracao_indice:
+                return  # Uma recarga mais nova (ex: outro idioma) já começou
+            indice.adicionar_varios(self.adicoes_durante_recarga)
+            self.adicoes_durante_recarga = None
+            self.indice_aproximado = indice
+        if len(indice):
+            self.log(f"Memória de tradução: {len(indice)} textos disponíveis para busca aproximada.")
+
+    def _indexar_traducoes(self, pares):
+        """Acrescenta pares (original, tradução) ao índice aproximado; pode ser chamado de qualquer thread."""
+        pares = list(pares)
+        with self._lock_indice:
+            self.indice_aproximado.adicionar_varios(pares)
+            if self.adicoes_durante_recarga is not None:
+                self.adicoes_durante_recarga.extend(pares)
+
+    def _mostrar_correspondencias(self, original_text):
+        """Lista, abaixo do texto original, as traduções da memória para textos parecidos."""
+        self.correspondencias = self.indice_aproximado.buscar(original_text) if original_text else []
+        linhas = [f"{similaridade:.0%}  {texto} → {traducao}" for similaridade, texto, traducao in self.correspondencias]
+        self.fuzzy_textbox.configure(state="normal")
+        self.fuzzy_textbox.delete("1.0", "end")
+        self.fuzzy_textbox.insert("1.0", "\n".join(linhas) if linhas else "Nenhuma tradução parecida na memória.")
+        self.fuzzy_textbox.configure(state="disabled")
+
+    def _usar_correspondencia(self, event):
+        """Duplo clique numa correspondência: copia a tradução dela para a caixa de tradução."""
+        linha = int(self.fuzzy_textbox.index(f"@{event.x},{event.y}").split(".")[0]) - 1
+        if 0 <= linha < len(self.correspondencias):
+            self.traducao_textbox.delete("1.0", "end")
+            self.traducao_textbox.insert("1.0", self.correspondencias[linha][2])
+
+    def _exemplos_para(self, textos, maximo=8):
+        """Pares (original, tradução) da memória parecidos com 'textos', para usar no prompt."""
+        if not self.exemplos_da_memoria.get():
+            return []
+        exemplos = {}
+        for texto in textos:
+            for _similaridade, original, traducao in self.indice_aproximado.buscar(texto, limite=1):
+                if original != texto:
+                    exemplos.setdefault(original, traducao)
+            if len(exemplos) >= maximo:
+                break
+        return list(exemplos.items())
+
+    def _politica_de_roteamento(self):
+        """Provedores da sugestão linha a linha, com a exceção do projeto (nome do XML) se houver."""
+        projeto = os.path.basename(self.arquivo_xml_path) if self.arquivo_xml_path else None
+        return resolver_politica(self.config_roteamento, projeto)
 
     def iniciar_traducao_linha_selecionada(self):
         # --- GUARDIÃO DA API ---
-        if not self._ensure_api_key():
+        if "Gemini" in self._politica_de_roteamento()["provedores"] and not self._ensure_api_key():
             return # Para a execução se não houver chave
 
         if not self.tree.selection(): 
             self.log(self.i18n.get("log_no_selection"))
             return
-        threading.Thread(target=self._worker_traduzir_linha, daemon=True).start()
-
-    def _worker_traduzir_linha(self):
         selected_item_id = self.tree.selection()[0]
-        original_text = self.tree.item(selected_item_id, 'values')[0]
-        
-        self.after(0, lambda: self.tree.item(selected_item_id, tags=('traduzindo',)))
-        
-        modelo_escolhido, _ = self.modelos_disponiveis[self.modelo_selecionado.get()]
+        original_text = self.projeto.original(selected_item_id)
+        estado_anterior = self.projeto.estado(selected_item_id)
+
+        self._cancelar_sugestao()
+        cancelar = threading.Event()
+        if self.sugestao_em_andamento is None:
+            self.after(50, self._drenar_fila_sugestao)
+        self.sugestao_em_andamento = (selected_item_id, cancelar)
+        self.projeto.definir(selected_item_id, TRADUZINDO)
+        threading.Thread(
+            target=self._worker_traduzir_linha, args=(selected_item_id, original_text, estado_anterior, cancelar), daemon=True,
+        ).start()
+
+    def _cancelar_sugestao(self, exceto=None):
+        """Interrompe a sugestão em andamento (ex: a seleção mudou para outra linha)."""
+        if self.sugestao_em_andamento and self.sugestao_em_andamento[0] != exceto:
+            self.sugestao_em_andamento[1].set()
+
+    def _encerrar_sugestao(self, cancelar):
+        if self.sugestao_em_andamento and self.sugestao_em_andamento[1] is cancelar:
+            self.sugestao_em_andamento = None
+
+    def _drenar_fila_sugestao(self):
+        """Leva à caixa de tradução só o texto parcial mais recente; roda a cada 50 ms enquanto há sugestão."""
+        ultimo = None
+        while True:
+            try:
+                ultimo = self.fila_sugestao.get_nowait()
+            except queue.Empty:
+                break
+        em_andamento = self.sugestao_em_andamento
+        if ultimo and em_andamento and ultimo[1] is em_andamento[1] and not em_andamento[1].is_set():
+            self._update_textbox_com_feedback(ultimo[0], ultimo[2])
+        if em_andamento:
+            self.after(50, self._drenar_fila_sugestao)
+
+    def _worker_traduzir_linha(self, selected_item_id, original_text, estado_anterior, cancelar):
+        modelo_escolhido = self.modelos_disponiveis[self.modelo_selecionado.get()]
         meta = self.translation_target or {"code": "pt", "deepl": "PT-BR", "label": "Portuguese (Brazil)"}
-        config = {
-            "api_key": self.api_key,
-            "model": modelo_escolhido,
+        base = {
             "target_lang": meta.get("code", "pt"),
             "target_label": meta.get("label", "Portuguese (Brazil)"),
             "deepl_lang": meta.get("deepl", "PT-BR"),
             "source_label": self.source_language_label,
+            "examples": self._exemplos_para([original_text]),
         }
-        traducao_sugerida = translate_text("Gemini", original_text, config)
+
+        # Provedores em ordem de prioridade; o roteador respeita os limites de taxa,
+        # pula quem estiver limitado ou fora do ar e, se configurado, duplica o pedido
+        # quando o primeiro demora (hedge)
+        politica = self._politica_de_roteamento()
+        configs = montar_configs(
+            politica["provedores"], base, self.config_roteamento,
+            chaves={"Gemini": self.api_key}, modelos={"Gemini": modelo_escolhido},
+        )
+
+        # O texto parcial vai para a caixa conforme chega. Com hedge, só o primeiro
+        # provedor que começar a responder escreve nela (até falhar ou ser abandonado)
+        dono = {}
+        abandonados = set()
+
+        def publicar(servico, parcial):
+            if servico not in abandonados and dono.setdefault("servico", servico) == servico:
+                self.fila_sugestao.put((selected_item_id, cancelar, parcial))
+
+        def ao_trocar(servico, motivo):
+            abandonados.add(servico)
+            if dono.get("servico") == servico:
+                dono.clear()
+            if not cancelar.is_set():
+                self.log(f"{servico}: {motivo}. Tentando o próximo provedor...")
+
+        for servico, config in configs.items():
+            config.update(cancel_event=cancelar, on_partial=lambda parcial, servico=servico: publicar(servico, parcial))
+        roteador = Roteador(politica, configs, self.config_limites, traduzir=stream_text)
+        traducao_sugerida = servico = None
+        try:
+            traducao_sugerida, servico = roteador.traduzir(original_text, ao_trocar=ao_trocar, cancel_event=cancelar)
+        except FalhaDoProvedor as erro:
+            # O erro vai para o log, nunca para a coluna de tradução
+            if not cancelar.is_set():
+                self.log(f"Falha ao traduzir a linha: {erro}")
+        finally:
+            roteador.fechar()
+        cancelada = cancelar.is_set()
+        cancelar.set()  # Encerra os streams que ficaram para trás (pedidos duplicados)
+        self.after(0, lambda: self._encerrar_sugestao(cancelar))
+        if traducao_sugerida is None or cancelada:
+            # Uma linha que ainda não tinha tradução fica marcada com o erro; a cancelada volta a como estava
+            estado = ERRO if not cancelada and estado_anterior in (NAO_TRADUZIDO, ERRO) else estado_anterior
+            self.after(0, lambda: self.projeto.definir(selected_item_id, estado))
+            return
+        if servico != politica["provedores"][0]:
+            self.log(f"Sugestão fornecida por {servico}.")
         
         self.after(0, lambda: self._update_ui_com_traducao(selected_item_id, traducao_sugerida))
         self.after(0, lambda: self.aprovar_traducao(id_item=selected_item_id, salvar_texto=False))
@@ -769,6 +1224,9 @@ class TranslatorApp(ctk.CTk):
             return
 
         # Se não, iniciamos o processo normalmente
+        if not self.projeto_carregado:
+            messagebox.showwarning("Atenção", "Carregue um arquivo XML antes de traduzir.")
+            return
         if not self._ensure_api_key():
             return
             
@@ -787,147 +1245,210 @@ class TranslatorApp(ctk.CTk):
     def _worker_traducao_resumivel(self):
         """Esta é a nossa função 'operária'. Ela roda em segundo plano, é resumível e pode ser cancelada."""
         
-        ARQUIVO_SAIDA = "textos_traduzidos_checkpoint.json"
-        TAMANHO_DO_LOTE = 120
-
-        # Carrega o progresso anterior, se houver
-        dados_traduzidos = {}
-        if os.path.exists(ARQUIVO_SAIDA):
-            with open(ARQUIVO_SAIDA, 'r', encoding='utf-8') as f:
-                try: 
-                    dados_traduzidos = json.load(f)
-                except json.JSONDecodeError: 
-                    pass # Ignora o arquivo se estiver corrompido e começa do zero
+        # Carrega o progresso anterior deste projeto, se houver (diário só de acréscimos: um registro por lote)
+        diario = self._diario_do_projeto()
+        dados_traduzidos = diario.carregar()
+        if diario.linhas_descartadas:
+            self.log(f"Checkpoint: {diario.linhas_descartadas} registro(s) incompleto(s) descartado(s); o resto foi recuperado.")
         
-        # Pega todos os xpaths da tabela e filtra os que já foram traduzidos
-        todos_xpaths = self.tree.get_children()
-        xpaths_pendentes = [xpath for xpath in todos_xpaths if xpath not in dados_traduzidos]
+        # Linhas do projeto que ainda não estão no checkpoint
+        lista_de_itens_pendentes = self.projeto.pendentes(excluir=dados_traduzidos)
         
-        if not xpaths_pendentes:
+        if not lista_de_itens_pendentes:
             self.log("Todos os itens já parecem estar traduzidos no arquivo de checkpoint.")
             self.traduzir_tudo_button.configure(state="normal", text="Traduzir Itens Pendentes (IA)")
             self.translation_queue.put(("DONE", "DONE")) # Avisa a UI para resetar o botão
             return
 
-        lista_de_itens_pendentes = [(xpath, self.tree.item(xpath, 'values')[0]) for xpath in xpaths_pendentes]
         total_pendentes = len(lista_de_itens_pendentes)
         
         self.log(self.i18n.get("log_batch_complete", count=total_pendentes))
 
-        for i in range(0, total_pendentes, TAMANHO_DO_LOTE):
-            
-            # Antes de processar o lote, verifica se o cancelamento foi solicitado
-            if self.cancel_event.is_set():
-                self.log(self.i18n.get("log_mass_translation_cancelled"))
-                self.translation_queue.put(("DONE", "DONE")) # Avisa a UI que terminamos
-                return
+        modelo_nome = self.modelos_disponiveis.get(self.modelo_selecionado.get(), "gemini-1.5-flash")
+
+        # Memória de tradução: textos já traduzidos antes (ou repetidos) não vão para a API
+        memoria = obter_memoria()
+        contexto = self._contexto_memoria(modelo_nome)
+        xpaths_por_texto = {}
+        for xpath, texto in lista_de_itens_pendentes:
+            xpaths_por_texto.setdefault(texto, []).append(xpath)
+        da_memoria = memoria.buscar_varios(list(xpaths_por_texto), contexto)
+        reaproveitados = {}
+        if da_memoria:
+            for texto, texto_traduzido in da_memoria.items():
+                for xpath in xpaths_por_texto.pop(texto):
+                    dados_traduzidos[xpath] = texto_traduzido
+                    reaproveitados[xpath] = texto_traduzido
+                    self.translation_queue.put((xpath, texto_traduzido))
+            diario.registrar(reaproveitados)
+            self.log(f"Memória de tradução: {len(da_memoria)} texto(s) reaproveitado(s) sem chamar a API.")
+        lista_de_itens_pendentes = [(xpaths[0], texto) for texto, xpaths in xpaths_por_texto.items()]
+
+        # Lotes montados por orçamento de tokens de saída, que encolhe se a resposta vier truncada
+        empacotador = obter_empacotador("Gemini", modelo_nome, self.config_orcamentos)
+
+        def traduzir_lote(lote_atual):
+            """Roda numa thread do motor: envia um lote e devolve {xpath: tradução} ou None."""
+            textos = [texto for _xpath, texto in lote_atual]
+            # Cada requisição do lote (reenvios, itens avulsos) passa pelo limitador do motor
+            traducoes, faltando_na_primeira = self._traduzir_lote_api(
+                textos, modelo_nome, self._exemplos_para(textos), antes_de_enviar=motor.reservar_envio,
+            )
 
-            lote_atual = lista_de_itens_pendentes[i:i + TAMANHO_DO_LOTE]
-            texto_para_prompt = ""
-            xpaths_enviados_neste_lote = []
-            for xpath, texto in lote_atual:
-                texto_para_prompt += f"[ID: {xpath}]\n{texto}\n---\n"
-                xpaths_enviados_neste_lote.append(xpath)
+            # O orçamento aprende com a primeira resposta (antes dos reenvios)
+            faltando = {lote_atual[posicao][0] for posicao in faltando_na_primeira}
+            novo_orcamento = empacotador.registrar(lote_atual, {xpath: True for xpath, _texto in lote_atual if xpath not in faltando})
+            if novo_orcamento:
+                self.log(f"Orçamento por lote ajustado para ~{novo_orcamento} tokens de resposta.")
+            if faltando:
+                recuperados = sum(1 for posicao in faltando_na_primeira if traducoes[posicao] is not None)
+                self.log(f"{len(faltando)} item(ns) faltaram na resposta; {recuperados} recuperado(s) no reenvio.")
+            return {xpath: traducao for (xpath, _texto), traducao in zip(lote_atual, traducoes) if traducao is not None}
+
+        def concluir_lote(_indice, lote_atual, traducoes):
+            """Chamado pelo motor na ordem dos lotes: atualiza a fila e o checkpoint."""
+            originais = dict(lote_atual)
+            novos_pares = []
+            registro = {}
+            for xpath, texto_traduzido in traducoes.items():
+                novos_pares.append((originais[xpath], texto_traduzido))
+                for mesmo_texto in xpaths_por_texto[originais[xpath]]:
+                    registro[mesmo_texto] = texto_traduzido
+                    self.translation_queue.put((mesmo_texto, texto_traduzido))
+            dados_traduzidos.update(registro)
+            memoria.gravar_varios(novos_pares, contexto)
+            self._indexar_traducoes(novos_pares)
             
-            resposta_do_lote = self._traduzir_lote_api(texto_para_prompt)
-            
-            if resposta_do_lote:
-                traducoes_encontradas = re.findall(r'\[ID: (.*?)\]\n(.*?)\n---', resposta_do_lote, re.DOTALL)
-                
-                xpaths_recebidos_neste_lote = []
-                for xpath, texto_traduzido in traducoes_encontradas:
-                    xpath_limpo = xpath.strip()
-                    dados_traduzidos[xpath_limpo] = texto_traduzido.strip()
-                    self.translation_queue.put((xpath_limpo, texto_traduzido.strip()))
-                    xpaths_recebidos_neste_lote.append(xpath_limpo)
-                
-                # Lógica para detectar e avisar sobre itens pulados
-                xpaths_pulados = set(xpaths_enviados_neste_lote) - set(xpaths_recebidos_neste_lote)
-                if xpaths_pulados:
-                    self.log(f"AVISO: {len(xpaths_pulados)} item(ns) foram pulados pela IA neste lote.")
-
-                # CHECKPOINT: Salva o progresso total
-                with open(ARQUIVO_SAIDA, 'w', encoding='utf-8') as f:
-                    json.dump(dados_traduzidos, f, indent=4, ensure_ascii=False)
-                self.log(self.i18n.get("log_batch_complete", count=len(dados_traduzidos)))
-            else:
-                self.log(self.i18n.get("log_batch_fail"))
-                break # Interrompe o processo se houver uma falha na API
+            # Lógica para detectar e avisar sobre itens pulados
+            xpaths_pulados = {xpath for xpath, _texto in lote_atual} - set(traducoes)
+            if xpaths_pulados:
+                self.log(f"AVISO: {len(xpaths_pulados)} item(ns) ficaram sem tradução mesmo após o reenvio; continuam pendentes.")
+
+            # CHECKPOINT: grava só este lote no diário (fsync), antes de seguir adiante
+            diario.registrar(registro)
+            self.log(self.i18n.get("log_batch_complete", count=len(dados_traduzidos)))
+
+        # Vários lotes em andamento ao mesmo tempo; os resultados chegam em ordem
+        motor = MotorTraducao(
+            "Gemini",
+            concorrencia=self.concorrencia_traducao,
+            cancel_event=self.cancel_event,
+            traduzir_lote=traduzir_lote,
+            limitador=obter_limitador("Gemini", modelo_nome, self.config_limites),
+            ao_aguardar=lambda segundos: self.log(
+                f"Limite de taxa do modelo atingido: próximo lote em {segundos:.0f}s."
+            ),
+            ao_erro_transitorio=lambda erro, segundos: self.log(
+                f"Falha temporária da API ({erro}); o lote será reenviado em {segundos:.0f}s."
+            ),
+        )
+        try:
+            estado = motor.executar(empacotador.empacotar(lista_de_itens_pendentes), concluir_lote)
+        finally:
+            # Reescreve o diário como um único registro; se o processo morrer antes, a reaplicação resolve
+            diario.compactar(dados_traduzidos)
+        estatisticas = memoria.estatisticas()
+        self.log(
+            f"Memória de tradução: {estatisticas['acertos']} acerto(s), {estatisticas['falhas']} falha(s), "
+            f"{estatisticas['entradas']} entradas no banco."
+        )
 
-            time.sleep(5)
+        if estado == "cancelado":
+            self.log(self.i18n.get("log_mass_translation_cancelled"))
+            self.translation_queue.put(("DONE", "DONE")) # Avisa a UI que terminamos
+            return
+        if estado == "falha":
+            self.log(self.i18n.get("log_batch_fail"))
+            if motor.ultimo_erro:
+                self.log(f"ERRO na API: {motor.ultimo_erro}")
             
         self.log(self.i18n.get("log_mass_translation_done"))
         # Sinaliza para a interface que o trabalho acabou
         self.translation_queue.put(("DONE", "DONE"))
 
-    def _traduzir_lote_api(self, lote_de_texto):
-        """Funcao auxiliar que efetivamente chama a API Gemini."""
-        try:
-            genai.configure(api_key=self.api_key)
-            modelo_nome, _ = self.modelos_disponiveis.get(
-                self.modelo_selecionado.get(),
-                ("gemini-1.5-flash", 0),
-            )
-            model = get_gemini_model(modelo_nome)
-            meta = self.translation_target or {"label": "Portuguese (Brazil)"}
-            target_label = meta.get("label", "Portuguese (Brazil)")
-            prompt = (
-                "Act as a game localization specialist.\n"
-                "Each entry below is formatted as [ID: ...] followed by text.\n"
-                f"Translate every entry to {target_label}. Keep the IDs and separators exactly as provided.\n\n"
-                "---BEGIN BLOCK---\n"
-                f"{lote_de_texto}\n"
-                "---END BLOCK---\n"
-            )
-            response = model.generate_content(prompt)
-            return response.text
-        except Exception as e:
-            self.log(f"ERRO na API: {e}")
-            return None
+    def _traduzir_lote_api(self, textos, modelo_nome=None, exemplos=None, antes_de_enviar=None):
+        """
+        Funcao auxiliar que efetivamente chama a API Gemini (protocolo JSON
+        numerado, com reenvio dos IDs que faltarem). Retorna (traduções na
+        ordem dos textos, com None no que não voltou, posições que faltaram na
+        primeira resposta). Erros da API sobem como FalhaDoProvedor, já
+        classificados: o motor reenvia o lote nos transitórios.
+        'antes_de_enviar(tokens)' é chamado antes de cada requisição (limitador).
+        """
+        if modelo_nome is None:
+            modelo_nome = self.modelos_disponiveis.get(self.modelo_selecionado.get(), "gemini-1.5-flash")
+        meta = self.translation_target or {"code": "pt", "label": "Portuguese (Brazil)"}
+        config = {
+            "api_key": self.api_key,
+            "model": modelo_nome,
+            "target_lang": meta.get("code", "pt"),
+            "target_label": meta.get("label", "Portuguese (Brazil)"),
+            "source_label": self.source_language_label,
+            "examples": exemplos,
+            "before_request": antes_de_enviar,
+        }
+        return executar_com_resiliencia(
+            lambda: AVAILABLE_SERVICES["Gemini"].translate_numbered(textos, config), "Gemini",
+            politica=BATCH_RETRIES_POLICY, cancel_event=self.cancel_event,
+        )
 
     def processar_fila_de_traducao(self):
-        """Verifica a fila de traduções e atualiza a interface gráfica."""
-        try:
-            # Pega um item da fila sem bloquear
-            xpath, traducao = self.translation_queue.get_nowait()
-            
+        """
+        Leva à tabela as traduções da fila. Cada rodada tira o que houver na
+        fila (várias traduções da mesma linha viram uma só) e aplica o que
+        couber em ORCAMENTO_POR_QUADRO; o resto fica para a rodada seguinte,
+        que vem logo depois de o Tk desenhar a tela e tratar os eventos.
+        """
+        limite = time.perf_counter() + ORCAMENTO_POR_QUADRO
+        while time.perf_counter() < limite:
+            try:
+                xpath, traducao = self.translation_queue.get_nowait()
+            except queue.Empty:
+                break
             if xpath == "DONE":
-                # O trabalho acabou, reabilita o botão
-                self.traduzir_tudo_button.configure(state="normal", text=self.i18n.get("translate_all_button"))
-                return
-
-            # Atualiza a tabela
-            if self.tree.exists(xpath):
-                original_text, _ = self.tree.item(xpath, 'values')
-                self.tree.item(xpath, values=(original_text, traducao), tags=('traduzido',))
-                self.atualizar_estatisticas()
-            
-            # Chama a si mesma novamente para continuar processando a fila
-            self.after(100, self.processar_fila_de_traducao)
-
-        except queue.Empty:
-            # A fila está vazia, mas a thread ainda pode estar trabalhando.
-            # Continua checando a cada 100ms.
-            self.after(100, self.processar_fila_de_traducao)
+                self.fila_terminou = True
+            else:
+                self.atualizacoes_pendentes[xpath] = traducao
+
+        lote = {}
+        while self.atualizacoes_pendentes and time.perf_counter() < limite:
+            xpath, traducao = self.atualizacoes_pendentes.popitem(last=False)
+            lote[xpath] = traducao
+        if self.projeto.definir_varios(lote):
+            self.atualizar_estatisticas()  # Uma vez por rodada, não por linha
+
+        if self.atualizacoes_pendentes or not self.translation_queue.empty():
+            self.after(1, self.processar_fila_de_traducao)
+        elif self.fila_terminou:
+            # O trabalho acabou e tudo já está na tabela: reabilita o botão
+            self.fila_terminou = False
+            self.traduzir_tudo_button.configure(state="normal", text=self.i18n.get("translate_all_button"))
+        else:
+            # A fila está vazia, mas a thread ainda pode estar trabalhando
+            self.after(INTERVALO_FILA_MS, self.processar_fila_de_traducao)
 
     def aprovar_traducao(self, id_item=None, salvar_texto=True):
         selected_item_id = id_item if id_item else (self.tree.selection()[0] if self.tree.selection() else None)
         if not selected_item_id: return
         
-        tags_atuais = self.tree.item(selected_item_id, 'tags')
-        original_text, traducao_antiga = self.tree.item(selected_item_id, 'values')
+        original_text = self.projeto.original(selected_item_id)
+        traducao_antiga = self.projeto.traducao(selected_item_id)
         
         nova_traducao = traducao_antiga
         if salvar_texto:
             nova_traducao = self.traducao_textbox.get("1.0", "end-1c").strip()
         
-        # Atualiza a tabela com o novo valor e a nova tag
-        self.tree.item(selected_item_id, values=(original_text, nova_traducao), tags=('traduzido',))
+        # Atualiza a tabela com o novo valor e o novo estado (revisado pelo usuário = aprovado)
+        self.projeto.definir(selected_item_id, APROVADO if salvar_texto else TRADUZIDO, nova_traducao)
+
+        # A tradução aprovada passa a valer como referência para textos parecidos
+        if nova_traducao and not nova_traducao.startswith("ERRO"):
+            if salvar_texto:  # Texto revisado pelo usuário (sugestões da IA já estão na memória)
+                # Sem serviço nem modelo no contexto: vale para qualquer provedor na próxima vez
+                obter_memoria().gravar(original_text, nova_traducao, contexto_aprovado(self._contexto_memoria("")))
+            self._indexar_traducoes([(original_text, nova_traducao)])
         
-        # Só atualiza as estatísticas se o item era 'nao_traduzido' antes.
-        # Isso evita contar o mesmo item duas vezes.
-        if 'nao_traduzido' in tags_atuais:
-            self.atualizar_estatisticas()
+        self.atualizar_estatisticas()
         
     def _update_textbox_com_feedback(self, item_id, texto):
         if self.tree.selection() and self.tree.selection()[0] == item_id:
@@ -935,19 +1456,17 @@ class TranslatorApp(ctk.CTk):
             self.traducao_textbox.insert("1.0", texto)
 
     def _update_ui_com_traducao(self, item_id, traducao_sugerida):
-        original_text = self.tree.item(item_id, 'values')[0]
-        self.tree.item(item_id, values=(original_text, traducao_sugerida))
+        self.projeto.definir(item_id, traducao=traducao_sugerida)
         if self.tree.selection() and self.tree.selection()[0] == item_id:
             self.traducao_textbox.delete("1.0", "end"); self.traducao_textbox.insert("1.0", traducao_sugerida)
     
     def atualizar_estatisticas(self):
-        # Lógica 100% baseada na contagem de tags, muito mais confiável.
-        total_itens = len(self.tree.get_children())
-        itens_traduzidos = len(self.tree.tag_has('traduzido'))
+        # Lê as contagens mantidas a cada mudança de estado, sem percorrer a tabela
+        total_itens = len(self.projeto)
+        itens_traduzidos = self.projeto.concluidos
         
         self.stats_label.configure(text=self.i18n.get("stats_template", done=itens_traduzidos, total=total_itens))
-        progresso = itens_traduzidos / total_itens if total_itens > 0 else 0
-        self.progressbar.set(progresso)
+        self.progressbar.set(self.projeto.progresso())
 
 
     def configurar_api_key(self):
@@ -988,15 +1507,8 @@ class TranslatorApp(ctk.CTk):
 
         # --- LÓGICA CORRIGIDA AQUI ---
 
-        # FIX 1: Montando o dicionário da forma correta (XPath -> Tradução)
-        mapa_final_traducoes = {}
-        for xpath_id in self.tree.get_children():
-            # O ID de cada linha (child_id) É o próprio XPath
-            _original, traducao = self.tree.item(xpath_id, 'values')
-            
-            # Só adicionamos ao mapa se houver uma tradução
-            if traducao.strip():
-                mapa_final_traducoes[xpath_id] = traducao
+        # XPath -> Tradução, só das linhas com tradução preenchida
+        mapa_final_traducoes = self.projeto.traduzidas()
         
         if not mapa_final_traducoes:
             messagebox.showwarning(self.i18n.get("warn_no_xml_title"), self.i18n.get("warn_no_translations_to_export"))
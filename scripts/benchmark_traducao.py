@@ -0,0 +1,328 @@
+"""
+Benchmark do motor de tradução contra o servidor Ollama falso.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmark_traducao.py concorrencia --itens 400 --lote 10 --niveis 1 2 4 8
+    python scripts/benchmark_traducao.py aproximada --entradas 500000 --consultas 2000
+    python scripts/benchmark_traducao.py glossario --termos 20000
+    python scripts/benchmark_traducao.py lotes --itens 20000 --limite-saida 8192 --orcamento 12000
+    python scripts/benchmark_traducao.py sugestao --palavras 120 --latencia 4
+    python scripts/benchmark_traducao.py ollama --itens 400 --latencia 0.5 --por-item 0.02 --slots 4
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+warnings.simplefilter('ignore', FutureWarning)  # Aviso de depreciação do google.generativeai
+
+from core.glossario import GlossarioCompilado
+from core.lotes import EmpacotadorDeLotes, custo_saida
+from core.memoria_aproximada import LIMIAR_PADRAO, IndiceAproximado, jaccard, trigramas
+from core.motor_traducao import MotorTraducao, dividir_em_lotes
+from core.tradutor_api import AVAILABLE_SERVICES, stream_text, translate_text
+from servidor_ollama_falso import iniciar_em_segundo_plano
+
+SERVICO = "Llama 3 (Local)"
+
+
+def gerar_itens(quantidade):
+    return [(f"/root/baseVillain[{i + 1}]/bio[1]", f"Deal {i % 100} damage to X.") for i in range(quantidade)]
+
+
+def bench_concorrencia(itens, lote, niveis, latencia, slots):
+    servidor = iniciar_em_segundo_plano(latencia=latencia, slots=slots)
+    config = {"ollama_url": servidor.url, "memoria": None}  # Sem memória: toda rodada vai à rede
+    lotes = dividir_em_lotes(gerar_itens(itens), lote)
+    print(f"servidor: latência {latencia}s, {slots} slot(s); {itens} itens em {len(lotes)} lotes")
+    print(f"{'concorrência':>12} {'tempo (s)':>10} {'itens/s':>9}")
+    try:
+        for nivel in niveis:
+            recebidos = []
+
+            def concluir(indice, _lote, traducoes):
+                recebidos.append(indice)
+
+            motor = MotorTraducao(SERVICO, config, concorrencia=nivel)
+            inicio = time.perf_counter()
+            estado = motor.executar(lotes, concluir)
+            duracao = time.perf_counter() - inicio
+            if estado != "concluido" or recebidos != list(range(len(lotes))):
+                raise SystemExit("ERRO: lotes perdidos ou entregues fora de ordem")
+            print(f"{nivel:>12} {duracao:>10.2f} {itens / duracao:>9.1f}")
+    finally:
+        servidor.shutdown()
+
+
+# Frequência das letras em inglês (%), para palavras inventadas com trigramas variados
+FREQUENCIA_LETRAS = {
+    "e": 12.7, "t": 9.1, "a": 8.2, "o": 7.5, "i": 7.0, "n": 6.7, "s": 6.3, "h": 6.1, "r": 6.0, "d": 4.3,
+    "l": 4.0, "c": 2.8, "u": 2.8, "m": 2.4, "w": 2.4, "f": 2.2, "g": 2.0, "y": 2.0, "p": 1.9, "b": 1.5,
+    "v": 1.0, "k": 0.8, "j": 0.2, "x": 0.2, "q": 0.1, "z": 0.1,
+}
+
+
+def gerar_frases(quantidade, semente=1, moldes=300, vocabulario=4000):
+    """
+    Textos de jogo sintéticos: 60% saem de 'moldes' frases com número e alvo
+    variáveis (quase-duplicatas, como "Deal 50/75 damage to X"), o resto são
+    frases livres.
+    """
+    aleatorio = random.Random(semente)
+    estrutura = random.Random(0)  # Vocabulário e moldes iguais em todas as chamadas
+    letras, pesos = zip(*FREQUENCIA_LETRAS.items())
+    palavras = ["".join(estrutura.choices(letras, pesos, k=estrutura.randint(2, 9))) for _ in range(vocabulario)]
+    modelos = [
+        " ".join(estrutura.choice(palavras) for _ in range(estrutura.randint(2, 6))).capitalize()
+        + " {n} " + " ".join(estrutura.choice(palavras) for _ in range(estrutura.randint(1, 4))) + " to {alvo}."
+        for _ in range(moldes)
+    ]
+    frases = []
+    for _ in range(quantidade):
+        if aleatorio.random() < 0.6:
+            frases.append(aleatorio.choice(modelos).format(
+                n=aleatorio.randint(1, 99), alvo=f"the {aleatorio.choice(palavras)}",
+            ))
+        else:
+            frases.append(" ".join(aleatorio.choice(palavras) for _ in range(aleatorio.randint(3, 12))).capitalize() + ".")
+    return frases
+
+
+def bench_aproximada(entradas, consultas, limiar, conferir):
+    frases = gerar_frases(entradas)
+    indice = IndiceAproximado(limiar)
+    inicio = time.perf_counter()
+    for frase in frases:
+        indice.adicionar(frase, f"[pt] {frase}")
+    construcao = time.perf_counter() - inicio
+    print(f"índice: {len(indice)} entradas distintas em {construcao:.1f}s")
+
+    tempos = []
+    com_resultado = 0
+    for consulta in gerar_frases(consultas, semente=2):
+        inicio = time.perf_counter()
+        resultado = indice.buscar(consulta)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        com_resultado += bool(resultado)
+    tempos.sort()
+    print(f"{consultas} consultas (limiar {limiar}): {com_resultado} com candidatos")
+    print(f"mediana {statistics.median(tempos):.3f} ms, p95 {tempos[int(len(tempos) * 0.95)]:.3f} ms")
+
+    if conferir:
+        # Compara o melhor resultado com uma varredura completa (lenta) da memória
+        conjuntos = [trigramas(frase) for frase in dict.fromkeys(frases)]
+        esperados = encontrados = exatos = 0
+        diferencas = []
+        for consulta in gerar_frases(conferir, semente=2):
+            alvo = trigramas(consulta)
+            melhor = max((jaccard(alvo, outro) for outro in conjuntos), default=0.0)
+            if melhor < limiar:
+                continue
+            esperados += 1
+            resultado = indice.buscar(consulta, limite=1)
+            if resultado:
+                encontrados += 1
+                exatos += resultado[0][0] >= melhor - 1e-9
+                diferencas.append(melhor - resultado[0][0])
+        print(f"conferência: {encontrados}/{esperados} com candidato, {exatos} com o melhor exato, "
+              f"diferença média {statistics.mean(diferencas or [0]):.3f}")
+
+
+def substituir_em_cadeia(texto, pares_ordenados):
+    """Implementação antiga: um str.replace por termo, do mais longo ao mais curto."""
+    for original, traducao in pares_ordenados:
+        if original in texto:
+            texto = texto.replace(original, traducao)
+    return texto
+
+
+def bench_glossario(termos, textos):
+    aleatorio = random.Random(3)
+    letras, pesos = zip(*FREQUENCIA_LETRAS.items())
+    glossario = {}
+    while len(glossario) < termos:
+        termo = " ".join("".join(aleatorio.choices(letras, pesos, k=aleatorio.randint(3, 9))).capitalize()
+                         for _ in range(aleatorio.randint(1, 3)))
+        glossario[termo] = f"<{termo.upper()}>"
+    nomes = list(glossario)
+    frases = [
+        " ".join(aleatorio.choice(nomes) if aleatorio.random() < 0.1 else frase for frase in base.split())
+        for base in gerar_frases(textos, semente=4)
+    ]
+
+    inicio = time.perf_counter()
+    compilado = GlossarioCompilado(glossario)
+    print(f"{termos} termos compilados em {time.perf_counter() - inicio:.2f}s")
+
+    inicio = time.perf_counter()
+    for frase in frases:
+        compilado.aplicar(frase)
+    novo = (time.perf_counter() - inicio) / len(frases) * 1e6
+
+    amostra = frases[:max(1, len(frases) // 20)]  # A versão antiga é lenta demais para o conjunto todo
+    pares = sorted(glossario.items(), key=lambda item: len(item[0]), reverse=True)
+    inicio = time.perf_counter()
+    for frase in amostra:
+        substituir_em_cadeia(frase, pares)
+    antigo = (time.perf_counter() - inicio) / len(amostra) * 1e6
+    print(f"por texto: compilado {novo:.1f} µs, str.replace em cadeia {antigo:.0f} µs ({antigo / novo:.0f}x)")
+
+
+def simular_modelo(lote, limite_saida, aleatorio):
+    """Modelo fictício: responde os itens em ordem até estourar o limite real de tokens de saída."""
+    traducoes, usados = {}, 0
+    for item_id, texto in lote:
+        usados += custo_saida(texto) * aleatorio.uniform(0.8, 1.25)  # A estimativa erra para os dois lados
+        if usados > limite_saida:
+            break
+        traducoes[item_id] = texto
+    return traducoes
+
+
+def bench_lotes(itens, limite_saida, orcamento, lote_fixo):
+    aleatorio = random.Random(5)
+    frases = gerar_frases(itens * 4, semente=6)
+    textos = []
+    for i in range(itens):
+        if aleatorio.random() < 0.3:  # Biografias longas no meio de rótulos curtos
+            textos.append(" ".join(frases[4 * i:4 * i + 4]) * aleatorio.randint(1, 6))
+        else:
+            textos.append(frases[4 * i].split(" to ")[0])
+    itens_fonte = [(str(i), texto) for i, texto in enumerate(textos)]
+    print(f"{itens} itens; limite real de saída {limite_saida} tokens; orçamento inicial {orcamento}")
+    print(f"{'estratégia':>22} {'requisições':>12} {'itens/req':>10} {'pulados':>9} {'pulados nos 20% finais':>23}")
+
+    def rodar(nome, lotes, registrar=None):
+        requisicoes = pulados = pulados_fim = 0
+        fim = int(itens * 0.8)
+        for lote in lotes:
+            requisicoes += 1
+            traducoes = simular_modelo(lote, limite_saida, aleatorio)
+            perdidos = [item_id for item_id, _texto in lote if item_id not in traducoes]
+            pulados += len(perdidos)
+            pulados_fim += sum(1 for item_id in perdidos if int(item_id) >= fim)
+            if registrar:
+                registrar(lote, traducoes)
+        print(f"{nome:>22} {requisicoes:>12} {itens / requisicoes:>10.1f} {pulados / itens:>9.2%} "
+              f"{pulados_fim / (itens - fim):>23.2%}")
+
+    rodar(f"fixo ({lote_fixo} itens)", dividir_em_lotes(itens_fonte, lote_fixo))
+    empacotador = EmpacotadorDeLotes("simulacao", orcamento, itens=200)
+    rodar("orçamento adaptativo", empacotador.empacotar(itens_fonte), empacotador.registrar)
+    print(f"orçamento final: {empacotador.orcamento} tokens ({empacotador.truncagens} truncagem(ns) observada(s))")
+
+
+def bench_sugestao(palavras, latencia, repeticoes):
+    """Tempo até o primeiro caractere na caixa de tradução: resposta inteira x streaming."""
+    servidor = iniciar_em_segundo_plano(latencia=latencia, slots=1)
+    texto = " ".join(f"palavra{i}" for i in range(palavras))
+    config = {"ollama_url": servidor.url, "memoria": None}
+    print(f"Texto de {palavras} palavras; servidor leva {latencia}s para gerar a resposta inteira")
+    print(f"{'modo':>10} {'1º caractere (s)':>17} {'total (s)':>10}")
+
+    inteira = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        translate_text(SERVICO, texto, config)
+        inteira.append(time.perf_counter() - inicio)
+    print(f"{'inteira':>10} {statistics.median(inteira):>17.3f} {statistics.median(inteira):>10.3f}")
+
+    primeiros, totais = [], []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        primeiro = []
+        stream_text(SERVICO, texto, dict(config, on_partial=lambda _parcial: primeiro or primeiro.append(time.perf_counter())))
+        totais.append(time.perf_counter() - inicio)
+        primeiros.append(primeiro[0] - inicio)
+    print(f"{'streaming':>10} {statistics.median(primeiros):>17.3f} {statistics.median(totais):>10.3f}")
+    servidor.shutdown()
+
+
+def bench_ollama(itens, latencia, por_item, carga, slots, lote):
+    """Um texto por requisição, sem keep_alive, x lotes JSON com o modelo pré-carregado em todos os slots."""
+    textos = [(xpath, f"{texto} #{i}") for i, (xpath, texto) in enumerate(gerar_itens(itens))]
+    print(f"servidor: {latencia}s por requisição + {por_item}s por texto, {slots} slot(s), carga do modelo {carga}s")
+    print(f"{'modo':>28} {'requisições':>12} {'cargas':>7} {'tempo (s)':>10} {'itens/s':>9}")
+
+    def rodar(nome, config, tamanho_lote, concorrencia, pre_carregar):
+        servidor = iniciar_em_segundo_plano(latencia=latencia, slots=slots, por_item=por_item, carga=carga)
+        config = dict(config, ollama_url=servidor.url, memoria=None)
+        try:
+            inicio = time.perf_counter()
+            if pre_carregar:
+                AVAILABLE_SERVICES[SERVICO].preload(config)
+            motor = MotorTraducao(SERVICO, config, concorrencia=concorrencia)
+            estado = motor.executar(dividir_em_lotes(textos, tamanho_lote), lambda *_args: None)
+            duracao = time.perf_counter() - inicio
+            if estado != "concluido":
+                raise SystemExit(f"ERRO: {estado} ({motor.ultimo_erro})")
+            print(f"{nome:>28} {servidor.requisicoes:>12} {servidor.carregamentos:>7} {duracao:>10.2f} {itens / duracao:>9.1f}")
+        finally:
+            servidor.shutdown()
+
+    # keep_alive 0 reproduz o modelo descarregando entre chamadas espaçadas
+    rodar("1 por requisição, sem pin", {"keep_alive": 0}, 1, 1, False)
+    rodar(f"lotes de {lote}, {slots} em paralelo", {"ollama_parallel": slots}, lote, None, True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_conc = sub.add_parser('concorrencia', help='vazão do MotorTraducao por nível de concorrência')
+    p_conc.add_argument('--itens', type=int, default=400)
+    p_conc.add_argument('--lote', type=int, default=10)
+    p_conc.add_argument('--niveis', type=int, nargs='+', default=[1, 2, 4, 8])
+    p_conc.add_argument('--latencia', type=float, default=0.2)
+    p_conc.add_argument('--slots', type=int, default=8)
+
+    p_apr = sub.add_parser('aproximada', help='latência da busca aproximada na memória de tradução')
+    p_apr.add_argument('--entradas', type=int, default=500000)
+    p_apr.add_argument('--consultas', type=int, default=2000)
+    p_apr.add_argument('--limiar', type=float, default=LIMIAR_PADRAO)
+    p_apr.add_argument('--conferir', type=int, default=0, metavar='N', help='confere N consultas contra a varredura completa')
+
+    p_glo = sub.add_parser('glossario', help='glossário compilado x str.replace em cadeia')
+    p_glo.add_argument('--termos', type=int, default=20000)
+    p_glo.add_argument('--textos', type=int, default=2000)
+
+    p_lot = sub.add_parser('lotes', help='lote fixo x empacotamento por orçamento de tokens (modelo simulado)')
+    p_lot.add_argument('--itens', type=int, default=20000)
+    p_lot.add_argument('--limite-saida', type=int, default=8192, help='limite real de saída do modelo simulado')
+    p_lot.add_argument('--orcamento', type=int, default=12000, help='orçamento inicial (de propósito acima do limite)')
+    p_lot.add_argument('--lote-fixo', type=int, default=120)
+
+    p_sug = sub.add_parser('sugestao', help='tempo até o primeiro caractere da sugestão: resposta inteira x streaming')
+    p_sug.add_argument('--palavras', type=int, default=120)
+    p_sug.add_argument('--latencia', type=float, default=4.0)
+    p_sug.add_argument('--repeticoes', type=int, default=3)
+
+    p_oll = sub.add_parser('ollama', help='Ollama: um texto por requisição x lotes com o modelo fixo na memória')
+    p_oll.add_argument('--itens', type=int, default=400)
+    p_oll.add_argument('--latencia', type=float, default=0.5, help='segundos fixos por requisição (leitura do prompt)')
+    p_oll.add_argument('--por-item', type=float, default=0.02, help='segundos por texto gerado')
+    p_oll.add_argument('--carga', type=float, default=0.5, help='segundos para carregar o modelo')
+    p_oll.add_argument('--slots', type=int, default=4)
+    p_oll.add_argument('--lote', type=int, default=40)
+
+    args = parser.parse_args()
+    if args.comando == 'concorrencia':
+        bench_concorrencia(args.itens, args.lote, args.niveis, args.latencia, args.slots)
+    elif args.comando == 'aproximada':
+        bench_aproximada(args.entradas, args.consultas, args.limiar, args.conferir)
+    elif args.comando == 'glossario':
+        bench_glossario(args.termos, args.textos)
+    elif args.comando == 'lotes':
+        bench_lotes(args.itens, args.limite_saida, args.orcamento, args.lote_fixo)
+    elif args.comando == 'sugestao':
+        bench_sugestao(args.palavras, args.latencia, args.repeticoes)
+    elif args.comando == 'ollama':
+        bench_ollama(args.itens, args.latencia, args.por_item, args.carga, args.slots, args.lote)
+
+
+if __name__ == '__main__':
+    main()
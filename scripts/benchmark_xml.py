@@ -0,0 +1,219 @@
+"""
+Benchmark do extrator/injetor com XMLs sintéticos.
+
+Uso (a partir da raiz do projeto):
+    python scripts/benchmark_xml.py xpath --tamanhos 2000 4000 8000 16000
+    python scripts/benchmark_xml.py memoria --tamanhos 10000 100000 400000
+    python scripts/benchmark_xml.py injecao --tamanhos 2000 4000 8000 16000
+    python scripts/benchmark_xml.py preservar --tamanhos 100000 400000
+    python scripts/benchmark_xml.py idiomas --tamanhos 100000 --idiomas 6
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from core.extrator import extrair_textos, get_xpath, iterar_textos, mapear_xpaths
+from core.injetor import aplicar_traducoes, injetar_idiomas, injetar_traducoes, injetar_traducoes_preservando
+
+
+def gerar_xml(quantidade, caminho=None):
+    """Gera um XML no formato <root><baseVillain><bio>..</bio></baseVillain>...</root>."""
+    partes = ['<?xml version="1.0" encoding="utf-8"?>\n<root>\n']
+    for i in range(quantidade):
+        partes.append(
+            f'  <baseVillain id="{i}">\n'
+            f'    <dispName>Villain {i}</dispName>\n'
+            f'    <bio>Deal {i % 100} damage to X &amp; stun for {i % 7} turns.</bio>\n'
+            f'  </baseVillain>\n'
+        )
+    partes.append('</root>\n')
+    conteudo = ''.join(partes)
+    if caminho:
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(conteudo)
+    return conteudo
+
+
+def _cronometrar(funcao, *args):
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+def bench_xpath(tamanhos):
+    print(f"{'itens':>10} {'get_xpath (s)':>15} {'mapear_xpaths (s)':>18} {'us/item':>9}")
+    for quantidade in tamanhos:
+        root = ET.fromstring(gerar_xml(quantidade))
+        alvos = root.findall('.//baseVillain/bio')
+
+        def antigo():
+            parent_map = {c: p for p in root.iter() for c in p}
+            return {elem: get_xpath(elem, root, parent_map) for elem in alvos}
+
+        t_antigo, esperado = _cronometrar(antigo)
+        t_novo, obtido = _cronometrar(mapear_xpaths, root, alvos)
+        if esperado != obtido:
+            raise SystemExit("ERRO: mapear_xpaths gerou chaves diferentes de get_xpath")
+        print(f"{quantidade:>10} {t_antigo:>15.3f} {t_novo:>18.3f} {t_novo / quantidade * 1e6:>9.2f}")
+
+
+def _pico_memoria(funcao, *args):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    duracao = time.perf_counter() - inicio
+    _atual, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duracao, pico, resultado
+
+
+def bench_memoria(tamanhos):
+    print(f"{'itens':>10} {'arquivo (MB)':>13} {'ET.parse pico (MB)':>19} {'streaming pico (MB)':>20}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for quantidade in tamanhos:
+            caminho = os.path.join(pasta, f'bench_{quantidade}.xml')
+            gerar_xml(quantidade, caminho)
+            tamanho_mb = os.path.getsize(caminho) / 2**20
+
+            def em_memoria():
+                root = ET.parse(caminho).getroot()
+                return sum(1 for elem in root.iter('bio') if elem.text)
+
+            def streaming():
+                return sum(1 for _ in iterar_textos(caminho, 'baseVillain', 'bio'))
+
+            _t1, pico_arvore, total_arvore = _pico_memoria(em_memoria)
+            _t2, pico_stream, total_stream = _pico_memoria(streaming)
+            if total_arvore != total_stream:
+                raise SystemExit("ERRO: a extração em streaming perdeu itens")
+            print(f"{quantidade:>10} {tamanho_mb:>13.1f} {pico_arvore / 2**20:>19.1f} {pico_stream / 2**20:>20.2f}")
+
+
+def bench_injecao(tamanhos):
+    from lxml import etree
+
+    print(f"{'itens':>10} {'xpath por chave (s)':>20} {'passada única (s)':>18} {'ganho':>7}")
+    for quantidade in tamanhos:
+        conteudo = gerar_xml(quantidade).encode('utf-8')
+        with tempfile.TemporaryDirectory() as pasta:
+            caminho = os.path.join(pasta, 'bench.xml')
+            with open(caminho, 'wb') as f:
+                f.write(conteudo)
+            _ok, mapa = extrair_textos(caminho, 'baseVillain', 'bio')
+        mapa = {xpath: texto.upper() for xpath, texto in mapa.items()}
+
+        def por_chave():
+            root = etree.fromstring(conteudo)
+            for xpath, traducao in mapa.items():
+                elementos = root.xpath(xpath)
+                if elementos:
+                    elementos[0].text = traducao
+            return etree.tostring(root)
+
+        def passada_unica():
+            root = etree.fromstring(conteudo)
+            relatorio = aplicar_traducoes(root, mapa)
+            if relatorio['ausentes']:
+                raise SystemExit("ERRO: aplicar_traducoes não encontrou todas as chaves")
+            return etree.tostring(root)
+
+        t_antigo, esperado = _cronometrar(por_chave)
+        t_novo, obtido = _cronometrar(passada_unica)
+        if esperado != obtido:
+            raise SystemExit("ERRO: os dois injetores geraram XMLs diferentes")
+        print(f"{quantidade:>10} {t_antigo:>20.3f} {t_novo:>18.3f} {t_antigo / t_novo:>6.1f}x")
+
+
+def bench_preservar(tamanhos):
+    print(f"{'itens':>10} {'lxml + tree.write (s)':>22} {'splice de bytes (s)':>20} {'linhas alteradas':>17}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for quantidade in tamanhos:
+            caminho = os.path.join(pasta, 'bench.xml')
+            conteudo = gerar_xml(quantidade, caminho)
+            _ok, mapa = extrair_textos(caminho, 'baseVillain', 'bio')
+            # Traduz só 1 em cada 10 textos, como numa atualização parcial
+            mapa = {xpath: texto.upper() for i, (xpath, texto) in enumerate(mapa.items()) if i % 10 == 0}
+
+            saida_lxml = os.path.join(pasta, 'saida_lxml.xml')
+            saida_bytes = os.path.join(pasta, 'saida_bytes.xml')
+            t_lxml, _ = _cronometrar(injetar_traducoes, caminho, mapa, saida_lxml)
+            t_bytes, _ = _cronometrar(injetar_traducoes_preservando, caminho, mapa, saida_bytes)
+
+            with open(saida_bytes, 'r', encoding='utf-8') as f:
+                linhas_saida = f.read().splitlines()
+            alteradas = sum(1 for antes, depois in zip(conteudo.splitlines(), linhas_saida) if antes != depois)
+            if alteradas != len(mapa):
+                raise SystemExit("ERRO: o splice alterou linhas que não deveria")
+            print(f"{quantidade:>10} {t_lxml:>22.3f} {t_bytes:>20.3f} {alteradas:>17}")
+
+
+def bench_idiomas(tamanhos, quantidade_idiomas):
+    import contextlib
+    import io
+
+    print(f"{'itens':>10} {'idiomas':>8} {'1 parse por idioma (s)':>23} {'parse único (s)':>16} {'parse único + preservar x4 (s)':>31}")
+    idiomas = [f"l{i}" for i in range(quantidade_idiomas)]
+    with tempfile.TemporaryDirectory() as pasta:
+        for quantidade in tamanhos:
+            caminho = os.path.join(pasta, 'bench.xml')
+            gerar_xml(quantidade, caminho)
+            _ok, mapa = extrair_textos(caminho, 'baseVillain', 'bio')
+            mapas = {idioma: {xpath: f"{idioma}: {texto}" for xpath, texto in mapa.items()} for idioma in idiomas}
+
+            def um_parse_por_idioma():
+                for idioma, mapa_idioma in mapas.items():
+                    injetar_traducoes(caminho, mapa_idioma, os.path.join(pasta, 'a', f'{idioma}.xml'))
+
+            os.makedirs(os.path.join(pasta, 'a'), exist_ok=True)
+            with contextlib.redirect_stdout(io.StringIO()):
+                t_antigo, _ = _cronometrar(um_parse_por_idioma)
+                t_unico, _ = _cronometrar(injetar_idiomas, caminho, mapas, os.path.join(pasta, 'b'))
+                t_paralelo, _ = _cronometrar(lambda: injetar_idiomas(caminho, mapas, os.path.join(pasta, 'c'), processos=4, preservar_original=True))
+            for idioma in idiomas:
+                with open(os.path.join(pasta, 'a', f'{idioma}.xml'), 'rb') as a, open(os.path.join(pasta, 'b', f'bench_{idioma}.xml'), 'rb') as b:
+                    if a.read() != b.read():
+                        raise SystemExit(f"ERRO: saída do idioma {idioma} difere")
+            print(f"{quantidade:>10} {quantidade_idiomas:>8} {t_antigo:>23.3f} {t_unico:>16.3f} {t_paralelo:>31.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_xpath = sub.add_parser('xpath', help='get_xpath (quadrático) x mapear_xpaths (linear)')
+    p_xpath.add_argument('--tamanhos', type=int, nargs='+', default=[2000, 4000, 8000, 16000])
+
+    p_memoria = sub.add_parser('memoria', help='pico de memória: ET.parse x iterar_textos')
+    p_memoria.add_argument('--tamanhos', type=int, nargs='+', default=[10000, 100000, 400000])
+
+    p_injecao = sub.add_parser('injecao', help='root.xpath por chave x aplicar_traducoes')
+    p_injecao.add_argument('--tamanhos', type=int, nargs='+', default=[2000, 4000, 8000, 16000])
+
+    p_preservar = sub.add_parser('preservar', help='tree.write completo x splice de bytes preservando o original')
+    p_preservar.add_argument('--tamanhos', type=int, nargs='+', default=[100000, 400000])
+
+    p_idiomas = sub.add_parser('idiomas', help='um parse por idioma x injetar_idiomas')
+    p_idiomas.add_argument('--tamanhos', type=int, nargs='+', default=[100000])
+    p_idiomas.add_argument('--idiomas', type=int, default=6)
+
+    args = parser.parse_args()
+    if args.comando == 'xpath':
+        bench_xpath(args.tamanhos)
+    elif args.comando == 'memoria':
+        bench_memoria(args.tamanhos)
+    elif args.comando == 'injecao':
+        bench_injecao(args.tamanhos)
+    elif args.comando == 'preservar':
+        bench_preservar(args.tamanhos)
+    elif args.comando == 'idiomas':
+        bench_idiomas(args.tamanhos, args.idiomas)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""
+Servidor local que imita a API do Ollama para testes e benchmarks offline.
+
+Responde /api/chat (e o antigo /api/generate) com uma "tradução" falsa (o
+texto original com o prefixo '[pt] '), depois de uma latência artificial:
+'--latencia' fixa por requisição (leitura do prompt) mais '--por-item' para
+cada texto do lote (geração). '--slots' limita quantas requisições são
+processadas ao mesmo tempo, como o OLLAMA_NUM_PARALLEL.
+
+O modelo começa descarregado: a primeira requisição (ou o pré-carregamento,
+um chat com 'messages' vazio) paga '--carga' segundos. Uma requisição com
+"keep_alive": 0 (inclusive um chat vazio) descarrega o modelo ao terminar;
+'keep_alives' guarda o valor pedido por cada requisição.
+
+Lotes numerados ([{"id": n, "text": ...}]) são respondidos como
+{"items": [...]}; '--perder' descarta essa fração dos itens de cada resposta,
+para exercitar o reenvio dos IDs que faltaram. Com "stream": true a resposta
+sai em NDJSON, uma palavra por linha, com a latência dividida entre elas.
+
+Uso (a partir da raiz do projeto):
+    python scripts/servidor_ollama_falso.py --porta 11434 --latencia 0.5 --slots 4
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def traduzir_falso(valor):
+    return f"[pt] {valor}"
+
+
+def _extrair_json_do_prompt(prompt):
+    """Os prompts do /api/generate trazem o JSON entre 'Input:' e 'Output:'."""
+    inicio = prompt.find("Input:")
+    fim = prompt.rfind("Output:")
+    if inicio == -1 or fim == -1:
+        return None
+    try:
+        return json.loads(prompt[inicio + len("Input:"):fim])
+    except json.JSONDecodeError:
+        return None
+
+
+def _extrair_json_da_mensagem(conteudo):
+    """No /api/chat o JSON é a última linha da mensagem do usuário (exemplos podem vir antes)."""
+    linhas = conteudo.strip().splitlines()
+    try:
+        return json.loads(linhas[-1]) if linhas else None
+    except json.JSONDecodeError:
+        return None
+
+
+class ServidorOllamaFalso(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco, latencia=0.2, slots=1, perder=0.0, por_item=0.0, carga=0.0):
+        super().__init__(endereco, ManipuladorOllama)
+        self.latencia = latencia
+        self.por_item = por_item
+        self.carga = carga
+        self.perder = perder
+        self.aleatorio = random.Random(0)
+        self.slots = threading.Semaphore(slots)
+        self.requisicoes = 0
+        self.carregamentos = 0
+        self.modelos_carregados = set()
+        self.keep_alives = []
+        self._lock = threading.Lock()
+        self._lock_carga = threading.Lock()
+
+    def carregar(self, modelo):
+        """Simula a leitura do modelo para a memória na primeira vez que ele é usado."""
+        with self._lock_carga:
+            if modelo not in self.modelos_carregados:
+                time.sleep(self.carga)
+                self.modelos_carregados.add(modelo)
+                self.carregamentos += 1
+
+    def processar(self, itens=1):
+        """Simula o tempo de inferência ocupando um dos slots do servidor."""
+        with self.slots:
+            time.sleep(self.latencia + self.por_item * itens)
+        with self._lock:
+            self.requisicoes += 1
+
+    def handle_error(self, request, client_address):
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return  # Cliente que fechou a conexão (ex: streaming cancelado)
+        super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        host, porta = self.server_address[:2]
+        return f"http://{host}:{porta}"
+
+
+class ManipuladorOllama(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Mantém a conexão aberta (keep-alive)
+
+    def log_message(self, *_args):
+        pass
+
+    def _responder(self, dados, status=200):
+        corpo = json.dumps(dados, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def _responder_em_partes(self, pedido, saida, montar_parte):
+        """NDJSON com Transfer-Encoding chunked, como o Ollama faz com "stream": true."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        palavras = saida.split(" ")
+        pausa = self.server.latencia / len(palavras)
+        partes = [montar_parte(palavra if i == 0 else " " + palavra, False) for i, palavra in enumerate(palavras)]
+        partes.append(montar_parte("", True))
+        try:
+            for parte in partes:
+                time.sleep(pausa)
+                linha = json.dumps({"model": pedido.get("model"), **parte}, ensure_ascii=False).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(linha):X}\r\n".encode() + linha + b"\r\n")
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # O cliente desistiu no meio (cancelamento)
+        with self.server._lock:
+            self.server.requisicoes += 1
+
+    def _ler_corpo(self):
+        tamanho = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(tamanho) or b"{}")
+
+    def _traduzir_entrada(self, entrada, texto):
+        """Resposta em JSON para um lote numerado, um objeto de valores ou um texto solto; e o nº de itens."""
+        if isinstance(entrada, list):
+            itens = [
+                {"id": item["id"], "text": traduzir_falso(item["text"])}
+                for item in entrada
+                if self.server.aleatorio.random() >= self.server.perder
+            ]
+            return json.dumps({"items": itens}, ensure_ascii=False), len(entrada)
+        if isinstance(entrada, dict):
+            return json.dumps({chave: traduzir_falso(valor) for chave, valor in entrada.items()}, ensure_ascii=False), 1
+        return json.dumps({"text": traduzir_falso(texto)}, ensure_ascii=False), 1
+
+    def _fim_da_requisicao(self, pedido):
+        with self.server._lock:
+            self.server.keep_alives.append(pedido.get("keep_alive"))
+        if pedido.get("keep_alive") in (0, "0", "0s"):
+            with self.server._lock_carga:
+                self.server.modelos_carregados.discard(pedido.get("model"))
+
+    def do_POST(self):
+        if self.path == "/api/chat":
+            self._chat(self._ler_corpo())
+        elif self.path == "/api/generate":
+            self._generate(self._ler_corpo())
+        else:
+            self._responder({"error": "not found"}, status=404)
+
+    def _chat(self, pedido):
+        modelo = pedido.get("model")
+        self.server.carregar(modelo)
+        mensagens = pedido.get("messages") or []
+        if not mensagens:
+            # Só carrega o modelo (pré-carregamento)
+            descarregar = pedido.get("keep_alive") in (0, "0", "0s")
+            self._responder({
+                "model": modelo, "message": {"role": "assistant", "content": ""},
+                "done_reason": "unload" if descarregar else "load", "done": True,
+            })
+            self._fim_da_requisicao(pedido)
+            return
+
+        texto = mensagens[-1].get("content", "")
+        if pedido.get("stream"):
+            with self.server.slots:
+                self._responder_em_partes(
+                    pedido, traduzir_falso(texto),
+                    lambda parte, fim: {"message": {"role": "assistant", "content": parte}, "done": fim},
+                )
+        else:
+            saida, itens = self._traduzir_entrada(_extrair_json_da_mensagem(texto), texto)
+            self.server.processar(itens)
+            self._responder({"model": modelo, "message": {"role": "assistant", "content": saida}, "done": True})
+        self._fim_da_requisicao(pedido)
+
+    def _generate(self, pedido):
+        self.server.carregar(pedido.get("model"))
+        prompt = pedido.get("prompt", "")
+        if pedido.get("stream"):
+            texto = prompt[prompt.find("Text:\n") + len("Text:\n"):].replace("[/INST]", "")
+            with self.server.slots:
+                self._responder_em_partes(pedido, traduzir_falso(texto), lambda parte, fim: {"response": parte, "done": fim})
+        else:
+            saida, itens = self._traduzir_entrada(_extrair_json_do_prompt(prompt), prompt)
+            self.server.processar(itens)
+            self._responder({"model": pedido.get("model"), "response": saida, "done": True})
+        self._fim_da_requisicao(pedido)
+
+
+def iniciar_em_segundo_plano(latencia=0.2, slots=1, porta=0, perder=0.0, por_item=0.0, carga=0.0):
+    """Sobe o servidor numa thread daemon e o devolve (use .url e .shutdown())."""
+    servidor = ServidorOllamaFalso(
+        ("127.0.0.1", porta), latencia=latencia, slots=slots, perder=perder, por_item=por_item, carga=carga,
+    )
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=11434)
+    parser.add_argument("--latencia", type=float, default=0.2, help="segundos fixos por requisição")
+    parser.add_argument("--por-item", type=float, default=0.0, help="segundos a mais por texto do lote")
+    parser.add_argument("--carga", type=float, default=0.0, help="segundos para carregar o modelo na primeira vez")
+    parser.add_argument("--slots", type=int, default=1, help="requisições processadas em paralelo")
+    parser.add_argument("--perder", type=float, default=0.0, help="fração dos itens de um lote omitida na resposta")
+    args = parser.parse_args()
+
+    servidor = ServidorOllamaFalso(
+        ("127.0.0.1", args.porta), latencia=args.latencia, slots=args.slots, perder=args.perder,
+        por_item=args.por_item, carga=args.carga,
+    )
+    print(f"Servidor Ollama falso em {servidor.url} (latência {args.latencia}s, {args.slots} slot(s))")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
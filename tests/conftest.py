@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Permite rodar "pytest" a partir da raiz sem instalar o pacote
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "scripts"))  # Servidor Ollama falso
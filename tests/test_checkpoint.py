@@ -0,0 +1,23 @@
+import os
+
+from core.checkpoint import abrir_checkpoint_projeto, listar_checkpoints
+
+
+def test_pasta_do_projeto_so_existe_depois_da_primeira_gravacao(tmp_path):
+    xml = tmp_path / "dialogos.xml"
+    xml.write_text("<raiz><bio>Hi</bio></raiz>", encoding="utf-8")
+    cache = str(tmp_path / "checkpoints")
+
+    diario = abrir_checkpoint_projeto(str(xml), "", "bio", "pt", diretorio=cache)
+    assert diario.carregar() == {}
+    diario.compactar({})  # Execução sem nenhuma tradução
+    assert not os.path.exists(cache)
+
+    diario.registrar({"/raiz/bio[1]": "Oi"})
+    diario.fechar()
+    projetos = listar_checkpoints(cache)
+    assert len(projetos) == 1 and projetos[0]["itens"] == 1 and projetos[0]["tag_alvo"] == "bio"
+
+    reaberto = abrir_checkpoint_projeto(str(xml), "", "bio", "pt", diretorio=cache)
+    assert reaberto.carregar() == {"/raiz/bio[1]": "Oi"}
+    assert listar_checkpoints(cache)[0]["usado_em"] >= projetos[0]["usado_em"]
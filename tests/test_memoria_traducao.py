@@ -0,0 +1,25 @@
+from core.memoria_traducao import MemoriaTraducao, contexto_aprovado, contexto_memoria
+
+
+def test_aprovacao_manual_vale_para_qualquer_provedor():
+    memoria = MemoriaTraducao(":memory:")
+    gemini = contexto_memoria("English", "pt", "Gemini", "gemini-1.5-flash", "v1")
+    deepl = contexto_memoria("English", "pt", "DeepL", "", "v1")
+    memoria.gravar("Attack!", "Ataque da máquina", gemini)
+    memoria.gravar("Attack!", "Ataque!", contexto_aprovado(gemini))
+
+    assert memoria.buscar("Attack!", gemini) == "Ataque!"
+    assert memoria.buscar("Attack!", deepl) == "Ataque!"
+    assert memoria.buscar("Attack!", contexto_memoria("English", "es", "Gemini", "", "v1")) is None
+
+
+def test_contagem_mantida_sem_recontar_o_banco():
+    memoria = MemoriaTraducao(":memory:", tamanho_maximo=3)
+    contexto = contexto_memoria("English", "pt", "Gemini")
+    memoria.gravar_varios([("a", "1"), ("b", "2"), ("a", "1b")], contexto)
+    memoria.gravar("b", "2b", contexto)  # Atualização: não cria entrada
+    assert memoria.estatisticas()["entradas"] == 2
+
+    memoria.gravar_varios([("c", "3"), ("d", "4")], contexto)  # Passa do máximo: descarta a mais antiga
+    total = memoria._conexao.execute("SELECT COUNT(*) FROM traducoes").fetchone()[0]
+    assert memoria.estatisticas()["entradas"] == total == 3
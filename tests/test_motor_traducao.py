@@ -0,0 +1,111 @@
+import json
+import threading
+import types
+
+from core import tradutor_api
+from core.limitador import LimitadorDeTaxa, UsoDiario
+from core.lotes import EmpacotadorDeLotes
+from core.motor_traducao import MotorTraducao
+from core.resiliencia import FALHAS_PARA_ABRIR, obter_disjuntor, redefinir_disjuntores
+
+
+class ModeloQuePerdeItens:
+    """Gemini falso: nos lotes numerados nunca devolve o id 0; textos avulsos voltam com '[t] '."""
+
+    def __init__(self):
+        self.requisicoes = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.requisicoes += 1
+        if "\n[" not in prompt:
+            return types.SimpleNamespace(text="[t] avulso")
+        itens = json.loads(prompt[prompt.rindex("\n[") + 1:])
+        resposta = {"items": [{"id": item["id"], "text": "[t] " + item["text"]} for item in itens if item["id"] != 0]}
+        return types.SimpleNamespace(text=json.dumps(resposta))
+
+
+def test_limitador_conta_cada_requisicao_do_lote(monkeypatch):
+    modelo = ModeloQuePerdeItens()
+    monkeypatch.setattr(tradutor_api, "get_gemini_client", lambda api_key, model: modelo)
+    uso = UsoDiario(caminho=None)
+    limitador = LimitadorDeTaxa("teste", rpm=1000, rpd=1000, uso_diario=uso)
+    # 60 textos numa requisição só: 1 envio + 2 reenvios do id que falta + 1 tradução avulsa dele
+    lote = [(f"/raiz/item[{i}]", f"line {i}") for i in range(60)]
+    entregues = {}
+
+    motor = MotorTraducao("Gemini", {"api_key": "x", "memoria": None}, limitador=limitador)
+    estado = motor.executar([lote], lambda _indice, _lote, traducoes: entregues.update(traducoes))
+
+    assert estado == "concluido"
+    assert len(entregues) == 60
+    assert modelo.requisicoes == 4
+    assert uso.contagem("teste") == modelo.requisicoes
+
+
+def test_cancelar_esperando_o_limitador_nao_conta_no_disjuntor(monkeypatch):
+    monkeypatch.setattr(tradutor_api, "get_gemini_client", lambda api_key, model: ModeloQuePerdeItens())
+    redefinir_disjuntores()
+    lote = [(f"/raiz/item[{i}]", f"line {i}") for i in range(10)]
+
+    for _execucao in range(FALHAS_PARA_ABRIR + 1):
+        # 1 requisição por minuto: o reenvio do id que faltou fica esperando vaga até o cancelamento
+        limitador = LimitadorDeTaxa("teste", rpm=1)
+        cancelar = threading.Event()
+        threading.Timer(0.2, cancelar.set).start()
+        motor = MotorTraducao("Gemini", {"api_key": "x", "memoria": None}, limitador=limitador, cancel_event=cancelar)
+        assert motor.executar([lote], lambda *_args: None) == "cancelado"
+
+    disjuntor = obter_disjuntor("Gemini")
+    assert disjuntor.falhas_seguidas == 0
+    assert not disjuntor.aberto
+
+
+class ModeloQueTrunca:
+    """Gemini falso que corta toda resposta de lote nos 30 primeiros itens."""
+
+    def __init__(self):
+        self.tamanhos = []
+
+    def generate_content(self, prompt, generation_config=None):
+        if "\n[" not in prompt:
+            return types.SimpleNamespace(text="[t] avulso")
+        itens = json.loads(prompt[prompt.rindex("\n[") + 1:])
+        self.tamanhos.append(len(itens))
+        resposta = {"items": [{"id": item["id"], "text": "[t] " + item["text"]} for item in itens[:30]]}
+        return types.SimpleNamespace(text=json.dumps(resposta))
+
+
+def test_orcamento_encolhe_quando_a_resposta_vem_truncada(monkeypatch):
+    modelo = ModeloQueTrunca()
+    monkeypatch.setattr(tradutor_api, "get_gemini_client", lambda api_key, model: modelo)
+    empacotador = EmpacotadorDeLotes("teste", saida=6000, itens=200)
+    itens = [(f"/raiz/item[{i}]", f"line {i}") for i in range(200)]
+    ajustes = []
+
+    motor = MotorTraducao(
+        "Gemini", {"api_key": "x", "memoria": None}, limitador=LimitadorDeTaxa("teste"),
+        empacotador=empacotador, ao_ajustar_orcamento=ajustes.append,
+    )
+    assert motor.executar(empacotador.empacotar(itens), lambda *_args: None) == "concluido"
+
+    assert modelo.tamanhos[0] == 200  # O lote empacotado sai inteiro, sem ser redividido em 50
+    assert empacotador.truncagens == 1
+    assert ajustes == [empacotador.orcamento]
+    assert empacotador.orcamento < 6000
+
+
+def test_modelo_local_fica_fixo_durante_a_execucao_e_sai_no_fim():
+    from servidor_ollama_falso import iniciar_em_segundo_plano
+
+    servidor = iniciar_em_segundo_plano(latencia=0.0, slots=2)
+    try:
+        lotes = [[(f"/raiz/item[{i}]", f"line {i}")] for i in range(4)]
+        motor = MotorTraducao("Llama 3 (Local)", {"ollama_url": servidor.url, "memoria": None}, concorrencia=2)
+        assert motor.executar(lotes, lambda *_args: None) == "concluido"
+
+        assert servidor.carregamentos == 1
+        assert set(servidor.keep_alives[:-1]) == {-1}
+        assert servidor.keep_alives[-1] == 0
+        assert not servidor.modelos_carregados
+    finally:
+        servidor.shutdown()
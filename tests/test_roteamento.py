@@ -0,0 +1,33 @@
+import threading
+import time
+
+import pytest
+
+from core.resiliencia import FalhaDoProvedor
+from core.roteamento import Roteador
+
+
+class RoteadorSemVaga(Roteador):
+    """Todo provedor está sem vaga no limitador pelos próximos 5s."""
+
+    def _disponivel(self, servico, tokens):
+        return 5.0
+
+
+def test_cancelamento_interrompe_a_espera_por_vaga():
+    chamados = []
+    roteador = RoteadorSemVaga(
+        {"provedores": ["Gemini", "DeepL"], "tempo_limite": 30},
+        {"Gemini": {}, "DeepL": {}},
+        traduzir=lambda servico, texto, config: chamados.append(servico),
+    )
+    cancelar = threading.Event()
+    threading.Timer(0.1, cancelar.set).start()
+
+    inicio = time.monotonic()
+    with pytest.raises(FalhaDoProvedor, match="Cancelado"):
+        roteador.traduzir("Attack!", cancel_event=cancelar)
+    roteador.fechar()
+
+    assert time.monotonic() - inicio < 1.0
+    assert chamados == []
@@ -0,0 +1,60 @@
+import json
+import re
+import types
+
+from core import tradutor_api
+
+
+class ModeloFalso:
+    """Imita o GenerativeModel do Gemini: guarda os prompts e ecoa os itens com o prefixo '[t] '."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.prompts.append(prompt)
+        itens = json.loads(prompt[prompt.rindex("\n[") + 1:])
+        resposta = {"items": [{"id": item["id"], "text": "[t] " + item["text"]} for item in itens]}
+        return types.SimpleNamespace(text=json.dumps(resposta, ensure_ascii=False))
+
+
+def _payload(prompt):
+    return json.loads(prompt[prompt.rindex("\n[") + 1:])
+
+
+def test_lote_para_espanhol_nao_leva_o_glossario_em_portugues(monkeypatch):
+    modelo = ModeloFalso()
+    monkeypatch.setattr(tradutor_api, "get_gemini_client", lambda api_key, model: modelo)
+    textos = ["Energy Blade", "Kinetic Strike of the Legion"]
+
+    resultado = tradutor_api.AVAILABLE_SERVICES["Gemini"].translate_batch(
+        textos, {"target_lang": "es", "target_label": "Spanish"},
+    )
+
+    assert resultado == ["[t] Energy Blade", "[t] Kinetic Strike of the Legion"]
+    (prompt,) = modelo.prompts
+    assert [item["text"] for item in _payload(prompt)] == textos
+    assert not re.search("Energia|Lâmina|Cinética|Golpe|Legião", prompt)
+    assert "already in Portuguese" not in prompt
+
+
+def test_lote_para_portugues_usa_o_glossario(monkeypatch):
+    modelo = ModeloFalso()
+    monkeypatch.setattr(tradutor_api, "get_gemini_client", lambda api_key, model: modelo)
+
+    tradutor_api.AVAILABLE_SERVICES["Gemini"].translate_batch(["Energy Blade"], {"target_lang": "pt"})
+
+    (prompt,) = modelo.prompts
+    assert "Energia" in _payload(prompt)[0]["text"]
+    assert "already in Portuguese" in prompt
+
+
+def test_lotes_do_deepl_medidos_em_bytes():
+    deepl = tradutor_api.AVAILABLE_SERVICES["DeepL"]
+    textos = ["Ação é êxito " * 300] * 40  # ~3.900 caracteres, mas ~6.900 bytes no corpo JSON cada
+    lotes = [lote for _inicio, lote in tradutor_api.split_batches(
+        textos, deepl.max_batch_items, deepl.max_batch_chars, deepl.max_batch_bytes,
+    )]
+    assert len(lotes) > 1
+    for lote in lotes:
+        assert len(json.dumps({"text": lote, "target_lang": "PT-BR"})) <= 128 * 1024